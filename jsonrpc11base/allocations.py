@@ -0,0 +1,192 @@
+"""
+Per-method allocation tracking
+
+An AllocationTracker measures, with tracemalloc, the memory allocated by a
+sample of each method's calls:
+
+- net: the bytes allocated by the call and still allocated when it returns,
+  including its result, less those it freed
+- peak: the most bytes the call had allocated at once, above what was
+  allocated when it started
+
+and the sites (file and line) which allocated the net bytes. These are
+aggregated per method; see stats().
+
+tracemalloc slows every allocation in the process while it traces, so
+unless it was already tracing, it is started for each sampled call and
+stopped when the call returns. If it was already tracing, the peak is only
+measured from Python 3.9, which can reset it (tracemalloc.reset_peak());
+on older Pythons, such calls have their net bytes measured, but not their
+peak. Only one call is measured at a time; sampled
+calls made meanwhile are not measured, and are counted as skipped. The
+allocations of other threads during a measured call are counted as the
+call's.
+
+A service given an AllocationTracker has the call() of each of its methods
+but the system methods replaced by a tracked one when the method is added,
+so a service without one runs no tracking code at all.
+"""
+import functools
+import random
+import threading
+import tracemalloc
+from typing import Dict, Optional
+
+from jsonrpc11base.method import Method
+
+# The frames of these files are left out of allocation sites
+_IGNORED = (tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__))
+
+
+class MethodAllocations(object):
+    """The aggregated allocations of a method's measured calls."""
+    def __init__(self):
+        self.calls = 0
+        self.net_bytes = 0
+        self.max_net_bytes = 0
+        # Calls whose peak was measured
+        self.peak_calls = 0
+        self.peak_bytes = 0
+        self.max_peak_bytes = None
+        # "file:line" -> [net bytes, net blocks]
+        self.sites: Dict[str, list] = {}
+
+    def add(self, net_bytes: int, peak_bytes: Optional[int], sites, max_sites: int):
+        self.calls += 1
+        self.net_bytes += net_bytes
+        self.max_net_bytes = max(self.max_net_bytes, net_bytes)
+        if peak_bytes is not None:
+            self.peak_calls += 1
+            self.peak_bytes += peak_bytes
+            self.max_peak_bytes = max(self.max_peak_bytes or 0, peak_bytes)
+        for site, size, count in sites:
+            totals = self.sites.get(site)
+            if totals is None:
+                totals = self.sites[site] = [0, 0]
+            totals[0] += size
+            totals[1] += count
+        if len(self.sites) > max_sites * 4:
+            # Sites which allocate little are forgotten, to bound memory.
+            kept = sorted(self.sites.items(), key=lambda item: -abs(item[1][0]))[:max_sites]
+            self.sites = dict(kept)
+
+    def summary(self, top_sites: int) -> dict:
+        calls = self.calls or 1
+        sites = sorted(self.sites.items(), key=lambda item: -item[1][0])[:top_sites]
+        return {
+            'calls': self.calls,
+            'net_bytes': self.net_bytes,
+            'mean_net_bytes': self.net_bytes / calls,
+            'max_net_bytes': self.max_net_bytes,
+            'mean_peak_bytes': (self.peak_bytes / self.peak_calls
+                                if self.peak_calls else None),
+            'max_peak_bytes': self.max_peak_bytes,
+            'top_sites': [{'site': site, 'net_bytes': size, 'net_blocks': count}
+                          for site, (size, count) in sites]
+        }
+
+
+class AllocationTracker(object):
+    """
+    Measures the allocations of a sample of method calls.
+
+    Args:
+        sample_rate: The fraction of calls measured (0 to 1)
+        top_sites: The number of allocation sites reported per method
+        frames: The number of frames tracemalloc keeps per allocation, if
+            the tracker starts it; sites are those of the innermost frame
+    """
+    def __init__(self, sample_rate: float = 0.01, top_sites: int = 10, frames: int = 1):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError('The sampling rate must be between 0 and 1')
+        if top_sites <= 0:
+            raise ValueError('top_sites must be greater than 0')
+        if frames <= 0:
+            raise ValueError('frames must be greater than 0')
+        self.sample_rate = sample_rate
+        self.top_sites = top_sites
+        self.frames = frames
+        self.lock = threading.Lock()
+        # Held while a call is measured
+        self.measuring = threading.Lock()
+        # Sampled calls not measured, as another was being measured
+        self.skipped = 0
+        self.methods: Dict[str, MethodAllocations] = {}
+
+    def install(self, method_name: str, method: Method):
+        """Replaces a method's call() with a tracked one."""
+        inner = method.__dict__.get('call') or functools.partial(Method.call, method)
+
+        def call(params, options):
+            if random.random() >= self.sample_rate:
+                return inner(params, options)
+            return self.measure(method_name, inner, params, options)
+        method.call = call
+
+    def measure(self, method_name, inner, params, options):
+        if not self.measuring.acquire(blocking=False):
+            with self.lock:
+                self.skipped += 1
+            return inner(params, options)
+        try:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start(self.frames)
+                before = None
+            else:
+                before = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+            # Traced since the call started, the peak is the call's.
+            peak_measured = started_tracing or hasattr(tracemalloc, 'reset_peak')
+            if not started_tracing and peak_measured:
+                tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            try:
+                return inner(params, options)
+            finally:
+                current, peak = tracemalloc.get_traced_memory()
+                after = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+                if started_tracing:
+                    tracemalloc.stop()
+                peak_bytes = peak - baseline if peak_measured else None
+                self.record(method_name, current - baseline, peak_bytes, after, before)
+        finally:
+            self.measuring.release()
+
+    def record(self, method_name, net_bytes, peak_bytes, after, before):
+        if before is None:
+            statistics = after.statistics('lineno')
+            sites = [(self.site_of(stat), stat.size, stat.count) for stat in statistics]
+        else:
+            statistics = after.compare_to(before, 'lineno')
+            sites = [(self.site_of(stat), stat.size_diff, stat.count_diff)
+                     for stat in statistics if stat.size_diff != 0]
+        with self.lock:
+            allocations = self.methods.get(method_name)
+            if allocations is None:
+                allocations = self.methods[method_name] = MethodAllocations()
+            allocations.add(net_bytes, peak_bytes, sites, self.top_sites)
+
+    @staticmethod
+    def site_of(stat) -> str:
+        frame = stat.traceback[0]
+        return f'{frame.filename}:{frame.lineno}'
+
+    def stats(self, prefix: str = '', reset: bool = False) -> dict:
+        """
+        Returns, for each method whose name starts with prefix and which had
+        calls measured: the number measured, their net bytes in all, on
+        average and at most, their peak bytes on average and at most (None if
+        no peak was measured; see the module documentation), and the
+        top_sites sites which allocated the most net bytes. With reset,
+        those methods' allocations are cleared in the same step.
+        """
+        with self.lock:
+            methods = {name: allocations for name, allocations in self.methods.items()
+                       if name.startswith(prefix)}
+            summaries = {name: allocations.summary(self.top_sites)
+                         for name, allocations in methods.items()}
+            if reset:
+                for name in methods:
+                    del self.methods[name]
+        return summaries
@@ -0,0 +1,69 @@
+"""
+Dispatch records
+
+Everything needed to invoke a method and validate its params and result is
+resolved once, when the method is added to a service, into a DispatchRecord.
+Handling a request then takes a single lookup in the service's dispatch table.
+"""
+from typing import Callable, Optional
+
+from jsonrpc11base.method import Method
+from jsonrpc11base.validation.memo import MemoizedValidator
+from jsonrpc11base.validation.sampling import ResultValidationPolicy
+
+# Params policies
+# No validation is configured; params are passed through as-is
+PARAMS_UNVALIDATED = 'unvalidated'
+# Params are required, and validated against the method's params schema
+PARAMS_SCHEMA = 'schema'
+# The method's params schema specifies that params must be absent
+PARAMS_ABSENT = 'absent'
+
+# Result policies
+# Results are not validated
+RESULT_UNVALIDATED = 'unvalidated'
+# Results are validated against the method's result schema
+RESULT_SCHEMA = 'schema'
+# The method's result schema specifies that there is no result
+RESULT_ABSENT = 'absent'
+
+
+class DispatchRecord(object):
+    """
+    A method's handler, and how its params and result are validated
+    """
+    name: str
+    method: Method
+    is_system: bool
+    params_policy: str
+    params_validator: Optional[Callable]
+    # The memoizing params validator, if params are memoized
+    params_memo: Optional[MemoizedValidator]
+    result_policy: str
+    result_validator: Optional[Callable]
+    # Decides which results are validated; None validates, and enforces, all
+    result_sampler: Optional[ResultValidationPolicy]
+    # The params the handler is given when a call gives none, if any; they
+    # are validated as given params are
+    default_params: Optional[dict]
+    # The options the method was added with, from which the record is rebuilt
+    # when schemas are reloaded
+    add_options: dict
+
+    def __init__(self, name: str, method: Method, is_system: bool,
+                 params_policy: str = PARAMS_UNVALIDATED,
+                 params_validator: Optional[Callable] = None,
+                 result_policy: str = RESULT_UNVALIDATED,
+                 result_validator: Optional[Callable] = None,
+                 result_sampler: Optional[ResultValidationPolicy] = None):
+        self.name = name
+        self.method = method
+        self.is_system = is_system
+        self.params_policy = params_policy
+        self.params_validator = params_validator
+        self.params_memo = None
+        self.result_policy = result_policy
+        self.result_validator = result_validator
+        self.result_sampler = result_sampler
+        self.default_params = None
+        self.add_options = {}
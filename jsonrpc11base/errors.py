@@ -142,6 +142,12 @@ class InvalidResultServerError(ServerError):
         if value is not None:
             self.error['value'] = value
 
+
+class NotAuthorizedServerError(ServerError):
+    """The caller may not call the method."""
+    code = -32004
+    message = 'Not authorized'
+
 #
 # class ServerError_AuthenticationRequired(CustomServerError):
 #     """Generic server error."""
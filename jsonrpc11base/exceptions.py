@@ -17,6 +17,11 @@ class InvalidSchemaError(JSONRPCBaseError):
     pass
 
 
+class UnresolvableRefError(InvalidSchemaError):
+    """A JSON-Schema $ref which is missing, or part of a cycle."""
+    pass
+
+
 class InvalidServerErrorCode(JSONRPCBaseError):
     """Invalid custom server error code (must be -32000 - -32099)."""
     pass
@@ -27,6 +32,11 @@ class DuplicateMethodName(JSONRPCBaseError):
     pass
 
 
+class MissingSchemaError(JSONRPCBaseError):
+    """A method was added without the schemas which validation requires."""
+    pass
+
+
 class InvalidFileType(JSONRPCBaseError):
     """Invalid file extension"""
     pass
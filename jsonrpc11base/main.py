@@ -8,26 +8,49 @@ Uses Google Style Python docstrings:
 """
 from jsonrpc11base.service_description import ServiceDescription
 import jsonrpc11base.validation.validation as validation
+import jsonrpc11base.validation.builtin as builtin
+import jsonrpc11base.validation.envelope as envelope
+import jsonrpc11base.validation.sampling as sampling
+import jsonrpc11base.validation.annotations as annotations
+from jsonrpc11base.validation.budget import ValidationBudget
+from jsonrpc11base.validation.memo import ValidationMemo
+import copy
+import functools
 import json
-import os
 import logging
+import threading
+import time
 
 from typing import Callable, Optional, Union, Dict
 
 import jsonrpc11base.exceptions as exceptions
-import traceback
-from jsonrpc11base.validation.schema import Schema, SchemaError
-from jsonrpc11base.errors import (make_standard_jsonrpc_error, make_custom_jsonrpc_error,
-                                  make_jsonrpc_error_response,
-                                  InvalidParamsError, JSONRPCError, APIError,
-                                  MethodNotFoundError,
-                                  ReservedErrorCodeServerError, InvalidResultServerError)
+from jsonrpc11base.validation.schema import SchemaError
+from jsonrpc11base.errors import (InvalidParamsError, MethodNotFoundError,
+                                  InvalidResultServerError, NotAuthorizedServerError)
+from jsonrpc11base.responses import (make_parse_error_response, make_envelope_error_response,
+                                     make_result_response, make_method_error_response)
 from jsonrpc11base.types import (MethodRequest, MethodResult)
 from jsonrpc11base.method import Method
+from jsonrpc11base.phases import PhaseClock, PhaseTimer
+from jsonrpc11base.profiling import MethodProfile
+from jsonrpc11base.allocations import AllocationTracker
+from jsonrpc11base.slowlog import SlowCallLog
+from jsonrpc11base.tracing import Tracer
+from jsonrpc11base.stats import process_stats
+import jsonrpc11base.prometheus as prometheus
+from jsonrpc11base.reload import ReloadOutcome, SchemaWatcher
+from jsonrpc11base.dispatch import (DispatchRecord, PARAMS_SCHEMA, PARAMS_ABSENT,
+                                    RESULT_SCHEMA, RESULT_ABSENT)
 
 log = logging.getLogger(__name__)
 
 
+def is_system_method_name(method_name: str) -> bool:
+    """System methods are named "system.<name>"."""
+    method_parts = method_name.split('.')
+    return len(method_parts) == 2 and method_parts[0] == 'system'
+
+
 class JSONRPCService(object):
     """
     The JSONRPCService class is a JSON-RPC 1.1 implementation
@@ -36,41 +59,125 @@ class JSONRPCService(object):
                  description: ServiceDescription,
                  schema_dir: Optional[Union[str, None]] = None,
                  validate_params: bool = False,
-                 validate_result: bool = False):
+                 validate_result: bool = False,
+                 validation_engine: str = 'jsonschema',
+                 schema_cache_dir: Optional[str] = None,
+                 lazy_schemas: bool = False,
+                 envelope_validation: str = 'native',
+                 result_validation: Optional[
+                     Union[str, sampling.ResultValidationPolicy]] = None,
+                 validation_budget: Optional[ValidationBudget] = None,
+                 validation_memo: Optional[ValidationMemo] = None,
+                 phase_timer: Optional[PhaseTimer] = None,
+                 slow_call_log: Optional[SlowCallLog] = None,
+                 profile_authorizer: Optional[Callable[[object], bool]] = None,
+                 allocation_tracker: Optional[AllocationTracker] = None,
+                 tracer: Optional[Tracer] = None,
+                 stats_authorizer: Optional[Callable[[object], bool]] = None):
         """
         Initialize a new JSONRPCService object.
 
         Args:
             description: A ServiceDescription instance
             schema_dir: A directory path in which service schemas
-                        may be found
+                        may be found, or the path of a JSON or YAML bundle file
+                        holding them all; see jsonrpc11base.validation.bundle
             validate_params: A boolean flag controlling whether parameters are
                         validated or not; defaults to False
             validate_result: A boolean flag controlling whether the result is
                         validated or not; defaults  to False
+            validation_engine: The engine used to validate against schemas;
+                        "jsonschema" (the default), "codegen", which compiles
+                        each schema into a Python function, "none", or one
+                        registered with jsonrpc11base.validation.engines. May be
+                        overridden per method. The built-in envelope and system
+                        schemas are validated with "codegen" if it is chosen,
+                        and with "jsonschema" otherwise.
+            schema_cache_dir: An optional directory in which parsed and compiled
+                        schemas are cached between processes; only the service's
+                        own user should be able to write to it
+            lazy_schemas: A boolean flag controlling whether service schemas are
+                        loaded when first used, rather than all at startup;
+                        defaults to False. See warm(). Schemas loaded on first
+                        use are written to the schema_cache_dir cache by warm()
+                        or at exit, not as they are loaded.
+            envelope_validation: How the request envelope is validated when
+                        validate_params is set; "native" (the default) uses a
+                        built-in checker, "schema" the request.json schema. Both
+                        report the same errors.
+            result_validation: The policy deciding which results are validated;
+                        "always", "never", or a policy from
+                        jsonrpc11base.validation.sampling, such as Sample(0.01).
+                        Defaults to "always" if validate_result is set, and to
+                        no validation otherwise. May be overridden per method.
+            validation_budget: Optional limits on the depth, size and time of
+                        params validation; see
+                        jsonrpc11base.validation.budget. May be overridden per
+                        method.
+            validation_memo: An optional LRU of small params known to be
+                        valid, which are then not validated again; see
+                        jsonrpc11base.validation.memo. May be overridden per
+                        method. Flushed when schemas are reloaded.
+            phase_timer: An optional PhaseTimer, which times the phases of
+                        each request (parsing, validation, the handler...); see
+                        jsonrpc11base.phases. Without one, requests are not
+                        timed.
+            slow_call_log: An optional SlowCallLog, which records calls slower
+                        than their method's threshold, with their phases and a
+                        sample of their params; see jsonrpc11base.slowlog.
+                        Calls are timed by phase_timer, or a default one.
+            profile_authorizer: Called with the options of each call of the
+                        built-in "system.profile" method, which starts and stops
+                        method profiles (see start_profile()); the call is
+                        refused unless it returns True. Without one,
+                        "system.profile" is not available.
+            allocation_tracker: An optional AllocationTracker, which measures
+                        the memory allocated by a sample of the calls of each
+                        method added, with tracemalloc; see
+                        jsonrpc11base.allocations and allocation_stats().
+            tracer: An optional Tracer, which creates a span for each request,
+                        child of the traceparent in the options or the
+                        request, and hands it to its exporters; see
+                        jsonrpc11base.tracing. Calls are timed by phase_timer,
+                        or a default one.
+            stats_authorizer: Called with the options of each call of the
+                        built-in "system.stats" method which resets the
+                        statistics; the call is refused unless it returns True.
+                        Without one, "system.stats" may not reset them.
         """
         # Initialize global jsonrpc schemas, which validate the overall
-        # JSON-RPC 1.1 structures. These schemas are built-in.
-        self.jsonrpc_schemas = Schema(os.path.abspath(
-            os.path.dirname(__file__) + '/jsonrpc_schema'))
+        # JSON-RPC 1.1 structures. These schemas are built-in, and shared
+        # by all service instances.
+        builtin_engine = 'codegen' if validation_engine == 'codegen' else 'jsonschema'
+        self.jsonrpc_schemas = builtin.jsonrpc_schemas(engine=builtin_engine,
+                                                       cache_dir=schema_cache_dir)
+
+        if envelope_validation == 'native':
+            self.validate_envelope = envelope.validate_request
+        elif envelope_validation == 'schema':
+            self.validate_envelope = functools.partial(self.jsonrpc_schemas.validate, 'request')
+        else:
+            raise ValueError(f'Unknown envelope validation "{envelope_validation}"')
 
         # Load the optional service validation jsonschemas. If no schemas
         # are provided in the schema directory, service params and results
         # are not validated.
         if schema_dir is not None:
-            self.service_validation = validation.Validation(schema_dir=schema_dir)
+            self.service_validation = validation.Validation(schema_dir=schema_dir,
+                                                            engine=validation_engine,
+                                                            cache_dir=schema_cache_dir,
+                                                            lazy=lazy_schemas)
         else:
             self.service_validation = None
 
-        system_schema_dir = os.path.abspath(
-            os.path.dirname(__file__) + '/system_schema')
-        self.system_validation = validation.Validation(schema_dir=system_schema_dir)
+        self.system_validation = builtin.system_validation(engine=builtin_engine,
+                                                           cache_dir=schema_cache_dir)
 
-        self.method_registry: Dict[str, Method] = {}
-        self.system_method_registry: Dict[str, Method] = {}
-
-        # Add the built-in "system.describe" method
-        self.add(self.handle_system_describe, 'system.describe', system=True)
+        if result_validation is not None:
+            result_validation = sampling.make_policy(result_validation)
+            validate_result = validate_result or result_validation.validates
+        elif validate_result:
+            result_validation = sampling.Always()
 
         if self.service_validation is None:
             if validate_params:
@@ -80,10 +187,56 @@ class JSONRPCService(object):
 
         self.validate_params = validate_params
         self.validate_result = validate_result
+        self.result_validation = result_validation
+        self.validation_budget = validation_budget
+        self.validation_memo = validation_memo
 
         self.description = description
 
-    def add(self, func: Callable, name: Optional[str] = None, system: bool = False):
+        self.method_registry: Dict[str, Method] = {}
+        self.system_method_registry: Dict[str, Method] = {}
+
+        # Method name -> dispatch record, for every callable method. Replaced
+        # as a whole when schemas are reloaded.
+        self.dispatch_table: Dict[str, DispatchRecord] = {}
+        # Serializes changes to the dispatch table
+        self.dispatch_lock = threading.RLock()
+
+        self.started = time.monotonic()
+        # The methods labelled by name in Prometheus metrics
+        self.metric_labels = prometheus.MethodLabels()
+
+        self.allocation_tracker = allocation_tracker
+
+        # Add the built-in "system.describe" and "system.stats" methods
+        self.add(self.handle_system_describe, 'system.describe', system=True)
+        self.add(self.handle_system_stats, 'system.stats', system=True, default_params={})
+        # Profiling may only be controlled remotely if callers can be checked.
+        self.profile_authorizer = profile_authorizer
+        self.stats_authorizer = stats_authorizer
+        if profile_authorizer is not None:
+            self.add(self.handle_system_profile, 'system.profile', system=True)
+
+        # Method name -> the method's latest profile
+        self.profiles: Dict[str, MethodProfile] = {}
+        self.profiles_lock = threading.Lock()
+
+        # Timing is chosen here, rather than checked on every request.
+        if (slow_call_log is not None or tracer is not None) and phase_timer is None:
+            phase_timer = PhaseTimer()
+        if slow_call_log is not None:
+            phase_timer.slow_call_log = slow_call_log
+        if tracer is not None:
+            phase_timer.tracer = tracer
+        self.phase_timer = phase_timer
+
+    def add(self, func: Callable, name: Optional[str] = None, system: bool = False,
+            result_validation: Optional[Union[str, sampling.ResultValidationPolicy]] = None,
+            from_annotations: bool = False,
+            validation_budget: Optional[ValidationBudget] = None,
+            validation_engine: Optional[str] = None,
+            validation_memo: Optional[ValidationMemo] = None,
+            default_params: Optional[dict] = None):
         """
         Adds a new method to the jsonrpc service. If name argument is not
         given, function's own name will be used.
@@ -94,13 +247,339 @@ class JSONRPCService(object):
         Args:
             func: required python function handler to call for this method
             name: name of the method (optional, defaults to the function's name)
+            result_validation: the result validation policy for this method
+                (optional, defaults to the service's)
+            from_annotations: validate params, and results if result validation
+                is enabled, against the handler's type hints rather than schema
+                files. Where a hint is missing or not supported, the schema file
+                is used. Params are validated from hints even with no schema_dir.
+            validation_budget: limits on validating this method's params
+                (optional, defaults to the service's)
+            validation_engine: the name of the engine validating this method's
+                params and result against their schemas (optional, defaults to
+                the service's)
+            validation_memo: the memo of valid params for this method
+                (optional, defaults to the service's)
+            default_params: the params the handler is given, and which are
+                validated, when a call gives none (optional; without them,
+                a method with a params schema requires params)
+
+        Raises:
+            DuplicateMethodName: A method of the same name was already added
+            MissingSchemaError: Validation is enabled, but the method does
+                not have the schemas it requires
         """
         function_name = name if name else func.__name__
         registry = self.method_registry if not system else self.system_method_registry
-        if function_name in registry:
-            msg = f'Method "{function_name}" already registered'
-            raise exceptions.DuplicateMethodName(msg)
-        registry[function_name] = Method(func)
+        if result_validation is not None:
+            result_validation = sampling.make_policy(result_validation)
+        add_options = {
+            'result_validation': result_validation,
+            'from_annotations': from_annotations,
+            'validation_budget': validation_budget,
+            'validation_engine': validation_engine,
+            'validation_memo': validation_memo,
+            'default_params': default_params
+        }
+        with self.dispatch_lock:
+            if function_name in registry:
+                msg = f'Method "{function_name}" already registered'
+                raise exceptions.DuplicateMethodName(msg)
+            method = Method(func)
+            if self.allocation_tracker is not None and not system:
+                self.allocation_tracker.install(function_name, method)
+            record = self.make_dispatch_record(function_name, method, system, **add_options)
+            record.add_options = add_options
+            registry[function_name] = method
+            # Only methods whose name matches the registry they are in may be called.
+            if is_system_method_name(function_name) == system:
+                self.dispatch_table[function_name] = record
+
+    def make_dispatch_record(self, method_name: str, method: Method, system: bool,
+                             result_validation: Optional[
+                                 sampling.ResultValidationPolicy] = None,
+                             from_annotations: bool = False,
+                             validation_budget: Optional[ValidationBudget] = None,
+                             validation_engine: Optional[str] = None,
+                             validation_memo: Optional[ValidationMemo] = None,
+                             default_params: Optional[dict] = None,
+                             service_validation: Optional[validation.Validation] = None
+                             ) -> DispatchRecord:
+        """
+        Resolves how a method's params and result are validated; against
+        service_validation, if given, rather than the service's own.
+        """
+        if service_validation is None:
+            service_validation = self.service_validation
+        validator = self.system_validation if system else service_validation
+        if result_validation is None:
+            result_validation = self.result_validation
+        record = DispatchRecord(method_name, method, system)
+        record.default_params = default_params
+
+        if validation_budget is None:
+            validation_budget = self.validation_budget
+        # Only a budget with a time limit needs validators checking the time.
+        timed = validation_budget is not None and validation_budget.max_time is not None
+
+        params_from_hints = None
+        result_from_hints = None
+        if from_annotations:
+            func = method.method_implementation
+            params_from_hints = annotations.params_validator(method_name, func, timed)
+            if result_validation is not None and result_validation.validates:
+                result_from_hints = annotations.result_validator(method_name, func)
+
+        if params_from_hints is not None:
+            record.params_policy = PARAMS_SCHEMA
+            record.params_validator = validation.as_params_validator(params_from_hints)
+        elif validator is not None:
+            self.resolve_params_schema(record, validator, validation_engine, timed)
+
+        if validation_budget is not None and record.params_policy is PARAMS_SCHEMA:
+            record.params_validator = validation_budget.params_validator(record.params_validator)
+
+        if validation_memo is None:
+            validation_memo = self.validation_memo
+        if validation_memo is not None and record.params_policy is PARAMS_SCHEMA:
+            record.params_memo = validation_memo.params_validator(method_name,
+                                                                  record.params_validator)
+            record.params_validator = record.params_memo
+
+        if result_validation is None or not result_validation.validates:
+            return record
+        if result_from_hints is not None:
+            record.result_policy = RESULT_SCHEMA
+            record.result_validator = validation.as_result_validator(result_from_hints)
+        elif validator is None:
+            raise TypeError('May not validate result with no schema_dir provided')
+        else:
+            self.resolve_result_schema(record, validator, validation_engine)
+        # Results are validated and enforced without sampling by default.
+        if not (type(result_validation) is sampling.Always and result_validation.enforce):
+            record.result_sampler = result_validation.for_method()
+        return record
+
+    def resolve_params_schema(self, record: DispatchRecord,
+                              validator: validation.Validation,
+                              validation_engine: Optional[str] = None,
+                              timed: bool = False):
+        method_name = record.name
+        params_kind = validator.params_kind(method_name)
+        if params_kind == 'schema':
+            record.params_policy = PARAMS_SCHEMA
+            record.params_validator = validator.params_validator(
+                method_name, validation_engine, timed)
+        elif params_kind == 'absent':
+            record.params_policy = PARAMS_ABSENT
+        else:
+            # If validation is provided, all methods must have validation.
+            raise exceptions.MissingSchemaError(
+                'Validation is enabled, but no parameter validator was provided '
+                f'for method "{method_name}"')
+
+    def resolve_result_schema(self, record: DispatchRecord,
+                              validator: validation.Validation,
+                              validation_engine: Optional[str] = None):
+        method_name = record.name
+        result_kind = validator.result_kind(method_name)
+        if result_kind == 'schema':
+            record.result_policy = RESULT_SCHEMA
+            record.result_validator = validator.result_validator(
+                method_name, validation_engine)
+        elif result_kind == 'absent':
+            record.result_policy = RESULT_ABSENT
+        else:
+            raise exceptions.MissingSchemaError(
+                'Validation is enabled, but no result validator was provided '
+                f'for method "{method_name}"')
+
+    def method_stats(self, reset: bool = False, prefix: str = '') -> dict:
+        """
+        Returns the call statistics of each method; see Method.snapshot().
+
+        Args:
+            reset: Clear the statistics once they are taken
+            prefix: Only the methods whose names start with this
+        """
+        methods = dict(self.method_registry)
+        methods.update(self.system_method_registry)
+        return {name: method.snapshot(reset=reset) for name, method in methods.items()
+                if name.startswith(prefix)}
+
+    def prometheus_metrics(self, max_methods: int = 100) -> str:
+        """
+        Returns the request and call counts, error counts by JSON-RPC error
+        code, and latency histograms of the methods, in the Prometheus text
+        format; see jsonrpc11base.prometheus.
+
+        Args:
+            max_methods: The most methods labelled with their names, the first
+                seen, for the life of the service; the rest are counted
+                together as "__other__"
+        """
+        return prometheus.render(self, max_methods=max_methods)
+
+    def phase_stats(self, reset: bool = False) -> dict:
+        """
+        Returns the latency of each phase of requests, overall and per method;
+        see PhaseTimer.stats(). Empty if the service has no phase_timer.
+
+        Args:
+            reset: Clear the statistics once they are taken
+        """
+        if self.phase_timer is None:
+            return {}
+        return self.phase_timer.stats(reset=reset)
+
+    def start_profile(self, method_name: str, calls: Optional[int] = None,
+                      seconds: Optional[float] = None, mode: str = 'deterministic',
+                      interval: float = 0.005) -> MethodProfile:
+        """
+        Starts profiling a method's calls; see jsonrpc11base.profiling. Only
+        that method's calls are slowed, and only while the profile runs.
+
+        Args:
+            method_name: The name of the method
+            calls: The most calls profiled
+            seconds: The longest the profile runs; at least one of calls and
+                seconds must be given
+            mode: "deterministic" (cProfile) or "sampling"
+            interval: The interval between samples, in seconds, in sampling mode
+
+        Returns:
+            The MethodProfile, whose result() holds the pstats report and
+            collapsed stacks
+
+        Raises:
+            MethodNotFoundError: If there is no such method
+            ValueError: If the method is being profiled, or the limits are invalid
+        """
+        record = self.find_method(method_name)
+        profile = MethodProfile(method_name, calls=calls, seconds=seconds, mode=mode,
+                                interval=interval)
+        with self.profiles_lock:
+            current = self.profiles.get(method_name)
+            if current is not None and current.active:
+                raise ValueError(f'Method "{method_name}" is already being profiled')
+            profile.install(record.method)
+            self.profiles[method_name] = profile
+        return profile
+
+    def stop_profile(self, method_name: str) -> Optional[MethodProfile]:
+        """Stops profiling a method; returns its latest profile, if any."""
+        profile = self.profiles.get(method_name)
+        if profile is not None:
+            profile.stop()
+        return profile
+
+    def profile(self, method_name: str) -> Optional[MethodProfile]:
+        """Returns a method's latest profile, running or ended, if any."""
+        return self.profiles.get(method_name)
+
+    def allocation_stats(self, reset: bool = False, prefix: str = '') -> dict:
+        """
+        Returns the memory allocated by the measured calls of each method; see
+        AllocationTracker.stats(). Empty if the service has no
+        allocation_tracker.
+
+        Args:
+            reset: Clear the statistics once they are taken
+            prefix: Only the methods whose names start with this
+        """
+        if self.allocation_tracker is None:
+            return {}
+        return self.allocation_tracker.stats(prefix=prefix, reset=reset)
+
+    def result_validation_stats(self) -> dict:
+        """
+        Returns, for each method whose results are sampled, how many results
+        were validated and how many violated the result schema.
+        """
+        return {name: record.result_sampler.stats()
+                for name, record in self.dispatch_table.items()
+                if record.result_sampler is not None}
+
+    def validation_memo_stats(self) -> dict:
+        """
+        Returns, for each method whose params are memoized, how many params
+        were found in the memo, validated, or too large to memoize.
+        """
+        return {name: record.params_memo.stats()
+                for name, record in self.dispatch_table.items()
+                if record.params_memo is not None}
+
+    def reload_schemas(self) -> ReloadOutcome:
+        """
+        Reloads the service schemas, recompiling only those which changed, and
+        rebuilds the dispatch records of the methods. The new records replace
+        the old all at once, so a call sees either the old schemas or the new.
+        If the new schemas cannot be loaded, or a method no longer has the
+        schemas it requires, the old ones are kept, and the error returned.
+
+        Returns:
+            A ReloadOutcome
+        """
+        outcome = ReloadOutcome()
+        if self.service_validation is None:
+            return outcome.done()
+        with self.dispatch_lock:
+            try:
+                service_validation = self.service_validation.reloaded()
+                dispatch_table = {}
+                for name, record in self.dispatch_table.items():
+                    if record.is_system:
+                        dispatch_table[name] = record
+                        continue
+                    new_record = self.make_dispatch_record(
+                        name, record.method, record.is_system,
+                        service_validation=service_validation, **record.add_options)
+                    new_record.add_options = record.add_options
+                    dispatch_table[name] = new_record
+            except Exception as ex:
+                return outcome.done(error=ex)
+            schema = service_validation.schema
+            outcome.changed = schema.changes(self.service_validation.schema)
+            outcome.recompiled = sorted(set(schema.schemas) - schema.reused)
+            self.service_validation = service_validation
+            old_table, self.dispatch_table = self.dispatch_table, dispatch_table
+        # Params remembered as valid by the old schemas are forgotten.
+        for record in old_table.values():
+            if record.params_memo is not None and not record.is_system:
+                record.params_memo.memo.clear()
+        return outcome.done()
+
+    def watch_schemas(self, interval: float = 1.0,
+                      on_reload: Optional[Callable[[ReloadOutcome], None]] = None
+                      ) -> SchemaWatcher:
+        """
+        Starts a background thread which polls the service schemas for changes
+        every interval seconds, and reloads them when they change; see
+        reload_schemas().
+
+        Args:
+            interval: seconds between polls
+            on_reload: called with the ReloadOutcome of each reload
+
+        Returns:
+            The SchemaWatcher, which may be stopped with stop()
+        """
+        if self.service_validation is None:
+            raise TypeError('May not watch schemas with no schema_dir provided')
+        watcher = SchemaWatcher(self, interval=interval, on_reload=on_reload)
+        watcher.start()
+        return watcher
+
+    def warm(self, method_names):
+        """
+        Loads the schemas for the given methods now, rather than when they are
+        first called. Only useful with lazy_schemas.
+
+        Args:
+            method_names: the names of the methods whose schemas to load
+        """
+        if self.service_validation is not None:
+            self.service_validation.warm(method_names)
 
     def call(self, jsondata: str, options=None) -> str:
         """
@@ -115,67 +594,65 @@ class JSONRPCService(object):
             The JSON-RPC 1.1 response as a raw JSON string.
             Will not throw an exception.
         """
+        if self.phase_timer is not None:
+            return self.phase_timer.call(self, jsondata, options)
         try:
             request_data = json.loads(jsondata)
         except ValueError as err:
-            resp = make_jsonrpc_error_response(
-                make_standard_jsonrpc_error(-32700, error={'message': str(err)}))
-            return json.dumps(resp)
+            return json.dumps(make_parse_error_response(err))
 
         result = self.call_py(request_data, options)
         if result is not None:
             return json.dumps(result)
 
-    def find_method(self, method_name):
-        method_parts = method_name.split('.')
-
-        is_system_method = False
-        if len(method_parts) == 2:
-            if method_parts[0] == 'system':
-                is_system_method = True
-
-        registry = self.method_registry if not is_system_method else self.system_method_registry
-
-        if method_name not in registry:
+    def find_method(self, method_name) -> DispatchRecord:
+        record = self.dispatch_table.get(method_name)
+        if record is None:
+            is_system_method = is_system_method_name(method_name)
+            registry = (self.method_registry if not is_system_method
+                        else self.system_method_registry)
             methods = list(registry.keys())
             raise MethodNotFoundError(method=method_name, available_methods=methods)
+        return record
 
-        return [registry[method_name], is_system_method]
-
-    # Wraps the process of method invocation and validation
-    def do_method(self, method_name, params, options):
-        method, is_system_method = self.find_method(method_name)
-
-        if is_system_method:
-            validator = self.system_validation
-        else:
-            validator = self.service_validation
-
-        if validator is not None:
-            if validator.has_params_validation(method_name):
-                if params is None:
-                    raise InvalidParamsError(
-                        message='Method has parameters specified, but none were provided'
-                    )
-                else:
-                    validator.validate_params(method_name, params)
-                    return [method.call(params, options), is_system_method]
-            elif validator.has_absent_params_validation(method_name):
-                if params is None:
-                    validator.validate_absent_params(method_name)
-                    return [method.call(None, options), is_system_method]
-                else:
-                    raise InvalidParamsError(
-                        message=('Method has no parameters specified, '
-                                 'but arguments were provided')
-                    )
-            else:
-                # If validation is provided, all methods must have validation.
+    # Wraps the process of params validation
+    def do_params(self, record: DispatchRecord, params):
+        params_policy = record.params_policy
+        if params_policy is PARAMS_SCHEMA:
+            if params is None:
                 raise InvalidParamsError(
-                    message='Validation is enabled, but no parameter validator was provided'
+                    message='Method has parameters specified, but none were provided'
+                )
+            record.params_validator(params)
+        elif params_policy is PARAMS_ABSENT:
+            if params is not None:
+                raise InvalidParamsError(
+                    message=('Method has no parameters specified, '
+                             'but arguments were provided')
                 )
-        else:
-            return [method.call(params, options), is_system_method]
+
+    # Wraps the process of results validation
+    def do_result(self, record: DispatchRecord, result):
+        result_policy = record.result_policy
+        if result_policy is RESULT_SCHEMA:
+            sampler = record.result_sampler
+            if sampler is None:
+                record.result_validator(result)
+            elif sampler.should_validate():
+                sampler.check(record, result)
+        elif result_policy is RESULT_ABSENT:
+            # If the method should have no result, we just set it to null.
+            # JSONRPC 1.1 mentions the value 'nil' for methods without a result
+            # value, but the result is also required, so we need to populate
+            # it with something ... null is a good choice.
+            # The caller should ignore the value.
+            if result is not None:
+                raise InvalidResultServerError(
+                    message=('The method is specified to not return a result, '
+                             'yet a value was returned'),
+                    value=result
+                )
+        return result
 
     def call_py(self, req_data: MethodRequest, options=None) -> MethodResult:
         """
@@ -193,22 +670,35 @@ class JSONRPCService(object):
             The JSON-RPC 1.1 response as a python object.
             Will not throw an exception.
         """
+        if self.phase_timer is not None:
+            return self.phase_timer.call_py(self, req_data, options)
+        return self.handle_request(req_data, options)[0]
+
+    def handle_request(self, req_data: MethodRequest, options=None,
+                       clock: Optional[PhaseClock] = None):
+        """
+        Handles a request for call() and call_py(), whether timed or not.
+
+        Args:
+            req_data: JSON-RPC 1.1 request data as a python object
+            options: The options passed to the method
+            clock: A PhaseClock, which is told as each phase of the request
+                ends, if the request is timed; see jsonrpc11base.phases
+
+        Returns:
+            The JSON-RPC 1.1 response as a python object, and the dispatch
+            record of the method called, or None if it was not found.
+        """
         # Validate the request data using a json-schema
         try:
             if self.validate_params:
-                self.jsonrpc_schemas.validate('request', req_data)
+                self.validate_envelope(req_data)
         except SchemaError as ex:
-            error = make_standard_jsonrpc_error(-32600, error={
-                'message': ex.message,
-                'path': ex.path,
-                'value': ex.value
-            })
-            # May seem pointless, but in case the request does not validate, yet it is an
-            # object, it might have an id  to use in the response.
-            if isinstance(req_data, dict):
-                return make_jsonrpc_error_response(error, req_data.get('id'))
-            else:
-                return make_jsonrpc_error_response(error)
+            if clock is not None:
+                clock.lap('envelope')
+            return make_envelope_error_response(req_data, ex), None
+        if clock is not None:
+            clock.lap('envelope')
 
         request_id = req_data.get('id')
 
@@ -224,93 +714,42 @@ class JSONRPCService(object):
         # imo misuse of None for JSON null)
         params = req_data.get('params')
 
-        # Wraps the process of results validation
-        def do_result(result, system_method):
-            if not self.validate_result:
-                return result
-
-            if system_method:
-                validator = self.system_validation
-            else:
-                validator = self.service_validation
-
-            if not validator.has_result_validation(method_name):
-                # If validation is provided, all methods must have validation.
-                raise InvalidParamsError(
-                    message='Validation is enabled, but no result validator was provided'
-                )
-
-            if validator.has_absent_result_validation(method_name):
-                # If the method should have no result, we just set it to null.
-                # JSONRPC 1.1 mentions the value 'nil' for methods without a result
-                # value, but the result is also required, so we need to populate
-                # it with something ... null is a good choice.
-                # The caller should ignore the value.
-                if result is None:
-                    return None
-                else:
-                    raise InvalidResultServerError(
-                        message=('The method is specified to not return a result, '
-                                 'yet a value was returned'),
-                        value=result
-                    )
-
-            validator.validate_result(method_name, result)
-            return result
-
-        # Wraps the process of creating a result
-        def make_result_response(result):
-            response_data = {
-                'version': '1.1',
-                'result': result
-            }
-            if request_id is not None:
-                response_data['id'] = request_id
-            return response_data
-
-        # Wraps error object construction
-        def make_error_response(error_data):
-            # From closure
-            if 'error' not in error_data:
-                error_data['error'] = {}
-            error_data['error']['method'] = method_name
-
-            return make_jsonrpc_error_response(error_data, request_id)
-
+        record = None
+        phase = 'params'
         try:
-            result, system_method = self.do_method(method_name, params, options)
-            return make_result_response(do_result(result, system_method))
-        # Covers a method throwing any specific jsonrpc predefined
-        # exception.
-        except JSONRPCError as e:
-            return make_error_response(e.to_json())
-        # Covers a method throwing a jsonrpc error which is not
-        # within the range of predefined jsonrpc errors
-        except APIError as e:
-            # Which, sigh, itself may be an error if the app used
-            # an error code within the reserved range.
-            if -32768 <= e.code <= -32000:
-                err = ReservedErrorCodeServerError(
-                    message=(
-                        'An error code  was issued by the api which conflicts with ',
-                        'the reserved range between -32768 and -3200'
-                    ),
-                    bad_code=e.code
-                )
-                return make_error_response(err.to_json())
-            else:
-                return make_error_response(e.to_json())
-        # Finally, catch any programming errors
+            record = self.find_method(method_name)
+            if params is None and record.default_params is not None:
+                params = copy.deepcopy(record.default_params)
+            self.do_params(record, params)
+            if clock is not None:
+                clock.lap(phase)
+            phase = 'handler'
+            result = record.method.call(params, options)
+            if clock is not None:
+                clock.lap(phase)
+            phase = 'result'
+            result = self.do_result(record, result)
+            if clock is not None:
+                clock.lap(phase)
+            return make_result_response(result, request_id), record
         except Exception as ex:
-            message = getattr(ex, 'message', str(ex))
-            error = {'message': ('An unexpected exception was caught '
-                                 'executing the method'),
-                     'exception_message': message or 'Unknown exception',
-                     'traceback': traceback.format_exc(limit=1000).split('\n')}
-            error = make_custom_jsonrpc_error(-32002,
-                                              message='Exception calling method',
-                                              error=error)
-            return make_error_response(error)
+            if clock is not None:
+                clock.lap(phase)
+            response = self.make_error_response(ex, record, method_name, request_id,
+                                                rejected=phase == 'params')
+            return response, record
+
+    def make_error_response(self, ex: Exception, record: Optional[DispatchRecord],
+                            method_name: str, request_id, rejected: bool = False):
+        """
+        The response to a call which failed, counted by error code for its
+        method, if it was found, and as rejected if the method was not
+        called. Must be called while the exception is handled.
+        """
+        response = make_method_error_response(ex, method_name, request_id)
+        if record is not None:
+            record.method.count_error_code(response['error']['code'], rejected)
+        return response
 
     # TODO: break off into a service class
 
@@ -321,3 +760,75 @@ class JSONRPCService(object):
         Built-in method handler that shows all methods and type schemas for the service in a dict.
         """
         return self.description.to_json()
+
+    def handle_system_stats(self, params, options) -> dict:
+        """
+        Built-in method handler that reports the call statistics of the service's
+        methods (see method_stats()), and figures for the process.
+
+        The params, which may be omitted, may have a "prefix", reporting only
+        the methods whose names start with it, and "reset", clearing the
+        statistics reported, if stats_authorizer allows it; otherwise a
+        reset is refused. The validation time of a method, and the time of
+        each phase of its calls, are only known with a phase_timer, and the
+        memory its calls allocate with an allocation_tracker.
+        """
+        prefix = params.get('prefix', '')
+        reset = params.get('reset', False)
+        if reset and (self.stats_authorizer is None
+                      or self.stats_authorizer(options) is not True):
+            raise NotAuthorizedServerError('Not authorized to reset statistics')
+        methods = self.method_stats(reset=reset, prefix=prefix)
+        if self.phase_timer is not None:
+            phases = self.phase_timer.method_stats(prefix=prefix, reset=reset)
+        else:
+            phases = None
+        for name, stats in methods.items():
+            if phases is None:
+                stats['validation_time'] = None
+                continue
+            method_phases = phases.get(name, {})
+            stats['phases'] = method_phases
+            stats['validation_time'] = sum(method_phases[phase]['total']
+                                           for phase in ('params', 'result')
+                                           if phase in method_phases)
+        if self.allocation_tracker is not None:
+            allocations = self.allocation_stats(reset=reset, prefix=prefix)
+            for name, stats in methods.items():
+                if name in allocations:
+                    stats['allocations'] = allocations[name]
+        process = process_stats()
+        process['uptime'] = time.monotonic() - self.started
+        return {
+            'methods': methods,
+            'process': process
+        }
+
+    def handle_system_profile(self, params, options) -> dict:
+        """
+        Built-in method handler that starts, stops, or reports a method
+        profile (see start_profile()), if profile_authorizer allows the call.
+
+        The params name the "method", and the "action": "start" (with
+        "calls" and/or "seconds", and optionally "mode" and "interval"),
+        "stop" or "status". The result is that of MethodProfile.result().
+        """
+        if self.profile_authorizer(options) is not True:
+            raise NotAuthorizedServerError('Not authorized to profile methods')
+        method_name = params['method']
+        action = params['action']
+        if action == 'start':
+            try:
+                profile = self.start_profile(method_name, calls=params.get('calls'),
+                                             seconds=params.get('seconds'),
+                                             mode=params.get('mode', 'deterministic'),
+                                             interval=params.get('interval', 0.005))
+            except ValueError as ex:
+                raise InvalidParamsError(message=str(ex))
+        elif action == 'stop':
+            profile = self.stop_profile(method_name)
+        else:
+            profile = self.profile(method_name)
+        if profile is None:
+            raise InvalidParamsError(message=f'Method "{method_name}" has not been profiled')
+        return profile.result()
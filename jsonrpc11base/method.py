@@ -1,32 +1,147 @@
-from typing import Callable
+from typing import Callable, Dict
+import itertools
+import threading
 import time
 
+from jsonrpc11base.stats import LatencyHistogram
+
 
 class Method(object):
     """
     Method function handler, and any other metadata we may need in the future
+
+    Each call is counted, and its duration recorded (with time.perf_counter_ns)
+    in cumulative_call_time_ns and a latency histogram, whether it returns or
+    raises; errors are also counted by exception class. See snapshot().
+    in_flight is the number of calls running: those started, counted without
+    the lock, less those finished. stats_lock is taken once per call, as it
+    ends. The service counts the error
+    responses to calls of the method by JSON-RPC error code, whether the
+    method raised them or not (such as invalid params), and the requests
+    rejected before the method was called in rejected_count; see
+    count_error_code().
     """
     method_implementation: Callable
     call_count: int
-    cumulative_call_time: float
+    cumulative_call_time_ns: int
     error_count: int
+    errors_by_class: Dict[str, int]
+    errors_by_code: Dict[str, int]
+    rejected_count: int
+    latency: LatencyHistogram
 
     def __init__(self, method: Callable):
         self.method_implementation = method
-        self.call_count = 0
-        self.cumulative_call_time = 0
-        self.error_count = 0
+        self.stats_lock = threading.Lock()
+        # Calls started; itertools.count is atomic, so no lock is needed. It
+        # can only be read by next(), so its reads are counted, to be
+        # taken off, in starts_read.
+        self.starts = itertools.count()
+        self.starts_read = 0
+        # Calls finished, never reset
+        self.finished = 0
+        self.clear()
+
+    @property
+    def cumulative_call_time(self) -> float:
+        """The total time spent in calls, in seconds."""
+        return self.cumulative_call_time_ns / 1e9
+
+    @property
+    def in_flight(self) -> int:
+        """The number of calls running."""
+        with self.stats_lock:
+            return self.count_in_flight()
+
+    def count_in_flight(self) -> int:
+        """The number of calls running; stats_lock must be held."""
+        started = next(self.starts) - self.starts_read
+        self.starts_read += 1
+        return started - self.finished
 
     def call(self, params, options):
-        self.call_count += 1
-        call_started = time.time()
+        next(self.starts)
+        call_started = time.perf_counter_ns()
         try:
             if params is None:
                 result = self.method_implementation(options)
             else:
                 result = self.method_implementation(params, options)
-            self.cumulative_call_time = time.time() - call_started
-            return result
         except Exception as e:
-            self.error_count = 0
-            raise e
+            self.record(time.perf_counter_ns() - call_started, e)
+            raise
+        self.record(time.perf_counter_ns() - call_started)
+        return result
+
+    def record(self, duration_ns: int, error: Exception = None):
+        with self.stats_lock:
+            self.finished += 1
+            self.call_count += 1
+            self.cumulative_call_time_ns += duration_ns
+            self.latency.record(duration_ns)
+            if error is not None:
+                self.error_count += 1
+                error_class = type(error).__name__
+                self.errors_by_class[error_class] = self.errors_by_class.get(error_class, 0) + 1
+
+    def count_error_code(self, code: int, rejected: bool = False):
+        """
+        Counts an error response to a call of the method; rejected is whether
+        the request was refused before the method was called.
+        """
+        code = str(code)
+        with self.stats_lock:
+            self.errors_by_code[code] = self.errors_by_code.get(code, 0) + 1
+            if rejected:
+                self.rejected_count += 1
+
+    def reset(self):
+        """Clears the statistics."""
+        with self.stats_lock:
+            self.clear()
+
+    def clear(self):
+        """Clears the statistics, but for in_flight; stats_lock must be held."""
+        self.call_count = 0
+        self.cumulative_call_time_ns = 0
+        self.error_count = 0
+        self.errors_by_class = {}
+        self.errors_by_code = {}
+        self.rejected_count = 0
+        self.latency = LatencyHistogram()
+
+    def take(self, reset: bool = False):
+        """
+        Returns the counts and cumulative time, and a copy of the latency
+        histogram, as of one moment; with reset, they are cleared in the same
+        step, so no call is missed or counted twice between snapshots.
+        """
+        with self.stats_lock:
+            latency = self.latency
+            counts = {
+                'call_count': self.call_count,
+                'error_count': self.error_count,
+                'errors_by_class': dict(self.errors_by_class),
+                'errors_by_code': dict(self.errors_by_code),
+                'rejected_count': self.rejected_count,
+                'in_flight': self.count_in_flight(),
+                'cumulative_call_time': self.cumulative_call_time_ns / 1e9
+            }
+            if reset:
+                self.clear()
+            else:
+                latency = latency.copy()
+        return counts, latency
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """
+        Returns the statistics: call and error counts, errors by class and by
+        error code, the count of requests rejected, and the cumulative time
+        and latency percentiles in seconds; see take().
+        """
+        snapshot, latency = self.take(reset)
+        # Summarized outside the lock; the histogram is no longer updated.
+        summary = latency.summary()
+        for name in ('mean', 'p50', 'p90', 'p99', 'max'):
+            snapshot[name] = summary[name]
+        return snapshot
@@ -0,0 +1,220 @@
+"""
+Per-phase request timing
+
+A PhaseTimer breaks the time taken by each request down into phases:
+
+- decode: parsing the JSON request (call() only)
+- envelope: validating the request envelope
+- params: finding the method, and validating the params
+- handler: running the method
+- result: validating the result
+- encode: serializing the JSON response (call() only)
+
+and the total. A phase which fails is timed up to the failure, and the phases
+after it are not timed. Durations are aggregated into latency histograms (see
+jsonrpc11base.stats) per method, and over all requests. The breakdown of each
+request, in seconds, may also be attached to its options, or passed to a
+callback, slow calls recorded by a SlowCallLog (see
+jsonrpc11base.slowlog), and each request traced by a Tracer (see
+jsonrpc11base.tracing).
+
+A service given a PhaseTimer hands its requests to the timer's call() and
+call_py(), which parse and serialize them themselves, and have the service
+handle them with JSONRPCService.handle_request(), given a PhaseClock. A
+service without one runs no more timing code than a check for the timer. A
+subclass overriding call() or call_py() overrides both paths; the steps they
+share are those of handle_request().
+"""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from jsonrpc11base.responses import make_parse_error_response
+from jsonrpc11base.slowlog import SlowCallLog
+from jsonrpc11base.stats import LatencyHistogram
+from jsonrpc11base.tracing import Tracer
+
+log = logging.getLogger(__name__)
+
+PHASES = ('decode', 'envelope', 'params', 'handler', 'result', 'encode', 'total')
+
+# The options key, or attribute, the breakdown is attached to
+OPTIONS_KEY = 'phases'
+
+
+class PhaseClock(object):
+    """Records the durations of the phases of a request, in nanoseconds, as they end."""
+    def __init__(self):
+        self.timings = {}
+        self.started = self.mark = time.perf_counter_ns()
+
+    def lap(self, phase: str):
+        """Ends a phase, which began when the one before it ended."""
+        now = time.perf_counter_ns()
+        self.timings[phase] = now - self.mark
+        self.mark = now
+
+
+class PhaseTimer(object):
+    """
+    Times the phases of a service's requests.
+
+    Args:
+        attach_to_options: set the breakdown of each request, a dict of phase
+            name to seconds, as options['phases'] if options is a dict, and
+            as options.phases otherwise; it is filled in once the request is
+            done. Requests without options, or with options which take no
+            attributes, such as strings, are not given one.
+        on_request: called after each request with the name of the method
+            called (None if the request did not get as far as finding it) and
+            the breakdown
+        slow_call_log: records calls of methods slower than their threshold
+        tracer: traces each request
+    """
+    def __init__(self, attach_to_options: bool = False,
+                 on_request: Optional[Callable[[Optional[str], Dict[str, float]], None]] = None,
+                 slow_call_log: Optional[SlowCallLog] = None,
+                 tracer: Optional[Tracer] = None):
+        self.attach_to_options = attach_to_options
+        self.on_request = on_request
+        self.slow_call_log = slow_call_log
+        self.tracer = tracer
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Clears the statistics; lock must be held, unless not yet shared."""
+        self.overall = {phase: LatencyHistogram() for phase in PHASES}
+        self.methods = {}
+
+    def call(self, service, jsondata: str, options=None) -> str:
+        """A timed JSONRPCService.call()."""
+        breakdown = self.attach(options)
+        clock = PhaseClock()
+        span = self.tracer.start(options) if self.tracer is not None else None
+        record = None
+        request_data = None
+        response = None
+        raised = True
+        try:
+            try:
+                request_data = json.loads(jsondata)
+            except ValueError as err:
+                clock.lap('decode')
+                response = make_parse_error_response(err)
+            else:
+                clock.lap('decode')
+                if span is not None:
+                    request_data = self.tracer.adopt(span, request_data)
+                response, record = service.handle_request(request_data, options, clock)
+            response_data = json.dumps(response) if response is not None else None
+            clock.lap('encode')
+            raised = False
+        finally:
+            self.finish(record, request_data, clock.timings, breakdown, clock.started, span,
+                        response, raised)
+        return response_data
+
+    def call_py(self, service, req_data, options=None):
+        """A timed JSONRPCService.call_py()."""
+        breakdown = self.attach(options)
+        clock = PhaseClock()
+        span = self.tracer.start(options) if self.tracer is not None else None
+        record = None
+        response = None
+        raised = True
+        try:
+            if span is not None:
+                req_data = self.tracer.adopt(span, req_data)
+            response, record = service.handle_request(req_data, options, clock)
+            raised = False
+        finally:
+            self.finish(record, req_data, clock.timings, breakdown, clock.started, span,
+                        response, raised)
+        return response
+
+    def attach(self, options) -> dict:
+        breakdown = {}
+        if self.attach_to_options and options is not None:
+            if isinstance(options, dict):
+                options[OPTIONS_KEY] = breakdown
+            else:
+                try:
+                    setattr(options, OPTIONS_KEY, breakdown)
+                except (AttributeError, TypeError):
+                    # Such as strings, which take no attributes
+                    pass
+        return breakdown
+
+    def finish(self, record, req_data, timings, breakdown, started, span=None, response=None,
+               raised=False):
+        """
+        Records a request's timings, and ends its span, even if handling it
+        raised, as it may with validate_params off and a malformed request;
+        the phases it did not finish are then left out.
+        """
+        timings['total'] = time.perf_counter_ns() - started
+        method_name = record.name if record is not None else None
+        with self.lock:
+            for phase, duration in timings.items():
+                self.overall[phase].record(duration)
+            if method_name is not None:
+                histograms = self.methods.get(method_name)
+                if histograms is None:
+                    histograms = self.methods[method_name] = {}
+                for phase, duration in timings.items():
+                    histogram = histograms.get(phase)
+                    if histogram is None:
+                        histogram = histograms[phase] = LatencyHistogram()
+                    histogram.record(duration)
+        for phase, duration in timings.items():
+            breakdown[phase] = duration / 1e9
+        if self.on_request is not None:
+            try:
+                self.on_request(method_name, breakdown)
+            except Exception:
+                log.exception('Phase timing callback failed')
+        if self.slow_call_log is not None and method_name is not None:
+            self.slow_call_log.check(method_name, req_data, timings)
+        if span is not None:
+            self.tracer.end(span, record, req_data, response, timings, raised)
+
+    def stats(self, reset: bool = False) -> dict:
+        """
+        Returns the latency summary (see LatencyHistogram.summary()) of each
+        phase timed, over all requests ("overall"), and per method
+        ("methods"). With reset, the statistics are cleared in the same step.
+        """
+        with self.lock:
+            overall, methods = self.overall, self.methods
+            if reset:
+                self.clear()
+            else:
+                overall = {phase: histogram.copy() for phase, histogram in overall.items()}
+                methods = {name: {phase: histogram.copy() for phase, histogram in phases.items()}
+                           for name, phases in methods.items()}
+        return {
+            'overall': {phase: histogram.summary() for phase, histogram in overall.items()
+                        if histogram.count > 0},
+            'methods': {name: {phase: histogram.summary() for phase, histogram in phases.items()}
+                        for name, phases in methods.items()}
+        }
+
+    def method_stats(self, prefix: str = '', reset: bool = False) -> dict:
+        """
+        Returns the latency summary of each phase timed for the methods whose
+        names start with prefix; with reset, theirs are cleared.
+        """
+        with self.lock:
+            methods = {name: phases for name, phases in self.methods.items()
+                       if name.startswith(prefix)}
+            if reset:
+                for name in methods:
+                    del self.methods[name]
+            else:
+                methods = {name: {phase: histogram.copy() for phase, histogram in phases.items()}
+                           for name, phases in methods.items()}
+        return {name: {phase: histogram.summary() for phase, histogram in phases.items()}
+                for name, phases in methods.items()}
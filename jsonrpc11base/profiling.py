@@ -0,0 +1,315 @@
+"""
+On-demand method profiling
+
+A MethodProfile profiles the calls of one method, for a number of calls, a
+number of seconds, or whichever ends first. It is installed by replacing
+the call() of the method's Method with its own, which calls the one it
+replaced, and removed when it ends, so the calls of other methods, and of
+the method once the profile has ended, run no profiling code at all. See
+JSONRPCService.start_profile().
+
+Two modes are supported:
+
+- deterministic: each call is run under cProfile. Calls are profiled one at
+  a time; calls made while another is being profiled run unprofiled, and are
+  counted as skipped. The results are the pstats report, and collapsed
+  stacks apportioned from cProfile's call graph.
+- sampling: while calls run, a thread samples their stacks every interval
+  seconds. Concurrent calls are all sampled, and the calls themselves run
+  at full speed. The results are collapsed stacks counting samples; there is
+  no pstats report.
+
+Collapsed stacks are the input of flamegraph tools (flamegraph.pl,
+speedscope...): one line per stack, its frames from the outermost separated
+by ";", then a space and its weight; microseconds of own time in
+deterministic mode, samples in sampling mode.
+"""
+import collections
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from typing import Optional
+
+from jsonrpc11base.method import Method
+
+MODES = ('deterministic', 'sampling')
+
+# The deepest stacks collapsed; deeper frames are left out
+MAX_DEPTH = 64
+
+# cProfile's record of its own disable() call
+_PROFILER_DISABLE = ('~', 0, "<method 'disable' of '_lsprof.Profiler' objects>")
+
+
+def frame_name(func) -> str:
+    """The name of a function in collapsed stacks, from a pstats key."""
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def code_name(code) -> str:
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def collapse_pstats(stats: dict) -> str:
+    """
+    Collapsed stacks from a pstats.Stats.stats dict. cProfile records only
+    which function called which, so the time of a function called from
+    several stacks is shared between them by the time of each call edge.
+    """
+    children = collections.defaultdict(list)
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if func == _PROFILER_DISABLE:
+            continue
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            if caller != func:
+                children[caller].append((func, edge[3]))
+    weights = collections.Counter()
+
+    def walk(func, path, on_path, time_on_path):
+        own_time, cumulative_time = stats[func][2], stats[func][3]
+        if cumulative_time <= 0:
+            return
+        share = min(time_on_path / cumulative_time, 1.0)
+        path = path + [frame_name(func)]
+        weights[';'.join(path)] += own_time * share
+        if len(path) >= MAX_DEPTH:
+            return
+        on_path = on_path | {func}
+        for child, edge_time in children[func]:
+            if child not in on_path:
+                walk(child, path, on_path, edge_time * share)
+
+    for root in roots:
+        walk(root, [], frozenset(), stats[root][3])
+    return format_collapsed({stack: round(weight * 1e6) for stack, weight in weights.items()})
+
+
+def format_collapsed(weights: dict) -> str:
+    return ''.join(f'{stack} {weight}\n' for stack, weight in sorted(weights.items())
+                   if weight > 0)
+
+
+class MethodProfile(object):
+    """
+    Profiles the calls of a method.
+
+    Args:
+        method_name: The name of the method
+        calls: The most calls profiled
+        seconds: The longest the profile runs, from when it is installed
+        mode: "deterministic" or "sampling"
+        interval: The interval between samples, in seconds, in sampling mode
+    """
+    def __init__(self, method_name: str, calls: Optional[int] = None,
+                 seconds: Optional[float] = None, mode: str = 'deterministic',
+                 interval: float = 0.005):
+        if calls is None and seconds is None:
+            raise ValueError('A profile must be limited to a number of calls or seconds')
+        if calls is not None and calls <= 0:
+            raise ValueError('calls must be greater than 0')
+        if seconds is not None and seconds <= 0:
+            raise ValueError('seconds must be greater than 0')
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiling mode "{mode}"')
+        if interval <= 0:
+            raise ValueError('interval must be greater than 0')
+        self.method_name = method_name
+        self.calls = calls
+        self.seconds = seconds
+        self.mode = mode
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.method = None
+        self.inner = None
+        self.started = None
+        self.ended = None
+        self.call_count = 0
+        self.skipped = 0
+        # Deterministic: whether a call is being profiled
+        self.busy = False
+        self.profiler = cProfile.Profile() if mode == 'deterministic' else None
+        # Sampling: the ids of the threads running profiled calls, and the
+        # number of samples of each stack
+        self.threads = collections.Counter()
+        self.samples = collections.Counter()
+        self.sample_count = 0
+        self.sampler = None
+
+    @property
+    def active(self) -> bool:
+        return self.started is not None and self.ended is None
+
+    def install(self, method: Method):
+        """Starts profiling the calls of a method."""
+        with self.lock:
+            if self.started is not None:
+                raise ValueError('A profile may only be installed once')
+            self.method = method
+            # The call() replaced, if the Method's own was already
+            self.inner = method.__dict__.get('call')
+            self.started = time.monotonic()
+            method.call = self.call
+        if self.mode == 'sampling':
+            self.sampler = threading.Thread(target=self.sample, daemon=True,
+                                            name=f'profile {self.method_name}')
+            self.sampler.start()
+
+    def stop(self):
+        """Stops profiling; calls being profiled finish being profiled."""
+        with self.lock:
+            self.end()
+
+    def end(self):
+        """Removes the profile from the method; lock must be held."""
+        if self.ended is None:
+            self.ended = time.monotonic()
+            if self.method.__dict__.get('call') == self.call:
+                if self.inner is not None:
+                    self.method.call = self.inner
+                else:
+                    del self.method.call
+
+    def expired(self, now: float) -> bool:
+        """Whether the profile is over; lock must be held."""
+        return ((self.calls is not None and self.call_count >= self.calls)
+                or (self.seconds is not None and now - self.started >= self.seconds))
+
+    def claim(self) -> bool:
+        """Whether a call is to be profiled, counting it if so."""
+        with self.lock:
+            if self.ended is not None:
+                return False
+            if self.expired(time.monotonic()):
+                self.end()
+                return False
+            if self.busy:
+                self.skipped += 1
+                return False
+            self.call_count += 1
+            if self.mode == 'deterministic':
+                self.busy = True
+            else:
+                self.threads[threading.get_ident()] += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            if self.mode == 'deterministic':
+                self.busy = False
+            else:
+                ident = threading.get_ident()
+                self.threads[ident] -= 1
+                if self.threads[ident] == 0:
+                    del self.threads[ident]
+            if self.calls is not None and self.call_count >= self.calls:
+                self.end()
+
+    def call(self, params, options):
+        if self.inner is not None:
+            call = self.inner
+        else:
+            call = functools.partial(Method.call, self.method)
+        if not self.claim():
+            return call(params, options)
+        try:
+            if self.profiler is None:
+                return call(params, options)
+            self.profiler.enable()
+            try:
+                return call(params, options)
+            finally:
+                self.profiler.disable()
+        finally:
+            self.release()
+
+    def sample(self):
+        """The sampling thread: samples the stacks of profiled calls."""
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if self.ended is None and self.expired(time.monotonic()):
+                    self.end()
+                if self.ended is not None:
+                    return
+                idents = list(self.threads)
+            frames = sys._current_frames()
+            stacks = [self.stack_of(frames[ident]) for ident in idents if ident in frames]
+            with self.lock:
+                self.samples.update(stack for stack in stacks if stack)
+                self.sample_count += len(stacks)
+
+    def stack_of(self, frame) -> Optional[str]:
+        """A frame's stack, from the Method.call() of the profiled call."""
+        names = []
+        while frame is not None:
+            names.append(code_name(frame.f_code))
+            if frame.f_code is Method.call.__code__:
+                break
+            frame = frame.f_back
+        else:
+            # The call returned after the thread was chosen.
+            return None
+        return ';'.join(reversed(names[-MAX_DEPTH:]))
+
+    def stats(self) -> Optional[pstats.Stats]:
+        """
+        The pstats of the calls profiled so far, in deterministic mode; None
+        in sampling mode, before any call is profiled, or while a call is
+        being profiled. It does not wait for the call, which may be long, or
+        the very call asking, if the method profiled is system.profile.
+        """
+        if self.profiler is None:
+            return None
+        with self.lock:
+            # pstats disables the profiler, so it must not be running.
+            if self.busy or self.call_count == 0:
+                return None
+            return pstats.Stats(self.profiler)
+
+    def result(self, limit: int = 50) -> dict:
+        """
+        The profile's state and results: the pstats report of the limit
+        functions with the most cumulative time, and the collapsed stacks.
+        The report is None in sampling mode, and while a call is being
+        profiled in deterministic mode, when the stacks are empty too.
+        """
+        stats = self.stats()
+        if stats is not None:
+            report = io.StringIO()
+            stats.stream = report
+            stats.sort_stats('cumulative').print_stats(limit)
+            report = report.getvalue()
+            collapsed = collapse_pstats(stats.stats)
+        elif self.mode == 'deterministic':
+            with self.lock:
+                busy = self.busy
+            report = None if busy else ''
+            collapsed = ''
+        else:
+            report = None
+            with self.lock:
+                collapsed = format_collapsed(self.samples)
+        with self.lock:
+            ended = self.ended if self.ended is not None else time.monotonic()
+            return {
+                'method': self.method_name,
+                'mode': self.mode,
+                'active': self.active,
+                'calls': self.call_count,
+                'skipped': self.skipped,
+                'samples': self.sample_count if self.mode == 'sampling' else None,
+                'elapsed': ended - self.started if self.started is not None else 0.0,
+                'pstats': report,
+                'collapsed': collapsed
+            }
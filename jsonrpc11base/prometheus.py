@@ -0,0 +1,157 @@
+"""
+Prometheus metrics
+
+render() writes a service's method statistics in the Prometheus text
+exposition format (version 0.0.4), to be served by whatever transport the
+service uses:
+
+- jsonrpc_requests_total: requests for each method: its calls, and the
+  requests rejected before it was called, such as for invalid params
+- jsonrpc_calls_total: calls of each method
+- jsonrpc_errors_total: error responses to requests for each method, by
+  JSON-RPC error code; a fraction of jsonrpc_requests_total, as errors may
+  come before the method is called
+- jsonrpc_calls_in_flight: calls of each method running
+- jsonrpc_call_duration_seconds: a histogram of the duration of calls of each
+  method, with the buckets of DEFAULT_BUCKETS; see
+  LatencyHistogram.cumulative_counts()
+
+Each method's statistics are taken as of one moment (see Method.take()),
+under its own lock only, so rendering never blocks calls of other methods.
+Counters start again from zero if the statistics are reset, which Prometheus
+treats as a counter reset.
+
+To bound the number of series, only max_methods methods are labelled with
+their names: the first requested, those requested most first among methods
+first seen in the same rendering. They keep their labels for the life of the
+service, so no method's series moves to OTHER or back; the statistics of
+the others are added together under the method label OTHER.
+"""
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+from jsonrpc11base.stats import LatencyHistogram
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+OTHER = '__other__'
+
+
+def escape(value: str) -> str:
+    """Escapes a label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value) -> str:
+    if isinstance(value, float):
+        return repr(value) if value != float('inf') else '+Inf'
+    return str(value)
+
+
+def request_count(counts: dict) -> int:
+    return counts['call_count'] + counts['rejected_count']
+
+
+class MethodLabels(object):
+    """The methods labelled with their names, which are never unlabelled."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.names: Set[str] = set()
+
+    def label(self, stats: Dict[str, Tuple[dict, LatencyHistogram]],
+              max_methods: int) -> Set[str]:
+        """
+        Labels the methods first requested, while fewer than max_methods
+        are, and returns those labelled.
+        """
+        with self.lock:
+            if len(self.names) < max_methods:
+                requested = [name for name, (counts, _) in stats.items()
+                             if name not in self.names
+                             and (request_count(counts) or counts['in_flight'])]
+                requested.sort(key=lambda name: (-request_count(stats[name][0]), name))
+                self.names.update(requested[:max_methods - len(self.names)])
+            return set(self.names)
+
+
+def limit_methods(stats: Dict[str, Tuple[dict, LatencyHistogram]],
+                  labelled: Iterable[str]) -> Dict[str, Tuple[dict, LatencyHistogram]]:
+    """
+    Keeps the statistics of the labelled methods, adding those of the rest
+    together under OTHER.
+    """
+    labelled = set(labelled)
+    others = [name for name in stats if name not in labelled]
+    if not others:
+        return stats
+    limited = {name: counts for name, counts in stats.items() if name in labelled}
+    counts = {'call_count': 0, 'rejected_count': 0, 'in_flight': 0,
+              'cumulative_call_time': 0.0, 'errors_by_code': {}}
+    latency = LatencyHistogram()
+    for name in others:
+        method_counts, method_latency = stats[name]
+        for key in ('call_count', 'rejected_count', 'in_flight', 'cumulative_call_time'):
+            counts[key] += method_counts[key]
+        for code, count in method_counts['errors_by_code'].items():
+            counts['errors_by_code'][code] = counts['errors_by_code'].get(code, 0) + count
+        latency.merge(method_latency)
+    limited[OTHER] = (counts, latency)
+    return limited
+
+
+def render(service, max_methods: int = 100, buckets=DEFAULT_BUCKETS) -> str:
+    """
+    Renders the statistics of a service's methods as Prometheus metrics.
+
+    Args:
+        service: A JSONRPCService
+        max_methods: The most methods labelled by name; see MethodLabels
+        buckets: The upper bounds, in seconds and ascending, of the duration
+            histogram buckets
+
+    Returns:
+        The metrics, in the text exposition format; see CONTENT_TYPE
+    """
+    methods = dict(service.method_registry)
+    methods.update(service.system_method_registry)
+    stats = {name: method.take() for name, method in methods.items()}
+    stats = limit_methods(stats, service.metric_labels.label(stats, max_methods))
+
+    lines: List[str] = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            label_text = ','.join(f'{key}="{escape(label)}"' for key, label in labels)
+            lines.append(f'{name}{suffix}{{{label_text}}} {format_value(value)}')
+
+    names = sorted(stats)
+    metric('jsonrpc_requests_total', 'counter',
+           'Requests for each method, whether or not it was called.',
+           [('', [('method', name)], request_count(stats[name][0])) for name in names])
+    metric('jsonrpc_calls_total', 'counter', 'Calls of each method.',
+           [('', [('method', name)], stats[name][0]['call_count']) for name in names])
+    metric('jsonrpc_errors_total', 'counter',
+           'Error responses to requests for each method, by JSON-RPC error code.',
+           [('', [('method', name), ('code', code)], count)
+            for name in names
+            for code, count in sorted(stats[name][0]['errors_by_code'].items())])
+    metric('jsonrpc_calls_in_flight', 'gauge', 'Calls of each method running.',
+           [('', [('method', name)], stats[name][0]['in_flight']) for name in names])
+
+    samples = []
+    for name in names:
+        counts, latency = stats[name]
+        for bound, count in zip(buckets, latency.cumulative_counts(list(buckets))):
+            samples.append(('_bucket', [('method', name), ('le', format_value(float(bound)))],
+                            count))
+        samples.append(('_bucket', [('method', name), ('le', '+Inf')], latency.count))
+        samples.append(('_sum', [('method', name)], latency.total / 1e9))
+        samples.append(('_count', [('method', name)], latency.count))
+    metric('jsonrpc_call_duration_seconds', 'histogram', 'The duration of calls of each method.',
+           samples)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,98 @@
+"""
+Hot reloading of service schemas
+
+A SchemaWatcher polls a service's schema directory (or bundle file) with
+stat(), and when anything changes, reloads the schemas in the background with
+JSONRPCService.reload_schemas(). Only changed schemas are recompiled, and
+calls keep using the old schemas until the new ones are ready, so they never
+wait for compilation.
+"""
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+class ReloadOutcome(object):
+    """
+    The outcome of reloading a service's schemas.
+
+    Attributes:
+        ok: Whether the new schemas are in use
+        error: The exception which prevented reloading, if not ok
+        changed: The keys of the schemas added, removed or changed
+        recompiled: The keys of the schemas compiled by the reload
+        duration: The time the reload took, in seconds
+    """
+    ok: bool
+    error: Optional[Exception]
+    changed: List[str]
+    recompiled: List[str]
+    duration: float
+
+    def __init__(self):
+        self.ok = False
+        self.error = None
+        self.changed = []
+        self.recompiled = []
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def done(self, error: Optional[Exception] = None) -> 'ReloadOutcome':
+        self.ok = error is None
+        self.error = error
+        self.duration = time.perf_counter() - self.started
+        return self
+
+
+class SchemaWatcher(object):
+    """
+    Polls a service's schemas for changes, reloading them when they change.
+    """
+    def __init__(self, service, interval: float = 1.0,
+                 on_reload: Optional[Callable[[ReloadOutcome], None]] = None):
+        self.service = service
+        self.interval = interval
+        self.on_reload = on_reload
+        self.signature = service.service_validation.schema.signature()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='schema-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.check()
+
+    def check(self) -> Optional[ReloadOutcome]:
+        """
+        Reloads the schemas if they changed since they were last checked,
+        returning the outcome, or None if they did not change.
+        """
+        signature = self.service.service_validation.schema.signature()
+        if signature == self.signature:
+            return None
+        # Taken first, so that a failed reload is not retried until the files
+        # change again.
+        self.signature = signature
+        outcome = self.service.reload_schemas()
+        if outcome.ok:
+            log.info('Reloaded schemas in %.3fs; changed: %s',
+                     outcome.duration, ', '.join(outcome.changed) or 'none')
+        else:
+            log.error('Failed to reload schemas: %s', outcome.error)
+        if self.on_reload is not None:
+            try:
+                self.on_reload(outcome)
+            except Exception:
+                log.exception('Schema reload callback failed')
+        return outcome
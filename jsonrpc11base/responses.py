@@ -0,0 +1,86 @@
+"""
+JSON-RPC 1.1 responses
+
+How the responses to requests are made, whether they succeed or fail at any
+stage.
+"""
+import traceback
+
+from jsonrpc11base.errors import (make_standard_jsonrpc_error, make_custom_jsonrpc_error,
+                                  make_jsonrpc_error_response,
+                                  JSONRPCError, APIError, ReservedErrorCodeServerError)
+from jsonrpc11base.validation.schema import SchemaError
+
+
+def make_parse_error_response(err: ValueError) -> dict:
+    """The response to a request which is not valid JSON."""
+    return make_jsonrpc_error_response(
+        make_standard_jsonrpc_error(-32700, error={'message': str(err)}))
+
+
+def make_envelope_error_response(req_data, ex: SchemaError) -> dict:
+    """The response to a request whose envelope is invalid."""
+    error = make_standard_jsonrpc_error(-32600, error={
+        'message': ex.message,
+        'path': ex.path,
+        'value': ex.value
+    })
+    # May seem pointless, but in case the request does not validate, yet it is an
+    # object, it might have an id  to use in the response.
+    if isinstance(req_data, dict):
+        return make_jsonrpc_error_response(error, req_data.get('id'))
+    else:
+        return make_jsonrpc_error_response(error)
+
+
+# Wraps the process of creating a result
+def make_result_response(result, request_id) -> dict:
+    response_data = {
+        'version': '1.1',
+        'result': result
+    }
+    if request_id is not None:
+        response_data['id'] = request_id
+    return response_data
+
+
+def make_method_error_response(ex: Exception, method_name: str, request_id) -> dict:
+    """
+    The response to a request whose method raised an exception, or could not
+    be called; must be called while the exception is handled.
+    """
+    # Covers a method throwing any specific jsonrpc predefined
+    # exception.
+    if isinstance(ex, JSONRPCError):
+        error_data = ex.to_json()
+    # Covers a method throwing a jsonrpc error which is not
+    # within the range of predefined jsonrpc errors
+    elif isinstance(ex, APIError):
+        # Which, sigh, itself may be an error if the app used
+        # an error code within the reserved range.
+        if -32768 <= ex.code <= -32000:
+            err = ReservedErrorCodeServerError(
+                message=(
+                    'An error code  was issued by the api which conflicts with ',
+                    'the reserved range between -32768 and -3200'
+                ),
+                bad_code=ex.code
+            )
+            error_data = err.to_json()
+        else:
+            error_data = ex.to_json()
+    # Finally, catch any programming errors
+    else:
+        message = getattr(ex, 'message', str(ex))
+        error = {'message': ('An unexpected exception was caught '
+                             'executing the method'),
+                 'exception_message': message or 'Unknown exception',
+                 'traceback': traceback.format_exc(limit=1000).split('\n')}
+        error_data = make_custom_jsonrpc_error(-32002,
+                                               message='Exception calling method',
+                                               error=error)
+    if 'error' not in error_data:
+        error_data['error'] = {}
+    error_data['error']['method'] = method_name
+
+    return make_jsonrpc_error_response(error_data, request_id)
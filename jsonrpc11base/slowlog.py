@@ -0,0 +1,146 @@
+"""
+Slow call log
+
+A SlowCallLog records each call which takes longer than its method's
+threshold as one structured record:
+
+- method: the method name
+- id: the request id, if any
+- total: the duration of the call, in seconds
+- threshold: the method's threshold, in seconds
+- phases: the duration of each phase, in seconds; see jsonrpc11base.phases
+- params_size: the size of the params, serialized as JSON, in bytes
+- params_sample: the params serialized as JSON, with the values of sensitive
+  properties redacted, truncated to max_sample_bytes; or None if params are
+  not captured
+- suppressed: how many slow calls were not recorded since the last record
+
+At most max_records are emitted per interval seconds, so a latency storm
+cannot flood the logs; the calls over the limit are only counted. Records
+are logged as warnings, with the record as the slow_call attribute of the
+log record, or passed to a sink.
+
+Calls are timed by the service's PhaseTimer, which is created if the
+service has none.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_REDACT = ('password', 'passwd', 'secret', 'token', 'authorization', 'api_key',
+                  'apikey', 'credentials')
+
+REDACTED = '[REDACTED]'
+
+
+def redact(value, keys):
+    """A copy of a value with the values of properties named by keys replaced."""
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in keys else redact(item, keys)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item, keys) for item in value]
+    return value
+
+
+class SlowCallLog(object):
+    """
+    Records calls slower than a threshold.
+
+    Args:
+        threshold: The threshold of every method, in seconds; None for no
+            threshold but those in thresholds
+        thresholds: The thresholds of particular methods, in seconds; a
+            threshold of None means the method's calls are never recorded
+        max_records: The most records emitted per interval
+        interval: The interval, in seconds
+        capture_params: Whether records include a sample of the params
+        max_sample_bytes: The longest params sample
+        redact_keys: The names of properties whose values are redacted from
+            the params sample, whatever their case
+        sink: Called with each record, instead of logging it
+    """
+    def __init__(self, threshold: Optional[float] = 1.0,
+                 thresholds: Optional[Dict[str, Optional[float]]] = None,
+                 max_records: int = 10, interval: float = 60.0,
+                 capture_params: bool = True, max_sample_bytes: int = 512,
+                 redact_keys: Iterable[str] = DEFAULT_REDACT,
+                 sink: Optional[Callable[[dict], None]] = None):
+        if max_records <= 0:
+            raise ValueError('max_records must be greater than 0')
+        if interval <= 0:
+            raise ValueError('interval must be greater than 0')
+        self.threshold = threshold
+        self.thresholds = dict(thresholds or {})
+        self.max_records = max_records
+        self.interval = interval
+        self.capture_params = capture_params
+        self.max_sample_bytes = max_sample_bytes
+        self.redact_keys = frozenset(key.lower() for key in redact_keys)
+        self.sink = sink
+        self.lock = threading.Lock()
+        self.interval_started = time.monotonic()
+        self.records = 0
+        self.suppressed = 0
+
+    def threshold_of(self, method_name: str) -> Optional[float]:
+        return self.thresholds.get(method_name, self.threshold)
+
+    def check(self, method_name: str, req_data: dict, timings: Dict[str, int]):
+        """
+        Records a call, given the duration of its phases in nanoseconds, if
+        it was slow.
+        """
+        threshold = self.threshold_of(method_name)
+        if threshold is None or timings['total'] <= threshold * 1e9:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if now - self.interval_started >= self.interval:
+                self.interval_started = now
+                self.records = 0
+            if self.records >= self.max_records:
+                self.suppressed += 1
+                return
+            self.records += 1
+            suppressed, self.suppressed = self.suppressed, 0
+        self.emit(self.make_record(method_name, req_data, timings, threshold, suppressed))
+
+    def make_record(self, method_name, req_data, timings, threshold, suppressed) -> dict:
+        params = req_data.get('params')
+        params_size = 0
+        params_sample = None
+        if params is not None:
+            params_size = len(json.dumps(params, default=str).encode('utf-8'))
+            if self.capture_params:
+                params_sample = json.dumps(redact(params, self.redact_keys), default=str)
+                sample_bytes = params_sample.encode('utf-8')
+                if len(sample_bytes) > self.max_sample_bytes:
+                    params_sample = sample_bytes[:self.max_sample_bytes].decode(
+                        'utf-8', 'ignore') + '...'
+        return {
+            'method': method_name,
+            'id': req_data.get('id'),
+            'total': timings['total'] / 1e9,
+            'threshold': threshold,
+            'phases': {phase: duration / 1e9 for phase, duration in timings.items()
+                       if phase != 'total'},
+            'params_size': params_size,
+            'params_sample': params_sample,
+            'suppressed': suppressed
+        }
+
+    def emit(self, record: dict):
+        if self.sink is not None:
+            try:
+                self.sink(record)
+            except Exception:
+                log.exception('Slow call sink failed')
+            return
+        log.warning('Slow call of %s: %.3fs (threshold %.3fs): %s', record['method'],
+                    record['total'], record['threshold'], json.dumps(record, default=str),
+                    extra={'slow_call': record})
@@ -0,0 +1,152 @@
+"""
+Latency and process statistics
+
+A LatencyHistogram records durations, in nanoseconds, into a fixed set of
+logarithmic buckets: exact below 16ns, and above that 8 buckets per power of
+two, so any duration is placed within 12.5% of its value. Recording is a few
+integer operations and a list increment, and the memory used never grows, so
+histograms can be kept for every method of a production service.
+
+process_stats() reports figures for the process as a whole.
+"""
+import math
+import os
+import sys
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+# Sub-buckets per power of two are 2 ** SUB_BUCKET_BITS.
+SUB_BUCKET_BITS = 3
+_PRECISION_BITS = SUB_BUCKET_BITS + 1
+# Enough buckets for any duration below 2 ** 64 ns (about 580 years)
+BUCKET_COUNT = ((64 - _PRECISION_BITS) << SUB_BUCKET_BITS) + (1 << _PRECISION_BITS)
+
+
+def bucket_of(value: int) -> int:
+    """The index of the bucket a duration, in nanoseconds, is counted in."""
+    shift = value.bit_length() - _PRECISION_BITS
+    if shift <= 0:
+        return value
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def bucket_bounds(index: int):
+    """The lowest and highest duration counted in a bucket."""
+    if index < 1 << _PRECISION_BITS:
+        return index, index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram(object):
+    """
+    Counts of durations in logarithmic buckets; not thread-safe by itself.
+    """
+    counts: List[int]
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        """Records a duration in nanoseconds."""
+        shift = value.bit_length() - _PRECISION_BITS
+        self.counts[value if shift <= 0 else (shift << SUB_BUCKET_BITS) + (value >> shift)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> int:
+        """
+        The duration, in nanoseconds, which the given fraction of durations
+        did not exceed; the upper bound of its bucket, or the maximum if lower.
+        """
+        if self.count == 0:
+            return 0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def copy(self) -> 'LatencyHistogram':
+        histogram = LatencyHistogram()
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.total = self.total
+        histogram.max = self.max
+        return histogram
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Adds the durations recorded by another histogram."""
+        self.counts = [count + other_count
+                       for count, other_count in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def cumulative_counts(self, bounds: List[float]) -> List[int]:
+        """
+        The number of durations at most each of the given bounds, in seconds
+        and ascending. A bucket is counted at a bound only if all of it is at
+        most the bound, so counts may be low by a bucket's width.
+        """
+        cumulative = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            bound_ns = bound * 1e9
+            while index < BUCKET_COUNT and bucket_bounds(index)[1] <= bound_ns:
+                seen += self.counts[index]
+                index += 1
+            cumulative.append(seen)
+        return cumulative
+
+    def summary(self) -> dict:
+        """The count, total, mean, p50, p90, p99 and max, in seconds."""
+        return {
+            'count': self.count,
+            'total': self.total / 1e9,
+            'mean': self.total / self.count / 1e9 if self.count else 0.0,
+            'p50': self.percentile(0.5) / 1e9,
+            'p90': self.percentile(0.9) / 1e9,
+            'p99': self.percentile(0.99) / 1e9,
+            'max': self.max / 1e9
+        }
+
+
+def resident_set_size() -> Optional[int]:
+    """The memory the process has resident, in bytes, where it is known (Linux)."""
+    try:
+        with open('/proc/self/statm') as fd:
+            return int(fd.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_resident_set_size() -> Optional[int]:
+    """The most memory the process has had resident, in bytes, if known."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In bytes on macOS, and in kilobytes elsewhere
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def process_stats() -> dict:
+    """The process id, and current and peak resident memory in bytes."""
+    return {
+        'pid': os.getpid(),
+        'rss': resident_set_size(),
+        'max_rss': max_resident_set_size()
+    }
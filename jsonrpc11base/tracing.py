@@ -0,0 +1,249 @@
+"""
+Request tracing
+
+A Tracer creates a span for each request, covering its phases: parsing,
+validating the envelope and params, running the method, validating the
+result, and serializing the response (see jsonrpc11base.phases), and hands
+each span to its exporters once the request is done.
+
+The parent of a span is taken from a W3C trace context traceparent
+(https://www.w3.org/TR/trace-context/#traceparent-header), given as the
+traceparent of the options of the call (options['traceparent'] if options is
+a dict, and options.traceparent otherwise), typically from the HTTP header,
+or else as a "traceparent" member of the request envelope. A traceparent
+member is removed from the request before it is validated. A span whose
+parent is not sampled is not exported, though its trace is propagated.
+
+While its method runs, the span of a request is current_span(), whose
+traceparent may be passed on to the services the method calls.
+
+Calls are timed by the service's PhaseTimer, which is created if the service
+has none; a service without a tracer runs no tracing code at all.
+"""
+import collections
+import contextvars
+import json
+import logging
+import random
+import re
+import threading
+import time
+from typing import Iterable, List, Optional
+
+log = logging.getLogger(__name__)
+
+# The name of the traceparent in options and request envelopes
+TRACEPARENT = 'traceparent'
+
+_TRACEPARENT_RE = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$')
+_INVALID_TRACE_ID = '0' * 32
+_INVALID_SPAN_ID = '0' * 16
+
+SAMPLED = 0x01
+
+_current_span = contextvars.ContextVar('jsonrpc11base_span', default=None)
+
+
+def current_span() -> Optional['Span']:
+    """The span of the request being handled, if it is traced."""
+    return _current_span.get()
+
+
+def parse_traceparent(value) -> Optional[tuple]:
+    """
+    The trace id, parent span id and trace flags of a traceparent, or None if
+    it is not valid. Versions other than 00 are parsed as version 00, but for
+    version ff, which is invalid.
+    """
+    if not isinstance(value, str):
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    if version == 'ff' or (version == '00' and rest is not None):
+        return None
+    if trace_id == _INVALID_TRACE_ID or span_id == _INVALID_SPAN_ID:
+        return None
+    return trace_id, span_id, int(flags, 16)
+
+
+def format_traceparent(trace_id: str, span_id: str, flags: int) -> str:
+    return f'00-{trace_id}-{span_id}-{flags:02x}'
+
+
+def _new_id(bits: int) -> str:
+    # Not all zeros, which is invalid
+    return f'{random.getrandbits(bits) or 1:0{bits // 4}x}'
+
+
+class Span(object):
+    """The span of a request."""
+    def __init__(self, trace_id: str, parent_id: Optional[str], flags: int):
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.flags = flags
+        self.name = 'jsonrpc'
+        self.start_time = time.time()
+        self.duration = None
+        self.status = 'ok'
+        self.attributes = {'rpc.system': 'jsonrpc', 'rpc.jsonrpc.version': '1.1'}
+        self.phases = {}
+        self.token = None
+
+    @property
+    def sampled(self) -> bool:
+        return bool(self.flags & SAMPLED)
+
+    @property
+    def traceparent(self) -> str:
+        """The traceparent of this span, as the parent of others."""
+        return format_traceparent(self.trace_id, self.span_id, self.flags)
+
+    def to_json(self) -> dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_id,
+            'trace_flags': self.flags,
+            'start_time': self.start_time,
+            'end_time': self.start_time + (self.duration or 0.0),
+            'duration': self.duration,
+            'status': self.status,
+            'attributes': self.attributes,
+            'phases': self.phases
+        }
+
+
+class SpanExporter(object):
+    """
+    Receives finished spans, on the thread which handled the request, so an
+    exporter should be quick, or hand spans off.
+    """
+    def export(self, span: Span):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RingBufferExporter(SpanExporter):
+    """Keeps the latest capacity spans in memory, as dicts; see spans()."""
+    def __init__(self, capacity: int = 1000):
+        if capacity <= 0:
+            raise ValueError('capacity must be greater than 0')
+        self.buffer = collections.deque(maxlen=capacity)
+
+    def export(self, span):
+        # deque.append is atomic, so no lock is needed
+        self.buffer.append(span.to_json())
+
+    def spans(self, clear: bool = False) -> List[dict]:
+        """The spans kept, oldest first; with clear, they are removed."""
+        spans = []
+        if clear:
+            try:
+                while True:
+                    spans.append(self.buffer.popleft())
+            except IndexError:
+                return spans
+        return list(self.buffer)
+
+
+class JSONLExporter(SpanExporter):
+    """Appends spans to a file, one JSON object per line."""
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def export(self, span):
+        line = json.dumps(span.to_json(), default=str) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class Tracer(object):
+    """
+    Traces requests; see the module documentation.
+
+    Args:
+        exporters: The exporters to which spans are handed; at least one
+    """
+    def __init__(self, exporters: Iterable[SpanExporter]):
+        self.exporters = list(exporters)
+        if not self.exporters:
+            raise ValueError('A tracer must have at least one exporter')
+        for exporter in self.exporters:
+            if not isinstance(exporter, SpanExporter):
+                raise ValueError('exporters must be SpanExporters')
+
+    def start(self, options) -> Span:
+        """Starts the span of a request, with the parent in its options, if any."""
+        if options is None:
+            parent = None
+        elif isinstance(options, dict):
+            parent = parse_traceparent(options.get(TRACEPARENT))
+        else:
+            parent = parse_traceparent(getattr(options, TRACEPARENT, None))
+        if parent is None:
+            span = Span(_new_id(128), None, SAMPLED)
+        else:
+            span = Span(*parent)
+        span.token = _current_span.set(span)
+        return span
+
+    def adopt(self, span: Span, req_data):
+        """
+        Removes the traceparent from a request envelope, making it the
+        parent of the span if the options gave none. Returns the request.
+        """
+        if not isinstance(req_data, dict) or TRACEPARENT not in req_data:
+            return req_data
+        # The caller's request is left as it is.
+        req_data = dict(req_data)
+        parent = parse_traceparent(req_data.pop(TRACEPARENT))
+        if parent is not None and span.parent_id is None:
+            span.trace_id, span.parent_id, span.flags = parent
+        return req_data
+
+    def end(self, span: Span, record, req_data, response, timings, raised: bool = False):
+        """
+        Ends the span of a request, given its dispatch record, if the method
+        was found, and the durations of its phases in nanoseconds; raised is
+        whether handling the request raised, rather than giving a response.
+        """
+        _current_span.reset(span.token)
+        span.token = None
+        if not span.sampled:
+            return
+        span.duration = timings['total'] / 1e9
+        span.phases = {phase: duration / 1e9 for phase, duration in timings.items()
+                       if phase != 'total'}
+        if record is not None:
+            span.name = record.name
+            span.attributes['rpc.method'] = record.name
+        if isinstance(req_data, dict) and 'id' in req_data:
+            span.attributes['rpc.jsonrpc.request_id'] = req_data['id']
+        if raised:
+            span.status = 'error'
+        elif isinstance(response, dict) and 'error' in response:
+            span.status = 'error'
+            span.attributes['rpc.jsonrpc.error_code'] = response['error'].get('code')
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                log.exception('Span exporter failed')
+
+    def close(self):
+        """Closes the exporters."""
+        for exporter in self.exporters:
+            exporter.close()
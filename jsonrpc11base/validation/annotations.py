@@ -0,0 +1,185 @@
+"""
+Validators derived from handler type annotations
+
+A method handler's type hints may stand in for its schema files: the hint
+for its params argument (the first argument), and its return hint, are turned
+into JSON-Schemas, which are compiled by the codegen engine into specialized
+check functions. Invalid values are reported by jsonschema against the same
+schema, so errors have the usual message, path and value.
+
+Supported hints are int, float, str, bool, None, Any, List/list, Tuple,
+Dict/dict with str keys, Optional, Union, Literal, TypedDict and dataclasses
+(validated as the JSON objects handlers receive; no instances are built).
+"""
+import dataclasses
+import inspect
+import typing
+
+from jsonschema import Draft7Validator, RefResolver
+
+import jsonrpc11base.validation.codegen as codegen
+from jsonrpc11base.validation.schema import reference_validator
+import jsonrpc11base.validation.budget as budget
+
+SCHEMA_VERSION = 'http://json-schema.org/draft-07/schema#'
+
+_PRIMITIVES = {
+    int: {'type': 'integer'},
+    float: {'type': 'number'},
+    str: {'type': 'string'},
+    bool: {'type': 'boolean'},
+    type(None): {'type': 'null'}
+}
+
+# typing.Literal is new in Python 3.8
+_LITERAL = getattr(typing, 'Literal', None)
+
+
+class UnsupportedAnnotation(Exception):
+    """The type hint cannot be expressed as a JSON-Schema."""
+    pass
+
+
+def _is_typed_dict(hint):
+    return (isinstance(hint, type) and issubclass(hint, dict)
+            and hasattr(hint, '__total__') and hasattr(hint, '__annotations__'))
+
+
+def _object_schema(properties, required):
+    schema = {'type': 'object', 'properties': properties}
+    if required:
+        schema['required'] = required
+    return schema
+
+
+def _typed_dict_schema(hint):
+    hints = typing.get_type_hints(hint)
+    if hasattr(hint, '__required_keys__'):
+        required_keys = hint.__required_keys__
+    else:
+        required_keys = hints.keys() if hint.__total__ else ()
+    properties = {key: schema_for(value) for key, value in hints.items()}
+    return _object_schema(properties, [key for key in hints if key in required_keys])
+
+
+def _dataclass_schema(hint):
+    hints = typing.get_type_hints(hint)
+    properties = {}
+    required = []
+    for field in dataclasses.fields(hint):
+        properties[field.name] = schema_for(hints[field.name])
+        if (field.default is dataclasses.MISSING
+                and field.default_factory is dataclasses.MISSING):
+            required.append(field.name)
+    return _object_schema(properties, required)
+
+
+def schema_for(hint) -> dict:
+    """
+    Returns the JSON-Schema for a type hint.
+
+    Raises:
+        UnsupportedAnnotation: The hint has no JSON-Schema equivalent
+    """
+    if hint is None:
+        hint = type(None)
+    if hint is typing.Any:
+        return {}
+    if hint in _PRIMITIVES:
+        return dict(_PRIMITIVES[hint])
+    if hint is list:
+        return {'type': 'array'}
+    if hint is dict:
+        return {'type': 'object'}
+    if _is_typed_dict(hint):
+        return _typed_dict_schema(hint)
+    if dataclasses.is_dataclass(hint) and isinstance(hint, type):
+        return _dataclass_schema(hint)
+
+    origin = getattr(hint, '__origin__', None)
+    args = getattr(hint, '__args__', ())
+    if origin is typing.Union:
+        # Optional[X] is Union[X, None]
+        return {'anyOf': [schema_for(arg) for arg in args]}
+    if origin is not None and origin is _LITERAL:
+        values = list(args)
+        if any(value is not None and not isinstance(value, (bool, int, float, str))
+               for value in values):
+            raise UnsupportedAnnotation(f'{hint!r} has values which are not JSON')
+        return {'const': values[0]} if len(values) == 1 else {'enum': values}
+    if origin is list:
+        schema = {'type': 'array'}
+        if args:
+            schema['items'] = schema_for(args[0])
+        return schema
+    if origin is tuple:
+        if len(args) == 2 and args[1] is Ellipsis:
+            return {'type': 'array', 'items': schema_for(args[0])}
+        return {'type': 'array',
+                'items': [schema_for(arg) for arg in args],
+                'minItems': len(args),
+                'maxItems': len(args)}
+    if origin is dict:
+        if args and args[0] is not str:
+            raise UnsupportedAnnotation(f'{hint!r} has keys which are not strings')
+        schema = {'type': 'object'}
+        if args:
+            schema['additionalProperties'] = schema_for(args[1])
+        return schema
+    raise UnsupportedAnnotation(f'{hint!r} is not supported')
+
+
+def _hints(func):
+    """The params hint and return hint of a handler; None where there is none."""
+    try:
+        hints = typing.get_type_hints(func)
+    except Exception:
+        # Unresolvable forward references and the like
+        return None, None
+    try:
+        parameters = list(inspect.signature(func).parameters)
+    except (TypeError, ValueError):
+        parameters = []
+    # Handlers taking params are called as func(params, options).
+    params_hint = hints.get(parameters[0]) if len(parameters) == 2 else None
+    return params_hint, hints.get('return')
+
+
+def compile_schema(name: str, schema: dict, timed: bool = False):
+    """
+    Compiles a schema derived from a hint into a function which raises
+    SchemaError for invalid values; with timed, its fallback jsonschema
+    validator stops at the deadline of a ValidationBudget's max_time.
+    """
+    schema = dict(schema, **{'$schema': SCHEMA_VERSION})
+    validator_class = budget.timed(Draft7Validator) if timed else Draft7Validator
+    reference = reference_validator(validator_class(schema))
+    return codegen.compile_validator(name, schema, RefResolver.from_schema(schema), reference)
+
+
+def _validator(name, hint, timed=False):
+    if hint is None:
+        return None
+    try:
+        schema = schema_for(hint)
+    except UnsupportedAnnotation:
+        return None
+    return compile_schema(name, schema, timed)
+
+
+def params_validator(method_name: str, func: typing.Callable, timed: bool = False):
+    """
+    Returns a function validating params against the handler's params hint,
+    raising SchemaError if they are invalid; or None if the handler has no
+    params hint, or it is not supported. See compile_schema() for timed.
+    """
+    return _validator(f'{method_name}.params', _hints(func)[0], timed)
+
+
+def result_validator(method_name: str, func: typing.Callable):
+    """
+    Returns a function validating a result against the handler's return hint,
+    raising SchemaError if it is invalid; or None if the handler has no
+    return hint, or it is not supported.
+    """
+    return _validator(f'{method_name}.result', _hints(func)[1])
@@ -0,0 +1,150 @@
+"""
+Validation budgets
+
+A ValidationBudget bounds the work done validating a method's params, so that
+hostile or accidental pathological payloads (millions of items, deep nesting,
+schemas with expensive keywords) cannot pin a core before being rejected:
+
+- max_depth: how deeply arrays and objects may be nested
+- max_nodes: how many array items and object properties may be visited
+- max_time: how many seconds validation may take
+
+Depth and size are checked by a walk over the params before validation,
+which stops as soon as either is exceeded. Time is checked as the walk goes,
+and then by jsonschema before each keyword it evaluates (see timed()); the
+validators of a method are only built to check the time if its budget has a
+max_time, so methods without one pay nothing for it.
+
+Code generated by the codegen engine, and columnar checks of arrays of rows,
+are not interrupted. They are linear in the size of the params, so only
+max_nodes bounds them. With max_time alone, params which cannot even be
+walked in time are rejected before they are validated, but the validation
+of params which can is not bounded by max_time.
+
+Exceeding a budget raises InvalidParamsError, with a message saying which.
+"""
+import functools
+import threading
+import time
+from typing import Callable, Optional
+
+from jsonschema import validators
+
+from jsonrpc11base.errors import InvalidParamsError
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, message, limit):
+        super().__init__(message)
+        self.message = message
+        self.limit = limit
+
+
+# The deadline, and time budget, of the validation running in each thread,
+# if it has one
+_local = threading.local()
+
+
+def _timed_keyword(keyword_validator):
+    @functools.wraps(keyword_validator)
+    def timed_keyword(validator, value, instance, schema):
+        deadline = getattr(_local, 'deadline', None)
+        if deadline is not None and time.perf_counter() > deadline[0]:
+            raise BudgetExceeded(f'Validation took more than {deadline[1]} seconds',
+                                 deadline[1])
+        return keyword_validator(validator, value, instance, schema)
+    return timed_keyword
+
+
+_timed_classes = {}
+_timed_lock = threading.Lock()
+
+
+def timed(validator_class):
+    """
+    Returns a jsonschema validator class which behaves exactly like the given
+    one, but stops with BudgetExceeded once the current thread's validation
+    deadline has passed. With no deadline, the cost is one attribute lookup
+    per keyword.
+    """
+    with _timed_lock:
+        timed_class = _timed_classes.get(validator_class)
+        if timed_class is None:
+            timed_class = validators.extend(
+                validator_class,
+                {keyword: _timed_keyword(keyword_validator)
+                 for keyword, keyword_validator in validator_class.VALIDATORS.items()})
+            _timed_classes[validator_class] = timed_class
+    return timed_class
+
+
+class ValidationBudget(object):
+    """
+    Limits on validating a method's params; None means unlimited.
+    """
+    def __init__(self, max_depth: Optional[int] = None, max_nodes: Optional[int] = None,
+                 max_time: Optional[float] = None):
+        for name, limit in (('max_depth', max_depth), ('max_nodes', max_nodes),
+                            ('max_time', max_time)):
+            if limit is not None and limit <= 0:
+                raise ValueError(f'{name} must be greater than 0')
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_time = max_time
+
+    def check_shape(self, value, started: float):
+        """
+        Walks a value, raising BudgetExceeded as soon as it is nested too
+        deeply, has too many items and properties, or time runs out.
+        """
+        max_depth = self.max_depth
+        max_nodes = self.max_nodes
+        deadline = started + self.max_time if self.max_time is not None else None
+        nodes = 0
+        stack = [(value, 1)]
+        while stack:
+            value, depth = stack.pop()
+            if isinstance(value, dict):
+                children = value.values()
+            elif isinstance(value, list):
+                children = value
+            else:
+                continue
+            if max_depth is not None and depth > max_depth:
+                raise BudgetExceeded(
+                    f'Params are nested more than {max_depth} levels deep', max_depth)
+            nodes += len(children)
+            if max_nodes is not None and nodes > max_nodes:
+                raise BudgetExceeded(
+                    f'Params have more than {max_nodes} items and properties', max_nodes)
+            if deadline is not None and time.perf_counter() > deadline:
+                raise BudgetExceeded(
+                    f'Validation took more than {self.max_time} seconds', self.max_time)
+            for child in children:
+                if isinstance(child, (dict, list)):
+                    stack.append((child, depth + 1))
+
+    def params_validator(self, validate: Callable) -> Callable:
+        """
+        Wraps a params validator (raising InvalidParamsError) with the budget.
+        With a max_time, the validator should have been built timed (see
+        Schema.validator()), or only the walk is bounded.
+        """
+        def validate_params(params):
+            started = time.perf_counter()
+            try:
+                self.check_shape(params, started)
+                if self.max_time is None:
+                    validate(params)
+                    return
+                _local.deadline = (started + self.max_time, self.max_time)
+                try:
+                    validate(params)
+                finally:
+                    _local.deadline = None
+            except BudgetExceeded as ex:
+                raise InvalidParamsError(
+                    message=f'Validation budget exceeded: {ex.message}',
+                    value=ex.limit
+                )
+        return validate_params
@@ -0,0 +1,50 @@
+"""
+Built-in schemas
+
+The JSON-RPC 1.1 envelope schemas and the system method schemas ship with the
+package and never change, so each set is loaded and compiled once per process
+(per validation engine and cache directory) and shared by every
+JSONRPCService. The shared instances must be treated as read-only.
+"""
+from types import MappingProxyType
+import os
+import threading
+
+from jsonrpc11base.validation.schema import Schema
+from jsonrpc11base.validation.validation import Validation
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JSONRPC_SCHEMA_DIR = os.path.join(PACKAGE_DIR, 'jsonrpc_schema')
+SYSTEM_SCHEMA_DIR = os.path.join(PACKAGE_DIR, 'system_schema')
+
+_lock = threading.Lock()
+_shared = {}
+
+
+def _freeze(schema):
+    schema.schemas = MappingProxyType(schema.schemas)
+    return schema
+
+
+def _get(kind, engine, cache_dir, create):
+    key = (kind, engine, None if cache_dir is None else os.path.abspath(cache_dir))
+    with _lock:
+        shared = _shared.get(key)
+        if shared is None:
+            shared = _shared[key] = create()
+        return shared
+
+
+def jsonrpc_schemas(engine='jsonschema', cache_dir=None):
+    """The shared Schema for the JSON-RPC 1.1 request and response envelopes."""
+    return _get('jsonrpc', engine, cache_dir,
+                lambda: _freeze(Schema(JSONRPC_SCHEMA_DIR, engine=engine, cache_dir=cache_dir)))
+
+
+def system_validation(engine='jsonschema', cache_dir=None):
+    """The shared Validation for the built-in system methods."""
+    def create():
+        validation = Validation(SYSTEM_SCHEMA_DIR, engine=engine, cache_dir=cache_dir)
+        _freeze(validation.schema)
+        return validation
+    return _get('system', engine, cache_dir, create)
@@ -0,0 +1,159 @@
+"""
+Schema bundles
+
+A bundle holds all of a service's schemas in a single JSON or YAML file, so
+that loading them takes one read rather than one per schema file:
+
+    methods:
+      add:
+        params: {type: array, items: {type: number}}
+        result: {type: number}
+      hello:
+        params: null        # an empty params file; params must be absent
+    schemas:
+      base: {definitions: {...}}
+
+Each method's "params" and "result" stand for the <method>.params.json and
+<method>.result.json files of a schema directory, with null standing for an
+empty file. A method without a "result" has no result schema. Other schemas,
+such as shared definitions, are under "schemas", by file name without the
+.json extension. $refs are resolved as if the bundle were a directory named
+after it, without its extension, so "base.json#/definitions/x" still works.
+
+A schema directory is converted into a bundle with:
+
+    python -m jsonrpc11base.validation.bundle SCHEMA_DIR BUNDLE_FILE
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+import yaml
+
+from jsonrpc11base.exceptions import InvalidFileType, InvalidSchemaError
+
+# Bundle file extension -> format
+EXTENSIONS = {
+    '.json': 'json',
+    '.yaml': 'yaml',
+    '.yml': 'yaml'
+}
+
+KINDS = ('params', 'result')
+
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def is_bundle(path):
+    """Whether a schema_dir is actually a bundle file."""
+    return os.path.isfile(path)
+
+
+def bundle_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise InvalidFileType(f'Schema bundle "{path}" must be a '
+                              + ', '.join(EXTENSIONS) + ' file')
+    return EXTENSIONS[extension]
+
+
+def parse(data, bundle_type):
+    if bundle_type == 'yaml':
+        return yaml.load(data, Loader=_YAML_LOADER)
+    return json.loads(data)
+
+
+def schemas_of(bundle, path='<bundle>'):
+    """
+    Returns the schemas of a parsed bundle, by schema key ("add.params",
+    "base"), with None for a schema which is empty.
+    """
+    def invalid(message):
+        return InvalidSchemaError(f'Schema bundle "{path}" is invalid: {message}')
+
+    if not isinstance(bundle, dict):
+        raise invalid('it must be an object')
+    extra = set(bundle) - {'methods', 'schemas'}
+    if extra:
+        raise invalid('unknown keys ' + ', '.join(sorted(map(str, extra))))
+    schemas = {}
+    for method_name, method_schemas in (bundle.get('methods') or {}).items():
+        if not isinstance(method_schemas, dict) or set(method_schemas) - set(KINDS):
+            raise invalid(f'method "{method_name}" must have only params and result')
+        for kind, schema in method_schemas.items():
+            schemas[f'{method_name}.{kind}'] = schema
+    for name, schema in (bundle.get('schemas') or {}).items():
+        if name in schemas:
+            raise invalid(f'schema "{name}" is also a method schema')
+        schemas[name] = schema
+    return schemas
+
+
+def read_bundle(path):
+    """Reads a bundle file, returning its schemas; see schemas_of()."""
+    bundle_type = bundle_format(path)
+    with open(path, 'rb') as fd:
+        data = fd.read()
+    return schemas_of(parse(data, bundle_type), path)
+
+
+def bundle_of(schemas):
+    """The bundle of schemas by schema key; the reverse of schemas_of()."""
+    methods = {}
+    others = {}
+    for schema_key in sorted(schemas):
+        method_name, _, kind = schema_key.rpartition('.')
+        if method_name and kind in KINDS:
+            methods.setdefault(method_name, {})[kind] = schemas[schema_key]
+        else:
+            others[schema_key] = schemas[schema_key]
+    bundle = {'methods': methods}
+    if others:
+        bundle['schemas'] = others
+    return bundle
+
+
+def read_schema_dir(schema_dir):
+    """Reads the schema files of a directory, by schema key."""
+    schemas = {}
+    for file_path in sorted(glob.glob(f'{schema_dir}/*.json')):
+        schema_key = os.path.splitext(os.path.basename(file_path))[0]
+        with open(file_path, 'rb') as fd:
+            data = fd.read()
+        schemas[schema_key] = json.loads(data) if len(data) > 0 else None
+    return schemas
+
+
+def write_bundle(schemas, path):
+    """Writes schemas, by schema key, to a bundle file."""
+    bundle_type = bundle_format(path)
+    bundle = bundle_of(schemas)
+    with open(path, 'w') as fd:
+        if bundle_type == 'yaml':
+            yaml.safe_dump(bundle, fd, sort_keys=False)
+        else:
+            json.dump(bundle, fd, indent=4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m jsonrpc11base.validation.bundle',
+        description='Converts a directory of schema files into a single bundle file.')
+    parser.add_argument('schema_dir', help='the directory of schema files')
+    parser.add_argument('bundle_file',
+                        help='the bundle to write; JSON or YAML, by extension')
+    args = parser.parse_args(argv)
+    try:
+        schemas = read_schema_dir(args.schema_dir)
+        write_bundle(schemas, args.bundle_file)
+    except (InvalidFileType, OSError, ValueError) as ex:
+        print(f'Error: {ex}', file=sys.stderr)
+        return 1
+    print(f'Wrote {len(schemas)} schemas to {args.bundle_file}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
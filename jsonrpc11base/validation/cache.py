@@ -0,0 +1,75 @@
+"""
+Persistent cache of parsed and compiled schemas
+
+A schema directory is cached as a single file, so that a process which starts
+with unchanged schemas reads one file instead of reading and parsing every
+schema, checking each against its meta-schema and generating code for it.
+
+Each cached entry records the schema file's mtime and size, and a hash of its
+contents. A file whose mtime or size changed is read again, and its entry is
+reused only if the content hash is unchanged. Generated code also records
+the content hashes of the files its $refs were inlined from, so it is
+regenerated when any of them change.
+
+Cache files are written to a temporary file and renamed into place, so
+processes sharing a cache directory never see a partially written file. An
+unreadable cache file is ignored, and rewritten.
+
+The cache holds marshalled code objects, which are executed when loaded. The
+cache directory must therefore only be writable by the service's own user.
+"""
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+
+import jsonschema
+
+# Bump when the format of cache entries, or the code generator, changes.
+FORMAT_VERSION = 1
+
+
+def digest(data):
+    """The hash identifying the contents of a schema file."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class SchemaCache(object):
+    def __init__(self, cache_dir):
+        if cache_dir is None:
+            raise Exception('cache_dir is required')
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, schema_dir, engine):
+        """The cache file for a schema directory validated with an engine."""
+        key = '|'.join([str(FORMAT_VERSION), os.path.abspath(schema_dir), engine,
+                        jsonschema.__version__, sys.implementation.cache_tag or ''])
+        return os.path.join(self.cache_dir, digest(key.encode('utf-8'))[:32] + '.schemas')
+
+    def read(self, schema_dir, engine):
+        """
+        Returns the cached entries for a schema directory, keyed by schema
+        key, or an empty dict if there are none or the cache is unreadable.
+        """
+        try:
+            with open(self.path(schema_dir, engine), 'rb') as fd:
+                data = marshal.loads(fd.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return {}
+        if not isinstance(data, dict) or data.get('format') != FORMAT_VERSION:
+            return {}
+        return data.get('entries', {})
+
+    def write(self, schema_dir, engine, entries):
+        """Atomically replaces the cached entries for a schema directory."""
+        data = marshal.dumps({'format': FORMAT_VERSION, 'entries': entries})
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, self.path(schema_dir, engine))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
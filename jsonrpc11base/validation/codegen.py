@@ -0,0 +1,496 @@
+"""
+Code-generating validation engine
+
+Turns a JSON-Schema (draft 6 or 7) into the source of a plain Python function
+which checks a value against it, with type checks, required keys, const/enum,
+items and so forth inlined, and compiles it.
+
+The generated function only answers "is this value valid?". Valid values, which
+are by far the common case, never touch jsonschema. When a value is invalid,
+the reference jsonschema validator is run to produce the error, so the
+resulting SchemaError (message, path, value) is exactly the one the default
+engine would raise.
+"""
+import math
+import numbers
+import re
+from urllib.parse import urldefrag
+
+from jsonschema import Draft6Validator, Draft7Validator
+from jsonschema.exceptions import RefResolutionError
+from jsonschema.validators import validator_for
+
+ENTRY_POINT = 'validate'
+
+# Keywords jsonschema ignores unless a format checker is configured.
+_IGNORED = {'format'}
+
+_TYPE_CHECKS = {
+    'array': 'isinstance({v}, list)',
+    'boolean': 'isinstance({v}, bool)',
+    'integer': ('((isinstance({v}, int) and not isinstance({v}, bool)) or '
+                '(isinstance({v}, float) and {v}.is_integer()))'),
+    'null': '{v} is None',
+    'number': ('(type({v}) is int or type({v}) is float or '
+               '(isinstance({v}, _Number) and not isinstance({v}, bool)))'),
+    'object': 'isinstance({v}, dict)',
+    'string': 'isinstance({v}, str)'
+}
+
+
+class Unsupported(Exception):
+    """The schema uses something the generator does not handle."""
+    pass
+
+
+# Helpers available to generated code. These mirror the semantics of the
+# corresponding jsonschema 3.2 validators exactly.
+
+_TRUE = object()
+_FALSE = object()
+_MISSING = object()
+
+
+def _unbool(element):
+    if element is True:
+        return _TRUE
+    elif element is False:
+        return _FALSE
+    return element
+
+
+def _equal(one, two):
+    return _unbool(one) == _unbool(two)
+
+
+def _in_enum(instance, enums):
+    if instance == 0 or instance == 1:
+        unbooled = _unbool(instance)
+        return any(unbooled == _unbool(each) for each in enums)
+    return instance in enums
+
+
+def _multiple_of(instance, divisor):
+    if isinstance(divisor, float):
+        quotient = instance / divisor
+        return int(quotient) == quotient
+    return not instance % divisor
+
+
+def _uniq(container):
+    try:
+        return len(set(_unbool(i) for i in container)) == len(container)
+    except TypeError:
+        seen = []
+        for element in container:
+            element = _unbool(element)
+            if element in seen:
+                return False
+            seen.append(element)
+    return True
+
+
+def _namespace():
+    return {
+        '_Number': numbers.Number,
+        '_re': re,
+        '_MISSING': _MISSING,
+        '_equal': _equal,
+        '_in_enum': _in_enum,
+        '_multiple_of': _multiple_of,
+        '_uniq': _uniq
+    }
+
+
+def _literal(value):
+    """Python source for a JSON value."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return f"float('{value}')"
+    if isinstance(value, dict):
+        items = ', '.join(f'{_literal(k)}: {_literal(v)}' for k, v in value.items())
+        return '{' + items + '}'
+    if isinstance(value, list):
+        return '[' + ', '.join(_literal(v) for v in value) + ']'
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return repr(value)
+    raise Unsupported(f'Cannot express {value!r} as a literal')
+
+
+class _Generator(object):
+    def __init__(self, resolver, validator_class):
+        self.resolver = resolver
+        self.keywords = set(validator_class.VALIDATORS) - _IGNORED
+        self.constants = []
+        self.functions = []
+        self.ref_functions = {}
+        self.counter = 0
+
+    def name(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+    def constant(self, source):
+        name = self.name('_c')
+        self.constants.append(f'{name} = {source}')
+        return name
+
+    def function(self, schema, name=None):
+        """Emits a function returning whether a value validates against schema."""
+        if name is None:
+            name = self.name('_check')
+        body = self.emit(schema, 'value', 1)
+        self.functions.append('\n'.join([f'def {name}(value):'] + body + ['    return True']))
+        return name
+
+    def ref(self, ref):
+        try:
+            url, resolved = self.resolver.resolve(ref)
+        except RefResolutionError as ex:
+            raise Unsupported(str(ex))
+        name = self.ref_functions.get(url)
+        if name is None:
+            # Reserve the name first, so recursive references terminate.
+            name = self.ref_functions[url] = self.name('_ref')
+            self.resolver.push_scope(url)
+            try:
+                self.function(resolved, name)
+            finally:
+                self.resolver.pop_scope()
+        return name
+
+    def emit(self, schema, v, depth):
+        """Returns the lines checking the variable v, returning False on failure."""
+        indent = '    ' * depth
+        if schema is True:
+            return []
+        if schema is False:
+            return [f'{indent}return False']
+        if not isinstance(schema, dict):
+            raise Unsupported(f'Schema must be an object or boolean, not {schema!r}')
+
+        scope = schema.get('$id')
+        if isinstance(scope, str) and scope:
+            self.resolver.push_scope(scope)
+        try:
+            ref = schema.get('$ref')
+            if ref is not None:
+                return [f'{indent}if not {self.ref(ref)}({v}):',
+                        f'{indent}    return False']
+            lines = []
+            for keyword, argument in schema.items():
+                if keyword in self.keywords:
+                    method = getattr(self, 'kw_' + keyword.lstrip('$'))
+                    lines.extend(method(argument, schema, v, depth))
+            return lines
+        finally:
+            if isinstance(scope, str) and scope:
+                self.resolver.pop_scope()
+
+    def fail_if(self, condition, depth):
+        indent = '    ' * depth
+        return [f'{indent}if {condition}:', f'{indent}    return False']
+
+    def guarded(self, guard, body, depth):
+        """Wraps body lines, already indented for depth + 1, in an if statement."""
+        if not body:
+            return []
+        return ['    ' * depth + f'if {guard}:'] + body
+
+    def type_check(self, type_name, v):
+        if type_name not in _TYPE_CHECKS:
+            raise Unsupported(f'Unknown type {type_name!r}')
+        return _TYPE_CHECKS[type_name].format(v=v)
+
+    # Keywords
+
+    def kw_type(self, types, schema, v, depth):
+        if isinstance(types, str):
+            types = [types]
+        if not types:
+            return ['    ' * depth + 'return False']
+        checks = ' or '.join(self.type_check(t, v) for t in types)
+        return self.fail_if(f'not ({checks})', depth)
+
+    def kw_properties(self, properties, schema, v, depth):
+        body = []
+        for name, subschema in properties.items():
+            x = self.name('x')
+            check = self.emit(subschema, x, depth + 2)
+            if check:
+                indent = '    ' * (depth + 1)
+                body.append(f'{indent}{x} = {v}.get({name!r}, _MISSING)')
+                body.append(f'{indent}if {x} is not _MISSING:')
+                body.extend(check)
+        return self.guarded(f'isinstance({v}, dict)', body, depth)
+
+    def kw_required(self, required, schema, v, depth):
+        if not required:
+            return []
+        missing = ' or '.join(f'{name!r} not in {v}' for name in required)
+        return self.fail_if(f'isinstance({v}, dict) and ({missing})', depth)
+
+    def additional_keys(self, schema, k):
+        """A condition true when the key k is neither a property nor matches a pattern."""
+        properties = _literal(sorted(schema.get('properties', {})))
+        condition = f'{k} not in {self.constant(f"frozenset({properties})")}'
+        patterns = '|'.join(schema.get('patternProperties', {}))
+        if patterns:
+            regex = self.constant(f'_re.compile({patterns!r})')
+            condition += f' and not {regex}.search({k})'
+        return condition
+
+    def kw_additionalProperties(self, additional, schema, v, depth):
+        k = self.name('k')
+        indent = '    ' * (depth + 1)
+        if isinstance(additional, dict):
+            x = self.name('x')
+            check = self.emit(additional, x, depth + 3)
+            if not check:
+                return []
+            body = [f'{indent}for {k}, {x} in {v}.items():',
+                    f'{indent}    if {self.additional_keys(schema, k)}:'] + check
+        elif not additional:
+            body = [f'{indent}for {k} in {v}:',
+                    f'{indent}    if {self.additional_keys(schema, k)}:',
+                    f'{indent}        return False']
+        else:
+            return []
+        return self.guarded(f'isinstance({v}, dict)', body, depth)
+
+    def kw_patternProperties(self, patterns, schema, v, depth):
+        body = []
+        indent = '    ' * (depth + 1)
+        for pattern, subschema in patterns.items():
+            k = self.name('k')
+            x = self.name('x')
+            check = self.emit(subschema, x, depth + 3)
+            if check:
+                regex = self.constant(f'_re.compile({pattern!r})')
+                body.extend([f'{indent}for {k}, {x} in {v}.items():',
+                             f'{indent}    if {regex}.search({k}):'] + check)
+        return self.guarded(f'isinstance({v}, dict)', body, depth)
+
+    def kw_propertyNames(self, names, schema, v, depth):
+        k = self.name('k')
+        check = self.emit(names, k, depth + 2)
+        if not check:
+            return []
+        body = ['    ' * (depth + 1) + f'for {k} in {v}:'] + check
+        return self.guarded(f'isinstance({v}, dict)', body, depth)
+
+    def kw_dependencies(self, dependencies, schema, v, depth):
+        body = []
+        for name, dependency in dependencies.items():
+            if isinstance(dependency, list):
+                if dependency:
+                    missing = ' or '.join(f'{each!r} not in {v}' for each in dependency)
+                    body.extend(self.fail_if(f'{name!r} in {v} and ({missing})', depth + 1))
+            else:
+                check = self.emit(dependency, v, depth + 2)
+                body.extend(self.guarded(f'{name!r} in {v}', check, depth + 1))
+        return self.guarded(f'isinstance({v}, dict)', body, depth)
+
+    def kw_minProperties(self, limit, schema, v, depth):
+        return self.fail_if(f'isinstance({v}, dict) and len({v}) < {limit!r}', depth)
+
+    def kw_maxProperties(self, limit, schema, v, depth):
+        return self.fail_if(f'isinstance({v}, dict) and len({v}) > {limit!r}', depth)
+
+    def kw_items(self, items, schema, v, depth):
+        indent = '    ' * (depth + 1)
+        body = []
+        if isinstance(items, list):
+            for index, subschema in enumerate(items):
+                x = self.name('x')
+                check = self.emit(subschema, x, depth + 2)
+                if check:
+                    body.extend([f'{indent}if len({v}) > {index}:',
+                                 f'{indent}    {x} = {v}[{index}]'] + check)
+        else:
+            x = self.name('x')
+            check = self.emit(items, x, depth + 2)
+            if check:
+                body = [f'{indent}for {x} in {v}:'] + check
+        return self.guarded(f'isinstance({v}, list)', body, depth)
+
+    def kw_additionalItems(self, additional, schema, v, depth):
+        items = schema.get('items', {})
+        if isinstance(items, dict):
+            return []
+        if not isinstance(items, list):
+            raise Unsupported('additionalItems with boolean items')
+        if isinstance(additional, dict):
+            x = self.name('x')
+            check = self.emit(additional, x, depth + 2)
+            if not check:
+                return []
+            body = ['    ' * (depth + 1) + f'for {x} in {v}[{len(items)}:]:'] + check
+            return self.guarded(f'isinstance({v}, list)', body, depth)
+        elif not additional:
+            return self.fail_if(f'isinstance({v}, list) and len({v}) > {len(items)}', depth)
+        return []
+
+    def kw_contains(self, contains, schema, v, depth):
+        check = self.function(contains)
+        x = self.name('x')
+        return self.fail_if(
+            f'isinstance({v}, list) and not any({check}({x}) for {x} in {v})', depth)
+
+    def kw_minItems(self, limit, schema, v, depth):
+        return self.fail_if(f'isinstance({v}, list) and len({v}) < {limit!r}', depth)
+
+    def kw_maxItems(self, limit, schema, v, depth):
+        return self.fail_if(f'isinstance({v}, list) and len({v}) > {limit!r}', depth)
+
+    def kw_uniqueItems(self, unique, schema, v, depth):
+        if not unique:
+            return []
+        return self.fail_if(f'isinstance({v}, list) and not _uniq({v})', depth)
+
+    def kw_minLength(self, limit, schema, v, depth):
+        return self.fail_if(f'isinstance({v}, str) and len({v}) < {limit!r}', depth)
+
+    def kw_maxLength(self, limit, schema, v, depth):
+        return self.fail_if(f'isinstance({v}, str) and len({v}) > {limit!r}', depth)
+
+    def kw_pattern(self, pattern, schema, v, depth):
+        regex = self.constant(f'_re.compile({pattern!r})')
+        return self.fail_if(f'isinstance({v}, str) and not {regex}.search({v})', depth)
+
+    def number_bound(self, operator, limit, v, depth):
+        number = self.type_check('number', v)
+        return self.fail_if(f'{number} and {v} {operator} {_literal(limit)}', depth)
+
+    def kw_minimum(self, limit, schema, v, depth):
+        return self.number_bound('<', limit, v, depth)
+
+    def kw_maximum(self, limit, schema, v, depth):
+        return self.number_bound('>', limit, v, depth)
+
+    def kw_exclusiveMinimum(self, limit, schema, v, depth):
+        return self.number_bound('<=', limit, v, depth)
+
+    def kw_exclusiveMaximum(self, limit, schema, v, depth):
+        return self.number_bound('>=', limit, v, depth)
+
+    def kw_multipleOf(self, divisor, schema, v, depth):
+        number = self.type_check('number', v)
+        return self.fail_if(
+            f'{number} and not _multiple_of({v}, {_literal(divisor)})', depth)
+
+    def kw_const(self, const, schema, v, depth):
+        return self.fail_if(f'not _equal({v}, {self.constant(_literal(const))})', depth)
+
+    def kw_enum(self, enum, schema, v, depth):
+        return self.fail_if(f'not _in_enum({v}, {self.constant(_literal(enum))})', depth)
+
+    def kw_allOf(self, subschemas, schema, v, depth):
+        lines = []
+        for subschema in subschemas:
+            lines.extend(self.emit(subschema, v, depth))
+        return lines
+
+    def kw_anyOf(self, subschemas, schema, v, depth):
+        checks = ' or '.join(f'{self.function(s)}({v})' for s in subschemas)
+        return self.fail_if(f'not ({checks})', depth)
+
+    def kw_oneOf(self, subschemas, schema, v, depth):
+        checks = ' + '.join(f'{self.function(s)}({v})' for s in subschemas)
+        return self.fail_if(f'({checks}) != 1', depth)
+
+    def kw_not(self, subschema, schema, v, depth):
+        return self.fail_if(f'{self.function(subschema)}({v})', depth)
+
+    def kw_if(self, if_schema, schema, v, depth):
+        indent = '    ' * depth
+        then_lines = self.emit(schema['then'], v, depth + 1) if 'then' in schema else []
+        else_lines = self.emit(schema['else'], v, depth + 1) if 'else' in schema else []
+        if not then_lines and not else_lines:
+            return []
+        lines = [f'{indent}if {self.function(if_schema)}({v}):']
+        lines.extend(then_lines or [f'{indent}    pass'])
+        if else_lines:
+            lines.append(f'{indent}else:')
+            lines.extend(else_lines)
+        return lines
+
+
+def generate(schema, resolver):
+    """
+    Generates the Python source of a module defining a function named
+    ENTRY_POINT, which returns whether a value is valid against the schema.
+
+    Returns:
+        The source, and the set of document URLs (without fragment) whose
+        $ref targets were inlined into it.
+
+    Raises:
+        Unsupported: The schema cannot be turned into code, and should be
+        validated with jsonschema instead.
+    """
+    validator_class = validator_for(schema)
+    if validator_class not in (Draft6Validator, Draft7Validator):
+        raise Unsupported(f'{validator_class.__name__} is not supported')
+    generator = _Generator(resolver, validator_class)
+    generator.function(schema, ENTRY_POINT)
+    source = ('\n'.join(generator.constants)
+              + '\n\n\n' + '\n\n\n'.join(generator.functions) + '\n')
+    refs = set(urldefrag(url)[0] for url in generator.ref_functions)
+    return source, refs
+
+
+def generate_source(schema, resolver):
+    """Generates the Python source for a schema; see generate()."""
+    return generate(schema, resolver)[0]
+
+
+def compile_code(source, filename='<codegen>'):
+    """Compiles generated source into a (marshallable) code object."""
+    return compile(source, filename, 'exec')
+
+
+def load_check(code):
+    """Runs compiled generated code, returning the check function."""
+    namespace = _namespace()
+    exec(code, namespace)
+    return namespace[ENTRY_POINT]
+
+
+def compile_source(source, filename='<codegen>'):
+    """Compiles generated source, returning the check function."""
+    return load_check(compile_code(source, filename))
+
+
+def make_validator(check, reference):
+    """
+    Combines a generated check function with the reference validator which
+    reports errors.
+    """
+    def validate(value):
+        if not check(value):
+            reference(value)
+    return validate
+
+
+def compile_validator(schema_key, schema, resolver, reference):
+    """
+    Compiles a schema into a validator function which raises SchemaError for
+    invalid values.
+
+    Args:
+        schema_key: The name of the schema, for diagnostics
+        schema: The JSON-Schema
+        resolver: The RefResolver for the schema's $refs
+        reference: The jsonschema-based validator for the same schema; used
+            to report errors, and instead of generated code for schemas the
+            generator does not support
+
+    Returns:
+        A function accepting a value, which raises SchemaError if it is invalid.
+    """
+    try:
+        source = generate_source(schema, resolver)
+    except Unsupported:
+        return reference
+    check = compile_source(source, f'<codegen {schema_key}>')
+    return make_validator(check, reference)
@@ -0,0 +1,260 @@
+"""
+Columnar validation of arrays of rows
+
+Params such as [[1, "a", true], [2, "b", false], ...] or [{"id": 1}, ...],
+with many identically shaped rows, are slow to validate item by item. For an
+array schema whose items are a simple row schema - a tuple (array "items"
+list) or an object ("properties") of primitive types - plan() builds a
+validator which checks the rows a column at a time instead:
+
+1. The shape of every row (its type, length or keys) is checked in one pass.
+2. Each column's values are checked together, by the set of their Python
+   types, which runs at C speed.
+
+Valid arrays, the common case, are accepted after these two passes. The checks
+are strict (exact types), so a row which fails them is then validated with
+jsonschema, to find the first row at fault and its error. An error in a row's
+shape is closer to the top of the params than an error in one of its cells, so
+jsonschema's best_match would report the first row with a shape error, if
+any, and otherwise the first row with a cell error; the error is therefore
+exactly the one the whole schema reports, with the same path.
+"""
+import operator
+from typing import Optional
+
+from jsonschema import Draft6Validator, Draft7Validator
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+
+# Keywords without effect on validation
+_ANNOTATIONS = {'$schema', '$comment', 'title', 'description', 'default', 'examples',
+                'definitions'}
+
+# JSON-Schema primitive type -> the Python types which are exactly it
+_EXACT_TYPES = {
+    'string': {str},
+    'boolean': {bool},
+    'null': {type(None)},
+    'number': {int, float},
+    'integer': {int}
+}
+
+_INFINITY = float('inf')
+
+
+class _Column(object):
+    """A column of a row schema, whose values must be of some primitive types."""
+    def __init__(self, key, schema):
+        types = schema['type']
+        if isinstance(types, str):
+            types = [types]
+        self.key = key
+        self.get = operator.itemgetter(key)
+        self.types = set()
+        for type_name in types:
+            self.types |= _EXACT_TYPES[type_name]
+        # jsonschema accepts floats with integral values as integers, from
+        # draft 6; plan() accepts no earlier drafts
+        self.integral_floats = 'integer' in types and 'number' not in types
+
+    def ok(self, values) -> bool:
+        """Whether all the values are certainly valid."""
+        value_types = set(map(type, values))
+        if value_types <= self.types:
+            return True
+        if self.integral_floats and value_types <= self.types | {float}:
+            return all(value.is_integer() for value in values if type(value) is float)
+        return False
+
+    def value_ok(self, value) -> bool:
+        value_type = type(value)
+        if value_type in self.types:
+            return True
+        return self.integral_floats and value_type is float and value.is_integer()
+
+
+def _is_column(schema):
+    if not isinstance(schema, dict) or 'type' not in schema:
+        return False
+    if set(schema) - _ANNOTATIONS - {'type'}:
+        return False
+    types = schema['type']
+    if isinstance(types, str):
+        types = [types]
+    return isinstance(types, list) and len(types) > 0 and all(
+        type_name in _EXACT_TYPES for type_name in types)
+
+
+def _bounds(schema, minimum, maximum):
+    low = schema.get(minimum, 0)
+    high = schema.get(maximum, _INFINITY)
+    if not all(isinstance(bound, int) and not isinstance(bound, bool) or bound == _INFINITY
+               for bound in (low, high)):
+        return None
+    return low, high
+
+
+class _TupleRows(object):
+    def __init__(self, schema):
+        self.columns = [_Column(index, column) for index, column in enumerate(schema['items'])]
+        self.low, self.high = _bounds(schema, 'minItems', 'maxItems')
+        if schema.get('additionalItems', True) is False:
+            self.high = min(self.high, len(self.columns))
+
+    def shape_ok(self, row):
+        return type(row) is list and self.low <= len(row) <= self.high
+
+    def column_values(self, rows, column):
+        if self.low > column.key:
+            return list(map(column.get, rows))
+        return [row[column.key] for row in rows if len(row) > column.key]
+
+    def has(self, row, column):
+        return len(row) > column.key
+
+
+class _ObjectRows(object):
+    def __init__(self, schema):
+        properties = schema.get('properties', {})
+        self.columns = [_Column(key, column) for key, column in properties.items()]
+        self.required = set(schema.get('required', ()))
+        self.closed = schema.get('additionalProperties', True) is False
+        self.keys = set(properties)
+
+    def shape_ok(self, row):
+        if type(row) is not dict:
+            return False
+        keys = row.keys()
+        if not keys >= self.required:
+            return False
+        return not self.closed or keys <= self.keys
+
+    def column_values(self, rows, column):
+        if column.key in self.required:
+            return list(map(column.get, rows))
+        return [row[column.key] for row in rows if column.key in row]
+
+    def has(self, row, column):
+        return column.key in row
+
+
+def _row_kind(schema):
+    """The rows class for a row schema, or None if it is not a simple one."""
+    if not isinstance(schema, dict):
+        return None
+    keys = set(schema) - _ANNOTATIONS
+    if schema.get('type') == 'array' and isinstance(schema.get('items'), list):
+        if keys - {'type', 'items', 'minItems', 'maxItems', 'additionalItems'}:
+            return None
+        if schema.get('additionalItems', True) not in (True, False):
+            return None
+        if _bounds(schema, 'minItems', 'maxItems') is None:
+            return None
+        if all(_is_column(column) for column in schema['items']):
+            return _TupleRows
+    elif schema.get('type') == 'object':
+        if keys - {'type', 'properties', 'required', 'additionalProperties'}:
+            return None
+        if schema.get('additionalProperties', True) not in (True, False):
+            return None
+        properties = schema.get('properties', {})
+        required = schema.get('required', [])
+        if (isinstance(properties, dict) and isinstance(required, list)
+                and all(isinstance(key, str) for key in required)
+                and all(_is_column(column) for column in properties.values())):
+            return _ObjectRows
+    return None
+
+
+def plan(schema) -> Optional[dict]:
+    """
+    Returns, for an array schema whose items are a simple row schema, the
+    parts a columnar validator is built from: the array schema without its
+    items, and the row schema. Returns None for any other schema, and for
+    schemas of drafts other than 6 and 7, whose types differ (draft 4 does
+    not accept 1.0 as an integer).
+    """
+    if not isinstance(schema, dict) or schema.get('type') != 'array':
+        return None
+    if validator_for(schema) not in (Draft6Validator, Draft7Validator):
+        return None
+    if set(schema) - _ANNOTATIONS - {'type', 'items', 'minItems', 'maxItems'}:
+        return None
+    if _bounds(schema, 'minItems', 'maxItems') is None:
+        return None
+    if _row_kind(schema.get('items')) is None:
+        return None
+    return {
+        'array': {key: value for key, value in schema.items() if key != 'items'},
+        'row': schema['items']
+    }
+
+
+def compile_columnar(schema_plan, validator_class, resolver):
+    """
+    Compiles a plan into a function which returns the error jsonschema's
+    best_match would for a value, or None if it is valid.
+
+    Args:
+        schema_plan: The result of plan()
+        validator_class: The jsonschema validator class for the schema
+        resolver: The RefResolver for the schema
+    """
+    array_validator = validator_class(schema_plan['array'], resolver=resolver)
+    row_validator = validator_class(schema_plan['row'], resolver=resolver)
+    rows_kind = _row_kind(schema_plan['row'])(schema_plan['row'])
+    low, high = _bounds(schema_plan['array'], 'minItems', 'maxItems')
+    shape_ok = rows_kind.shape_ok
+    columns = rows_kind.columns
+
+    def row_error(rows, index):
+        error = best_match(row_validator.iter_errors(rows[index]))
+        if error is not None:
+            # As jsonschema does when descending into the items of an array
+            error.path.appendleft(index)
+            error.schema_path.appendleft('items')
+        return error
+
+    def find_error(rows, shape_failures):
+        """Returns the error for rows which did not all pass the strict checks."""
+        first_cell_error = None
+        for index in shape_failures:
+            error = row_error(rows, index)
+            if error is None:
+                continue
+            if len(error.path) == 1:
+                return error
+            if first_cell_error is None:
+                first_cell_error = error
+        skipped = set(shape_failures)
+        cell_failures = set()
+        for column in columns:
+            values = rows_kind.column_values(
+                [row for index, row in enumerate(rows) if index not in skipped]
+                if skipped else rows, column)
+            if column.ok(values):
+                continue
+            cell_failures.update(
+                index for index, row in enumerate(rows)
+                if (index not in skipped and rows_kind.has(row, column)
+                    and not column.value_ok(row[column.key])))
+        for index in sorted(cell_failures):
+            if first_cell_error is not None and first_cell_error.path[0] < index:
+                break
+            error = row_error(rows, index)
+            if error is not None:
+                return error
+        return first_cell_error
+
+    def first_error(value):
+        if type(value) is not list or not low <= len(value) <= high:
+            error = best_match(array_validator.iter_errors(value))
+            if error is not None or not isinstance(value, list):
+                return error
+        shape_failures = [index for index, row in enumerate(value) if not shape_ok(row)]
+        if not shape_failures and all(
+                column.ok(rows_kind.column_values(value, column)) for column in columns):
+            return None
+        return find_error(value, shape_failures)
+
+    return first_error
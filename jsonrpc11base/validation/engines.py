@@ -0,0 +1,111 @@
+"""
+Validation engines
+
+An engine compiles JSON-Schemas into validators. Engines are registered by
+name, and chosen per service (the validation_engine of JSONRPCService) or per
+method (the validation_engine of JSONRPCService.add()). The engine is applied
+when a method is added, so requests do not pay for the choice. The stock
+engines are:
+
+- jsonschema: validates with the jsonschema package (the default)
+- codegen: validates with Python code generated from each schema; see codegen.py
+- none: validates nothing; only whether a value must be present or absent,
+  which an empty schema file specifies, is enforced
+
+Both jsonschema and codegen check arrays of simple rows a column at a time;
+see columnar.py.
+"""
+import threading
+from typing import Callable, List
+
+import jsonrpc11base.validation.codegen as codegen
+
+
+class ValidationEngine(object):
+    """
+    Compiles schemas into functions which validate values.
+    """
+    def compile(self, schema_key: str, schema: dict, loader, cache_entry: dict) -> Callable:
+        """
+        Compiles a schema.
+
+        Args:
+            schema_key: The name of the schema
+            schema: The JSON-Schema, already checked against its meta-schema,
+                with its local $refs inlined
+            loader: The Schema loading it; see reference() and columnar() for
+                the stock validators, and resolver for any remaining $refs
+            cache_entry: The schema's cache entry, in which work which can be
+                reused by other processes may be kept (as marshallable values)
+
+        Returns:
+            A function accepting a value, which raises SchemaError if the
+            value is invalid.
+        """
+        raise NotImplementedError
+
+
+class JSONSchemaEngine(ValidationEngine):
+    def compile(self, schema_key, schema, loader, cache_entry):
+        return loader.columnar(schema) or loader.reference(schema)
+
+
+class CodegenEngine(ValidationEngine):
+    def compile(self, schema_key, schema, loader, cache_entry):
+        validate = loader.columnar(schema)
+        if validate is not None:
+            return validate
+        validate = loader.reference(schema)
+        code = cache_entry.get('code')
+        if code is None or not loader.refs_fresh(cache_entry.get('refs', {})):
+            try:
+                source, refs = codegen.generate(schema, loader.code_resolver())
+            except codegen.Unsupported:
+                return validate
+            code = codegen.compile_code(source, f'<codegen {schema_key}>')
+            # Including the documents whose $refs were bundled
+            refs = set(refs) | set(cache_entry.get('bundled', ()))
+            ref_digests = {url: loader.file_digest(url) for url in refs}
+            if all(ref_digest is not None for ref_digest in ref_digests.values()):
+                cache_entry['code'] = code
+                cache_entry['refs'] = ref_digests
+            else:
+                # Only code inlining $refs to files in this directory is cached.
+                cache_entry.pop('code', None)
+        return codegen.make_validator(codegen.load_check(code), validate)
+
+
+def _accept(value):
+    pass
+
+
+class NoneEngine(ValidationEngine):
+    def compile(self, schema_key, schema, loader, cache_entry):
+        return _accept
+
+
+_lock = threading.Lock()
+_engines = {
+    'jsonschema': JSONSchemaEngine(),
+    'codegen': CodegenEngine(),
+    'none': NoneEngine()
+}
+
+
+def register(name: str, engine: ValidationEngine):
+    """Registers an engine, or replaces the one registered with the name."""
+    if not isinstance(engine, ValidationEngine):
+        raise ValueError('engine must be a ValidationEngine')
+    with _lock:
+        _engines[name] = engine
+
+
+def get(name: str) -> ValidationEngine:
+    engine = _engines.get(name)
+    if engine is None:
+        raise ValueError(f'Unknown validation engine "{name}"')
+    return engine
+
+
+def names() -> List[str]:
+    return sorted(_engines)
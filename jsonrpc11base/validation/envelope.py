@@ -0,0 +1,72 @@
+"""
+Native JSON-RPC 1.1 request envelope validation
+
+The request envelope is small and fixed, so rather than validating each
+request against jsonrpc_schema/request.json (which is a $ref to
+jsonrpc11.json#definitions/request) through jsonschema, it is checked by hand
+here.
+
+validate_request() raises exactly the SchemaError (message, path, value) that
+the schema would, including which error is reported when there are several:
+jsonschema's best_match prefers errors closest to the top of the instance,
+then errors other than anyOf/oneOf, then the first in schema order. The
+schema remains the reference; see the "schema" envelope validation mode of
+JSONRPCService.
+"""
+import numbers
+
+from jsonrpc11base.validation.schema import SchemaError
+
+# Mirrors jsonrpc11.json#definitions/request
+PROPERTIES = ('version', 'method', 'id', 'params')
+REQUIRED = ('version', 'method')
+VERSION = '1.1'
+ID_TYPES = ('number', 'string', 'boolean', 'array', 'object', 'null')
+
+
+def _is_id(value):
+    if isinstance(value, bool):
+        return True
+    return isinstance(value, (numbers.Number, str, list, dict)) or value is None
+
+
+def validate_request(request):
+    """
+    Validates a JSON-RPC 1.1 request envelope.
+
+    Raises:
+        SchemaError: The request is invalid
+    """
+    if not isinstance(request, dict):
+        raise SchemaError(f"{request!r} is not of type 'object'", 'type', 'object')
+
+    extras = set(key for key in request if key not in PROPERTIES)
+    if extras:
+        verb = 'was' if len(extras) == 1 else 'were'
+        unexpected = ', '.join(repr(extra) for extra in extras)
+        raise SchemaError(f'Additional properties are not allowed ({unexpected} {verb} unexpected)',
+                          'additionalProperties', False)
+
+    for key in REQUIRED:
+        if key not in request:
+            raise SchemaError(f'{key!r} is a required property', 'required', list(REQUIRED))
+
+    if 'version' in request and not request['version'] == VERSION:
+        raise SchemaError(f'{VERSION!r} was expected', 'properties.version.const', VERSION)
+
+    if 'method' in request:
+        method = request['method']
+        if not isinstance(method, str):
+            raise SchemaError(f"{method!r} is not of type 'string'",
+                              'properties.method.type', 'string')
+        if len(method) < 1:
+            raise SchemaError(f'{method!r} is too short', 'properties.method.minLength', 1)
+
+    if 'id' in request and not _is_id(request['id']):
+        types = ', '.join(repr(id_type) for id_type in ID_TYPES)
+        raise SchemaError(f"{request['id']!r} is not of type {types}",
+                          'properties.id.type', list(ID_TYPES))
+
+    if 'params' in request and not isinstance(request['params'], (dict, list)):
+        raise SchemaError(f"{request['params']!r} is not of type 'object'",
+                          'properties.params.anyOf.0.type', 'object')
@@ -0,0 +1,133 @@
+"""
+Memoized params validation
+
+Many calls repeat the same small params (polling calls like get([id])). A
+ValidationMemo remembers, in a size-capped LRU, which small params were
+valid for a method, so that validating them again skips schema evaluation.
+
+Params are memoized only if they are small: at most max_nodes values (the
+params themselves, and every array item and object property value, nested or
+not), and at most max_bytes once serialized. Their canonical serialization
+(compact JSON with sorted keys) is the key; larger params are validated as
+usual, after a walk which stops as soon as they are found to be too large.
+
+Only valid params are remembered, so invalid params are always validated,
+and their errors reported in full.
+"""
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# Types whose values serialize to JSON unambiguously
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class ValidationMemo(object):
+    """
+    An LRU of params known to be valid, which may be shared by methods.
+    """
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 512, max_nodes: int = 64):
+        for name, limit in (('max_entries', max_entries), ('max_bytes', max_bytes),
+                            ('max_nodes', max_nodes)):
+            if limit <= 0:
+                raise ValueError(f'{name} must be greater than 0')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_nodes = max_nodes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Distinguishes the entries of each memoized validator
+        self.tokens = itertools.count()
+
+    def key_of(self, params) -> Optional[str]:
+        """
+        The canonical serialization of small params, or None if they are not
+        small, or not plain JSON values.
+        """
+        nodes = 0
+        stack = [params]
+        while stack:
+            value = stack.pop()
+            nodes += 1
+            if nodes > self.max_nodes:
+                return None
+            value_type = type(value)
+            if value_type is dict:
+                for key, item in value.items():
+                    if type(key) is not str:
+                        return None
+                    stack.append(item)
+            elif value_type is list:
+                stack.extend(value)
+            elif value_type not in _SCALARS:
+                return None
+        key = json.dumps(params, sort_keys=True, separators=(',', ':'), allow_nan=False)
+        if len(key) > self.max_bytes:
+            return None
+        return key
+
+    def params_validator(self, method_name: str, validate: Callable) -> 'MemoizedValidator':
+        """Wraps a method's params validator with the memo."""
+        return MemoizedValidator(self, method_name, validate)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class MemoizedValidator(object):
+    """
+    A method's params validator, which skips params the memo holds as valid.
+    Each has entries of its own, so those of a validator replaced on reload
+    are never used by its replacement.
+    """
+    def __init__(self, memo: ValidationMemo, method_name: str, validate: Callable):
+        self.memo = memo
+        self.method_name = method_name
+        self.validate = validate
+        self.token = next(memo.tokens)
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def __call__(self, params):
+        try:
+            key = self.memo.key_of(params)
+        except ValueError:
+            # NaN or infinity
+            key = None
+        memo = self.memo
+        if key is None:
+            with memo.lock:
+                self.skipped += 1
+            self.validate(params)
+            return
+        key = (self.token, key)
+        with memo.lock:
+            if key in memo.entries:
+                memo.entries.move_to_end(key)
+                self.hits += 1
+                return
+            self.misses += 1
+        self.validate(params)
+        with memo.lock:
+            memo.entries[key] = True
+            if len(memo.entries) > memo.max_entries:
+                memo.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """
+        How many params were found in the memo (hits), validated and then
+        remembered if valid (misses), and validated without the memo because
+        they were not small (skipped).
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'skipped': self.skipped
+        }
@@ -0,0 +1,175 @@
+"""
+Load-time $ref bundling
+
+Left to jsonschema, each $ref is resolved while validating: the reference is
+joined to the current base URL, split from its fragment, looked up (and on
+first use read from disk), and the fragment walked, for every value checked.
+
+The RefBundler instead resolves each local (file:) $ref once, when a schema is
+compiled, and inlines the target in place of the $ref. jsonschema ignores the
+siblings of a $ref, and does not add "$ref" to error schema paths, so the
+bundled schema reports exactly the same errors.
+
+Recursive references cannot be inlined; they are kept as absolute $refs, and
+their documents are put in the resolver's store so that they are never read
+during validation. A cycle of $refs with nothing in between, which could never
+be validated, and a $ref which cannot be resolved, raise UnresolvableRefError.
+"""
+import json
+from urllib.parse import unquote, urldefrag, urljoin, urlparse
+
+from jsonschema.exceptions import RefResolutionError
+
+from jsonrpc11base.exceptions import UnresolvableRefError
+
+# Keywords whose values are subschemas, by how they hold them
+_SCHEMA_KEYWORDS = {
+    'additionalItems': 'schema',
+    'additionalProperties': 'schema',
+    'contains': 'schema',
+    'propertyNames': 'schema',
+    'not': 'schema',
+    'if': 'schema',
+    'then': 'schema',
+    'else': 'schema',
+    'items': 'schema_or_list',
+    'allOf': 'list',
+    'anyOf': 'list',
+    'oneOf': 'list',
+    'properties': 'map',
+    'patternProperties': 'map',
+    'definitions': 'map',
+    'dependencies': 'map'
+}
+
+
+class _NotBundled(Exception):
+    """The schema changes its base URL with $id, so is left as it is."""
+    pass
+
+
+def _is_ref(schema):
+    return isinstance(schema, dict) and isinstance(schema.get('$ref'), str)
+
+
+class RefBundler(object):
+    """
+    Inlines $refs, sharing resolved targets between the schemas bundled.
+
+    Args:
+        resolver: The RefResolver used for validation; documents referred to
+            are added to its store
+        load_document: A function returning the document at a file: URL
+            (without fragment), or None if there is none; raises OSError or
+            ValueError if it cannot be read
+    """
+    def __init__(self, resolver, load_document):
+        self.resolver = resolver
+        self.load_document = load_document
+        # Absolute $ref URL -> (bundled target, URLs of the documents it uses)
+        self.bundled = {}
+
+    def bundle(self, schema_key, schema, base_url):
+        """
+        Returns the schema with its local $refs inlined, and the URLs of the
+        documents whose content was used, or the schema unchanged, and None,
+        if it uses $id.
+
+        Raises:
+            UnresolvableRefError: A $ref is missing, or part of a cycle
+        """
+        documents = set()
+        try:
+            bundled = self.walk(schema_key, schema, base_url, [], documents)
+        except _NotBundled:
+            return schema, None
+        if isinstance(schema, dict) and isinstance(bundled, dict) and '$schema' in schema:
+            # The root's $schema selects the validator.
+            bundled = dict(bundled)
+            bundled['$schema'] = schema['$schema']
+        return bundled, documents
+
+    def walk(self, schema_key, schema, base_url, stack, documents):
+        if not isinstance(schema, dict):
+            return schema
+        if _is_ref(schema):
+            return self.ref(schema_key, urljoin(base_url, schema['$ref']), stack, documents)
+        if isinstance(schema.get('$id'), str) or isinstance(schema.get('id'), str):
+            raise _NotBundled()
+
+        def walk(subschema):
+            return self.walk(schema_key, subschema, base_url, stack, documents)
+
+        bundled = {}
+        for keyword, value in schema.items():
+            kind = _SCHEMA_KEYWORDS.get(keyword)
+            if kind is None:
+                bundled[keyword] = value
+            elif kind == 'map' and isinstance(value, dict):
+                bundled[keyword] = {name: walk(subschema) for name, subschema in value.items()}
+            elif kind in ('list', 'schema_or_list') and isinstance(value, list):
+                bundled[keyword] = [walk(subschema) for subschema in value]
+            elif kind in ('schema', 'schema_or_list'):
+                bundled[keyword] = walk(value)
+            else:
+                bundled[keyword] = value
+        return bundled
+
+    def ref(self, schema_key, url, stack, documents):
+        document_url, fragment = urldefrag(url)
+        if urlparse(document_url).scheme != 'file':
+            # Not local; left to jsonschema.
+            return {'$ref': url}
+
+        cached = self.bundled.get(url)
+        if cached is not None:
+            documents.update(cached[1])
+            return cached[0]
+
+        target = self.resolve(schema_key, url, document_url, fragment)
+        documents.add(document_url)
+        pure = _is_ref(target)
+        for index, (stacked_url, _) in enumerate(stack):
+            if stacked_url == url:
+                if all(stacked_pure for _, stacked_pure in stack[index:]):
+                    raise UnresolvableRefError(
+                        f'Schema "{schema_key}" has a $ref cycle: '
+                        + ' -> '.join(stacked for stacked, _ in stack[index:]) + f' -> {url}')
+                # Recursive; resolved by jsonschema from the store.
+                return {'$ref': url}
+
+        target_documents = set([document_url])
+        stack.append((url, pure))
+        try:
+            bundled = self.walk(schema_key, target, document_url, stack, target_documents)
+        finally:
+            stack.pop()
+        self.bundled[url] = (bundled, target_documents)
+        documents.update(target_documents)
+        return bundled
+
+    def resolve(self, schema_key, url, document_url, fragment):
+        document = self.resolver.store.get(document_url)
+        if document is None:
+            try:
+                document = self.load_document(document_url)
+            except (OSError, ValueError) as ex:
+                raise UnresolvableRefError(
+                    f'Schema "{schema_key}" has an unresolvable $ref "{url}": {ex}')
+            if document is None:
+                raise UnresolvableRefError(
+                    f'Schema "{schema_key}" has an unresolvable $ref "{url}": '
+                    'the document is missing or empty')
+            self.resolver.store[document_url] = document
+        try:
+            return self.resolver.resolve_fragment(document, fragment)
+        except RefResolutionError as ex:
+            raise UnresolvableRefError(
+                f'Schema "{schema_key}" has an unresolvable $ref "{url}": {ex}')
+
+
+def read_document(url):
+    """Reads the JSON document at a file: URL."""
+    with open(unquote(urlparse(url).path), 'rb') as fd:
+        data = fd.read()
+    return json.loads(data) if len(data) > 0 else None
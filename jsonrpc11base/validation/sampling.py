@@ -0,0 +1,179 @@
+"""
+Result validation policies
+
+A policy decides which of a method's results are validated against its result
+schema, and whether a violation fails the call ("enforced") or is only
+counted and logged, with the result returned as-is.
+
+A policy given to a service or method is a template; each method gets its
+own copy (see for_method()), so counters and sampling state are per method,
+and start afresh when the method's schemas are reloaded.
+"""
+import itertools
+import logging
+import random
+import threading
+
+from jsonrpc11base.errors import InvalidResultServerError
+
+log = logging.getLogger(__name__)
+
+
+class ResultValidationPolicy(object):
+    """
+    Base class of result validation policies; validates every result.
+    """
+    # Whether the policy validates any results at all
+    validates = True
+
+    def __init__(self, enforce: bool = True):
+        self.enforce = enforce
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.violations = 0
+
+    def for_method(self):
+        """A new, fresh policy with the same configuration."""
+        raise NotImplementedError()
+
+    def should_validate(self) -> bool:
+        return True
+
+    def check(self, record, result):
+        """
+        Validates a result chosen by should_validate() with the method's result
+        validator, recording and reporting any violation.
+
+        Raises:
+            InvalidResultServerError: The result is invalid, and the policy
+                is enforced
+        """
+        try:
+            record.result_validator(result)
+        except InvalidResultServerError as ex:
+            self.record(True)
+            self.report(record.name, ex)
+            if self.enforce:
+                raise
+        else:
+            self.record(False)
+
+    def report(self, method_name: str, error: InvalidResultServerError):
+        log.warning('Result of method "%s" violates its schema: %s', method_name, error.error)
+
+    def record(self, violated: bool):
+        """Records the outcome of validating a result."""
+        with self.lock:
+            self.checked += 1
+            if violated:
+                self.violations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'checked': self.checked,
+                'violations': self.violations
+            }
+
+
+class Always(ResultValidationPolicy):
+    """Validate every result."""
+    def for_method(self):
+        return Always(enforce=self.enforce)
+
+
+class Never(ResultValidationPolicy):
+    """Validate no results."""
+    validates = False
+
+    def for_method(self):
+        return Never(enforce=self.enforce)
+
+    def should_validate(self):
+        return False
+
+
+class Sample(ResultValidationPolicy):
+    """Validate a random fraction of results, given by rate (0 to 1)."""
+    def __init__(self, rate: float, enforce: bool = False):
+        super().__init__(enforce)
+        if not 0 <= rate <= 1:
+            raise ValueError('The sampling rate must be between 0 and 1')
+        self.rate = rate
+
+    def for_method(self):
+        return Sample(self.rate, enforce=self.enforce)
+
+    def should_validate(self):
+        return random.random() < self.rate
+
+
+class FirstN(ResultValidationPolicy):
+    """Validate the first count results, after startup or a schema change."""
+    def __init__(self, count: int, enforce: bool = False):
+        super().__init__(enforce)
+        self.count = count
+        self.calls = itertools.count()
+
+    def for_method(self):
+        return FirstN(self.count, enforce=self.enforce)
+
+    def should_validate(self):
+        # itertools.count is atomic, so no lock is needed
+        return next(self.calls) < self.count
+
+
+class Adaptive(ResultValidationPolicy):
+    """
+    Validate a fraction of results which rises to max_rate whenever a
+    violation is seen, and otherwise decays by the decay factor with each
+    valid result, down to min_rate. Starts at max_rate.
+    """
+    def __init__(self, min_rate: float = 0.01, max_rate: float = 1.0, decay: float = 0.99,
+                 enforce: bool = False):
+        super().__init__(enforce)
+        if not 0 <= min_rate <= max_rate <= 1:
+            raise ValueError('The sampling rates must be between 0 and 1, '
+                             'with min_rate no greater than max_rate')
+        if not 0 < decay <= 1:
+            raise ValueError('The decay must be greater than 0, and at most 1')
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.decay = decay
+        self.rate = max_rate
+
+    def for_method(self):
+        return Adaptive(self.min_rate, self.max_rate, self.decay, enforce=self.enforce)
+
+    def should_validate(self):
+        return random.random() < self.rate
+
+    def record(self, violated):
+        super().record(violated)
+        if violated:
+            self.rate = self.max_rate
+        else:
+            self.rate = max(self.min_rate, self.rate * self.decay)
+
+    def stats(self):
+        stats = super().stats()
+        stats['rate'] = self.rate
+        return stats
+
+
+POLICIES = {
+    'always': Always,
+    'never': Never
+}
+
+
+def make_policy(policy):
+    """
+    Returns a policy given a policy or the name of a simple one ("always" or
+    "never").
+    """
+    if isinstance(policy, ResultValidationPolicy):
+        return policy
+    if policy in POLICIES:
+        return POLICIES[policy]()
+    raise ValueError(f'Unknown result validation policy "{policy}"')
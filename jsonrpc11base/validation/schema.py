@@ -1,11 +1,45 @@
-from jsonschema import validate, RefResolver
-from jsonschema.exceptions import ValidationError
+from jsonschema import RefResolver
+from jsonschema.exceptions import SchemaError as JSONSchemaSchemaError, best_match
+from jsonschema.validators import validator_for
+from jsonrpc11base.exceptions import InvalidSchemaError
+import jsonrpc11base.validation.columnar as columnar
+import jsonrpc11base.validation.engines as engines
+from jsonrpc11base.validation.cache import SchemaCache, digest
+from jsonrpc11base.validation.refs import RefBundler, read_document
+import jsonrpc11base.validation.bundle as bundle
+import jsonrpc11base.validation.budget as budget
+import atexit
 import os
 import glob
 import json
+import threading
+import weakref
 
 DEFAULT_SCHEMA_DIR = 'schemas'
 
+# The cache entry of a bundle file itself; not a valid schema key
+BUNDLE_ENTRY = '/'
+
+# Lazy Schemas which loaded schemas since their cache was last written
+_unsaved = weakref.WeakSet()
+_unsaved_lock = threading.Lock()
+
+
+def flush_caches():
+    """
+    Writes the caches of lazy Schemas which loaded schemas since they were
+    last written. Run at exit, so that loading a schema on first use does not
+    write the whole cache on the request path.
+    """
+    with _unsaved_lock:
+        schemas = list(_unsaved)
+        _unsaved.clear()
+    for schema in schemas:
+        schema.save_cache()
+
+
+atexit.register(flush_caches)
+
 
 class SchemaError(Exception):
     def __init__(self, message, path, value):
@@ -14,46 +48,429 @@ class SchemaError(Exception):
         self.value = value
 
 
+def reference_validator(validator):
+    """
+    Returns a function which validates a value with a jsonschema validator,
+    raising SchemaError for the best matching error if it is invalid.
+    """
+    def validate(value):
+        # Same outcome as jsonschema.validate(), minus the per-call
+        # meta-schema check and validator construction.
+        error = best_match(validator.iter_errors(value))
+        if error is not None:
+            raise schema_error(error)
+    return validate
+
+
+def schema_error(error):
+    """ The SchemaError for a jsonschema ValidationError. """
+    return SchemaError(error.message,
+                       '.'.join(map(str, error.absolute_schema_path)),
+                       error.validator_value)
+
+
+def columnar_validator(first_error):
+    """
+    Returns a function which validates a value with a columnar validator (see
+    columnar.compile_columnar), raising SchemaError if it is invalid.
+    """
+    def validate(value):
+        error = first_error(value)
+        if error is not None:
+            raise schema_error(error)
+    return validate
+
+
+class TimedLoader(object):
+    """
+    A Schema, as passed to engines, whose jsonschema validators stop once the
+    validation deadline has passed; see Schema.compile().
+    """
+    def __init__(self, schema):
+        self.schema = schema
+
+    def __getattr__(self, name):
+        return getattr(self.schema, name)
+
+    def reference(self, schema):
+        return self.schema.reference(schema, timed=True)
+
+    def columnar(self, schema):
+        return self.schema.columnar(schema, timed=True)
+
+
 class Schema(object):
-    def __init__(self, schema_dir):
+    def __init__(self, schema_dir, engine='jsonschema', cache_dir=None, lazy=False,
+                 previous=None):
+        """
+        Loads the schemas in a directory or bundle file.
+
+        previous is the Schema being reloaded, if any; the files and compiled
+        schemas which have not changed since it was loaded are reused.
+        """
         if schema_dir is None:
             raise Exception('schema_dir is required')
 
-        self.schema_dir = os.path.abspath(schema_dir)
+        # The name of the engine, see engines.py; raises ValueError if unknown
+        engines.get(engine)
+        self.engine = engine
 
-        self.resolver = RefResolver(f'file://{schema_dir}/', None)
+        # A bundle file is treated as a directory named after it, without its
+        # extension; see bundle.py.
+        if bundle.is_bundle(schema_dir):
+            self.bundle_path = os.path.abspath(schema_dir)
+            bundle.bundle_format(self.bundle_path)
+            self.schema_dir = os.path.splitext(self.bundle_path)[0]
+        else:
+            self.bundle_path = None
+            self.schema_dir = os.path.abspath(schema_dir)
+        # What the cache is for
+        self.source = self.bundle_path or self.schema_dir
 
-        self.schemas = self.load()
+        self.resolver = RefResolver(f'file://{self.schema_dir}/', None)
+        self.bundler = RefBundler(self.resolver, self.load_document)
 
-    def load(self):
-        schemas = {}
+        self.cache_dir = cache_dir
+        self.cache = SchemaCache(cache_dir) if cache_dir is not None else None
+        if previous is not None:
+            self.cached_entries = dict(previous.cached_entries)
+            self.cached_entries.update(previous.entries)
+        elif self.cache is not None:
+            self.cached_entries = self.cache.read(self.source, self.engine)
+        else:
+            self.cached_entries = {}
+
+        # Cache entries for schema files read (or verified) by this process
+        self.entries = {}
+
+        # Guards the per-key locks, and writing the cache
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+        # Schema key -> file path, for every schema in the directory or bundle
+        if self.bundle_path is not None:
+            self.index = self.build_bundle_index()
+        else:
+            self.index = self.build_index()
+
+        # Compiled schemas which may be reused, from the Schema being reloaded
+        if previous is not None:
+            previous_schemas = dict(previous.previous_schemas)
+            previous_schemas.update(previous.schemas)
+            self.previous_schemas = {key: schema for key, schema in previous_schemas.items()
+                                     if key in self.index}
+        else:
+            self.previous_schemas = {}
+        # Keys of the previous compiled schemas reused
+        self.reused = set()
+
+        # In lazy mode, schemas are loaded and compiled on first use.
+        self.lazy = lazy
+        if lazy:
+            self.schemas = {}
+        else:
+            self.schemas = self.load()
+            self.previous_schemas = {}
+
+    def build_index(self):
+        index = {}
         for file_path in glob.glob(f'{self.schema_dir}/*.json'):
             file_base_name = os.path.splitext(os.path.basename(file_path))[0]
+            index[file_base_name] = file_path
+        return index
 
-            with open(file_path) as fd:
-                schema_text = fd.read()
-                if len(schema_text) == 0:
-                    # this means the associated value must
-                    # be absent
-                    schema = {
-                        'absent': True
-                    }
+    def build_bundle_index(self):
+        """
+        Reads a bundle file, or takes its schemas from the cache if it is
+        unchanged, setting the entries of all of its schemas.
+        """
+        stat = os.stat(self.bundle_path)
+        cached_entry = self.cached_entries.get(BUNDLE_ENTRY)
+        if (cached_entry is not None
+                and cached_entry['mtime'] == stat.st_mtime_ns
+                and cached_entry['size'] == stat.st_size):
+            keys = cached_entry['keys']
+            entries = {key: dict(self.cached_entries[key]) for key in keys}
+        else:
+            with open(self.bundle_path, 'rb') as fd:
+                bundle_data = fd.read()
+            schemas = bundle.schemas_of(bundle.parse(bundle_data,
+                                                     bundle.bundle_format(self.bundle_path)),
+                                        self.bundle_path)
+            cached_entry = {'keys': sorted(schemas)}
+            entries = {}
+            for key, schema in schemas.items():
+                schema_digest = digest(json.dumps(schema, sort_keys=True).encode('utf-8'))
+                entry = self.cached_entries.get(key)
+                if entry is not None and entry['digest'] == schema_digest:
+                    entry = dict(entry)
                 else:
-                    schema = {
-                        'schema': json.loads(schema_text)
-                    }
-                schemas[file_base_name] = schema
+                    entry = {'digest': schema_digest, 'schema': schema}
+                entries[key] = entry
+        cached_entry = dict(cached_entry, mtime=stat.st_mtime_ns, size=stat.st_size)
+        self.entries.update(entries)
+        self.entries[BUNDLE_ENTRY] = cached_entry
+        for key, entry in entries.items():
+            # Documents for $refs which jsonschema resolves itself
+            if entry['schema'] is not None:
+                self.resolver.store[self.schema_url(key)] = entry['schema']
+        return {key: self.bundle_path for key in entries}
+
+    def load(self):
+        # First read (or take from the cache) all schema files, so that their
+        # content hashes are known when checking the freshness of generated
+        # code which inlines $refs to them.
+        for schema_key in self.index:
+            self.entry(schema_key)
+
+        schemas = {}
+        for schema_key in self.index:
+            schemas[schema_key] = self.load_schema(schema_key)
+
+        self.save_cache()
         return schemas
 
+    def load_schema(self, schema_key):
+        entry = self.entry(schema_key)
+        previous = self.previous_schemas.get(schema_key)
+        if (previous is not None and previous['digest'] == entry['digest']
+                and self.refs_fresh(previous.get('refs', {}))):
+            self.reused.add(schema_key)
+            return previous
+        if entry['schema'] is None:
+            # An empty file means the associated value must be absent.
+            return {
+                'absent': True,
+                'digest': entry['digest']
+            }
+        schema = {
+            'schema': entry['schema'],
+            'digest': entry['digest']
+        }
+        schema['validator'] = self.compile(schema_key, entry['schema'], entry)
+        # The files whose $refs were inlined into the validator
+        schema['refs'] = entry.get('bundled', {})
+        return schema
+
+    def reloaded(self):
+        """
+        Returns a new Schema for the current content of the directory or
+        bundle, reusing what has not changed since this one was loaded.
+        """
+        return Schema(self.source, engine=self.engine, cache_dir=self.cache_dir,
+                      lazy=self.lazy, previous=self)
+
+    def changes(self, previous):
+        """
+        The keys of the schemas added, removed, or changed since a previous
+        Schema for the same directory or bundle was loaded.
+        """
+        changed = set(self.index) ^ set(previous.index)
+        for schema_key in set(self.index) & set(previous.index):
+            previous_entry = previous.entries.get(schema_key)
+            if previous_entry is not None and previous_entry['digest'] != self.entry(
+                    schema_key)['digest']:
+                changed.add(schema_key)
+        return sorted(changed)
+
+    def signature(self):
+        """
+        The mtime and size of each file in the directory, or of the bundle;
+        which changes when they do.
+        """
+        if self.bundle_path is not None:
+            paths = [self.bundle_path]
+        else:
+            paths = glob.glob(f'{self.schema_dir}/*.json')
+        signature = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature[path] = (stat.st_mtime_ns, stat.st_size)
+        return signature
+
+    def load_lazily(self, schema_key):
+        """
+        Loads and compiles a schema on first use. A lock per schema key ensures
+        that concurrent first uses compile it only once. The cache is written
+        by warm(), or at exit; see flush_caches().
+        """
+        with self.lock:
+            key_lock = self.key_locks.setdefault(schema_key, threading.Lock())
+        with key_lock:
+            schema = self.schemas.get(schema_key)
+            if schema is None:
+                schema = self.load_schema(schema_key)
+                self.schemas[schema_key] = schema
+                if self.cache is not None:
+                    with _unsaved_lock:
+                        _unsaved.add(self)
+        return schema
+
+    def warm(self, schema_keys):
+        """
+        Loads the given schemas now, rather than on first use, and writes the
+        cache; unknown keys are ignored.
+        """
+        for schema_key in schema_keys:
+            self.get(schema_key)
+        self.save_cache()
+
+    def entry(self, schema_key):
+        """
+        The cache entry for a schema file, which is read, or verified against
+        the on-disk cache, once per process.
+        """
+        entry = self.entries.get(schema_key)
+        if entry is None:
+            entry = self.load_entry(self.index[schema_key],
+                                    self.cached_entries.get(schema_key))
+            self.entries[schema_key] = entry
+        return entry
+
+    def save_cache(self):
+        """Writes the cache if any entries changed."""
+        if self.cache is None:
+            return
+        with self.lock:
+            entries = dict(self.cached_entries)
+            entries.update(self.entries)
+            entries = {key: entry for key, entry in entries.items()
+                       if key in self.index or key == BUNDLE_ENTRY}
+            if entries != self.cached_entries:
+                self.cache.write(self.source, self.engine, entries)
+                self.cached_entries = entries
+
+    def load_entry(self, file_path, cached_entry):
+        """
+        Returns the cache entry for a schema file; the cached entry if the
+        file is unchanged, otherwise a new entry with the parsed schema.
+        """
+        stat = os.stat(file_path)
+        if (cached_entry is not None
+                and cached_entry['mtime'] == stat.st_mtime_ns
+                and cached_entry['size'] == stat.st_size):
+            # Copied, as compiling may update the entry.
+            return dict(cached_entry)
+
+        with open(file_path, 'rb') as fd:
+            schema_data = fd.read()
+        file_digest = digest(schema_data)
+        if cached_entry is not None and cached_entry['digest'] == file_digest:
+            # Touched, but not changed.
+            entry = dict(cached_entry)
+        else:
+            entry = {
+                'digest': file_digest,
+                'schema': json.loads(schema_data) if len(schema_data) > 0 else None
+            }
+        entry['mtime'] = stat.st_mtime_ns
+        entry['size'] = stat.st_size
+        return entry
+
+    def schema_url(self, schema_key):
+        return f'file://{self.schema_dir}/{schema_key}.json'
+
+    def schema_key_of(self, url):
+        """The key of the schema file in this directory at a URL, or None."""
+        prefix = f'file://{self.schema_dir}/'
+        if url.startswith(prefix) and url.endswith('.json'):
+            schema_key = url[len(prefix):-len('.json')]
+            if schema_key in self.index:
+                return schema_key
+        return None
+
+    def file_digest(self, url):
+        """The content hash of a schema file in this directory, given its URL."""
+        schema_key = self.schema_key_of(url)
+        return self.entry(schema_key)['digest'] if schema_key is not None else None
+
+    def load_document(self, url):
+        """The document at a file: URL, for resolving $refs; see RefBundler."""
+        schema_key = self.schema_key_of(url)
+        if schema_key is not None:
+            return self.entry(schema_key)['schema']
+        return read_document(url)
+
+    def refs_fresh(self, refs):
+        """Whether the files whose $refs were inlined into generated code are unchanged."""
+        return all(self.file_digest(url) == ref_digest for url, ref_digest in refs.items())
+
+    def compile(self, schema_key, schema, cache_entry=None, engine=None, timed=False):
+        """
+        Builds the validator for a schema once, so that validating a value
+        does not re-check the schema against its meta-schema and construct
+        a new validator each time.
+
+        Args:
+            schema_key: The name of the schema
+            schema: The JSON-Schema
+            cache_entry: An optional cache entry for the schema, which is
+                used to skip work already done, and updated with the work done
+            engine: The name of the engine compiling the schema; defaults to
+                this Schema's
+            timed: Whether the jsonschema validators built stop once the
+                validation deadline has passed; see budget.timed()
+
+        Returns:
+            A function accepting a value, which raises SchemaError if the
+            value is invalid.
+        """
+        if cache_entry is None:
+            cache_entry = {}
+
+        validator_class = validator_for(schema)
+        if not cache_entry.get('checked'):
+            try:
+                validator_class.check_schema(schema)
+            except JSONSchemaSchemaError as ex:
+                raise InvalidSchemaError(f'Schema "{schema_key}" is invalid: {ex.message}')
+            cache_entry['checked'] = True
+        # Local $refs are resolved, and missing ones reported, now rather than
+        # while validating.
+        schema, documents = self.bundler.bundle(schema_key, schema, self.schema_url(schema_key))
+        cache_entry['bundled'] = {url: self.file_digest(url) for url in documents or ()}
+        loader = TimedLoader(self) if timed else self
+        return engines.get(engine or self.engine).compile(schema_key, schema, loader, cache_entry)
+
+    def validator_class(self, schema, timed=False):
+        validator_class = validator_for(schema)
+        return budget.timed(validator_class) if timed else validator_class
+
+    def reference(self, schema, timed=False):
+        """The validator for a schema using the jsonschema package."""
+        validator_class = self.validator_class(schema, timed)
+        return reference_validator(validator_class(schema, resolver=self.resolver))
+
+    def columnar(self, schema, timed=False):
+        """
+        The columnar validator for a schema of an array of simple rows, or
+        None for any other schema; see columnar.py.
+        """
+        schema_plan = columnar.plan(schema)
+        if schema_plan is None:
+            return None
+        return columnar_validator(columnar.compile_columnar(
+            schema_plan, self.validator_class(schema, timed), self.resolver))
+
+    def code_resolver(self):
+        """
+        A resolver of its own for generating code, as code may be generated
+        lazily while other threads validate with the shared one.
+        """
+        return RefResolver(self.resolver.base_uri, None, store=self.resolver.store)
+
     def validate_absent(self, schema_key):
         """ Used in the case in which the value is absent. """
-        schema = self.schemas.get(schema_key, None)
+        schema = self.get(schema_key)
         if schema is None:
             return False
         return schema.get('absent', False)
 
     def validate(self, schema_key, value):
-        schema_wrapper = self.schemas.get(schema_key)
+        schema_wrapper = self.get(schema_key)
 
         if schema_wrapper is None:
             raise SchemaError(
@@ -69,13 +486,76 @@ class Schema(object):
                 value
             )
 
-        schema = schema_wrapper.get('schema')
-        try:
-            validate(instance=value, schema=schema, resolver=self.resolver)
-        except ValidationError as ex:
-            message = ex.message
-            path = '.'.join(map(str, ex.absolute_schema_path))
-            raise SchemaError(message, path, ex.validator_value)
+        schema_wrapper['validator'](value)
+
+    def kind(self, schema_key):
+        """
+        Whether a schema specifies a value ("schema"), specifies that the
+        value must be absent ("absent"), or does not exist (None). Does not
+        load a lazy schema.
+        """
+        schema = self.schemas.get(schema_key)
+        if schema is None:
+            if not self.lazy or schema_key not in self.index:
+                return None
+            if self.bundle_path is not None:
+                return 'absent' if self.entries[schema_key]['schema'] is None else 'schema'
+            return 'absent' if os.path.getsize(self.index[schema_key]) == 0 else 'schema'
+        return 'absent' if schema.get('absent') else 'schema'
+
+    def validator(self, schema_key, engine=None, timed=False):
+        """
+        The compiled validator for a schema which exists and is not absent;
+        in lazy mode, a function which loads the schema when first called.
+        engine is the name of the engine to compile it with, if not this
+        Schema's. With timed, its jsonschema validators stop once the
+        validation deadline of a ValidationBudget has passed; only methods
+        whose budget has a max_time need it.
+        """
+        if engine == self.engine:
+            engine = None
+        elif engine is not None:
+            engines.get(engine)
+        schema = self.schemas.get(schema_key)
+        if schema is not None:
+            return self.engine_validator(schema_key, schema, engine, timed)
+
+        compiled = []
+
+        def validate(value):
+            if not compiled:
+                compiled.append(self.engine_validator(schema_key, self.get(schema_key), engine,
+                                                      timed))
+            compiled[0](value)
+        return validate
+
+    def engine_validator(self, schema_key, schema, engine, timed=False):
+        """
+        The validator for a loaded schema; compiled with another engine, or
+        timed, on first use, and kept with the schema, so that it is reused as
+        long as the schema is.
+        """
+        if engine is None and not timed:
+            return schema['validator']
+        key = (engine, timed)
+        validate = schema.get('engines', {}).get(key)
+        if validate is not None:
+            return validate
+        with self.lock:
+            key_lock = self.key_locks.setdefault(schema_key, threading.Lock())
+        with key_lock:
+            validators = schema.setdefault('engines', {})
+            validate = validators.get(key)
+            if validate is None:
+                validate = self.compile(schema_key, schema['schema'], self.entry(schema_key),
+                                        engine=engine, timed=timed)
+                validators[key] = validate
+        return validate
 
     def get(self, schema_name, default_value=None):
-        return self.schemas.get(schema_name, default_value)
+        schema = self.schemas.get(schema_name)
+        if schema is None:
+            if not self.lazy or schema_name not in self.index:
+                return default_value
+            schema = self.load_lazily(schema_name)
+        return schema
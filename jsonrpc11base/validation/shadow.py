@@ -0,0 +1,148 @@
+"""
+Shadow result validation
+
+With the Shadow result validation policy, results are validated on a pool of
+background threads rather than in the request path: the response is returned
+at once, and a snapshot of the result is queued for validation. Violations
+are reported to a sink, and never change the response. When the queue is
+full, results are dropped (and counted) rather than blocking the caller.
+
+Example:
+    pool = ShadowPool(workers=2)
+    service = JSONRPCService(description, schema_dir=schema_dir,
+                             result_validation=Shadow(pool))
+"""
+import copy
+import logging
+import queue
+import threading
+from typing import Callable, Optional
+
+from jsonrpc11base.errors import InvalidResultServerError
+from jsonrpc11base.validation.sampling import ResultValidationPolicy
+
+log = logging.getLogger(__name__)
+
+
+class ShadowPool(object):
+    """
+    A bounded queue of validation tasks, and the worker threads which run
+    them. The workers are started when the first task is submitted.
+    """
+    def __init__(self, workers: int = 1, queue_size: int = 1024):
+        if workers < 1:
+            raise ValueError('A shadow pool must have at least one worker')
+        self.workers = workers
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self.run, name=f'shadow-validation-{index}',
+                                          daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, task: Callable) -> bool:
+        """
+        Queues a task, returning False if the queue is full and the task was
+        dropped.
+        """
+        if not self.threads:
+            self.start()
+        try:
+            self.queue.put_nowait(task)
+        except queue.Full:
+            return False
+        return True
+
+    def run(self):
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    return
+                task()
+            except Exception:
+                log.exception('Shadow validation task failed')
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """Waits until every queued task has been run."""
+        self.queue.join()
+
+    def close(self):
+        """Runs the queued tasks, then stops the workers."""
+        with self.lock:
+            threads, self.threads = self.threads, []
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join()
+
+
+class Shadow(ResultValidationPolicy):
+    """
+    Validate results in the background, on the given pool. Which results are
+    validated may be narrowed with another policy, such as Sample(0.1).
+
+    Violations are passed to sink(method_name, error), where error is the
+    InvalidResultServerError, or logged if there is no sink.
+    """
+    def __init__(self, pool: ShadowPool,
+                 sink: Optional[Callable[[str, InvalidResultServerError], None]] = None,
+                 sample: Optional[ResultValidationPolicy] = None):
+        super().__init__(enforce=False)
+        self.pool = pool
+        self.sink = sink
+        self.sample = sample
+        self.dropped = 0
+
+    def for_method(self):
+        sample = self.sample.for_method() if self.sample is not None else None
+        return Shadow(self.pool, sink=self.sink, sample=sample)
+
+    def should_validate(self):
+        return self.sample is None or self.sample.should_validate()
+
+    def check(self, record, result):
+        # The handler may still hold, and change, the result.
+        snapshot = copy.deepcopy(result)
+        validate = record.result_validator
+        method_name = record.name
+
+        def task():
+            try:
+                validate(snapshot)
+            except InvalidResultServerError as ex:
+                self.record(True)
+                self.report(method_name, ex)
+            else:
+                self.record(False)
+
+        if not self.pool.submit(task):
+            with self.lock:
+                self.dropped += 1
+
+    def record(self, violated):
+        super().record(violated)
+        # An adaptive sample learns from the outcomes of the results it chose.
+        if self.sample is not None:
+            self.sample.record(violated)
+
+    def report(self, method_name, error):
+        if self.sink is None:
+            super().report(method_name, error)
+        else:
+            self.sink(method_name, error)
+
+    def stats(self):
+        stats = super().stats()
+        with self.lock:
+            stats['dropped'] = self.dropped
+        return stats
@@ -2,9 +2,86 @@ from .schema import Schema, SchemaError
 from jsonrpc11base.errors import InvalidParamsError, InvalidResultServerError
 
 
+def as_params_validator(validate):
+    """
+    Wraps a function raising SchemaError into one raising InvalidParamsError.
+    """
+    def validate_params(data):
+        try:
+            validate(data)
+        except SchemaError as ex:
+            raise InvalidParamsError(
+                message=ex.message,
+                path=ex.path,
+                value=ex.value
+            )
+    return validate_params
+
+
+def as_result_validator(validate):
+    """
+    Wraps a function raising SchemaError into one raising
+    InvalidResultServerError.
+    """
+    def validate_result(data):
+        try:
+            validate(data)
+        except SchemaError as ex:
+            raise InvalidResultServerError(
+                message=ex.message,
+                path=ex.path,
+                value=ex.value
+            )
+    return validate_result
+
+
 class Validation(object):
-    def __init__(self, schema_dir):
-        self.schema = Schema(schema_dir)
+    def __init__(self, schema_dir, engine='jsonschema', cache_dir=None, lazy=False,
+                 previous=None):
+        self.schema = Schema(schema_dir, engine=engine, cache_dir=cache_dir, lazy=lazy,
+                             previous=previous.schema if previous is not None else None)
+
+    def reloaded(self):
+        """A new Validation for the current schemas; see Schema.reloaded()."""
+        schema = self.schema
+        return Validation(schema.source, engine=schema.engine, cache_dir=schema.cache_dir,
+                          lazy=schema.lazy, previous=self)
+
+    def warm(self, method_names):
+        """Loads the params and result schemas of the given methods ahead of first use."""
+        schema_keys = []
+        for method_name in method_names:
+            schema_keys.append(method_name + '.params')
+            schema_keys.append(method_name + '.result')
+        self.schema.warm(schema_keys)
+
+    def params_kind(self, method_name):
+        """The kind of params schema for a method; see Schema.kind()."""
+        return self.schema.kind(method_name + '.params')
+
+    def result_kind(self, method_name):
+        """The kind of result schema for a method; see Schema.kind()."""
+        return self.schema.kind(method_name + '.result')
+
+    def params_validator(self, method_name, engine=None, timed=False):
+        """
+        Returns a function which validates params for a method, raising
+        InvalidParamsError if they are invalid. The method must have a params
+        schema. engine is the name of the validation engine, if not the
+        schema's; timed is whether validation stops at the deadline of a
+        ValidationBudget's max_time.
+        """
+        return as_params_validator(self.schema.validator(method_name + '.params', engine,
+                                                         timed))
+
+    def result_validator(self, method_name, engine=None):
+        """
+        Returns a function which validates a method's result, raising
+        InvalidResultServerError if it is invalid. The method must have a
+        result schema. engine is the name of the validation engine, if not
+        the schema's.
+        """
+        return as_result_validator(self.schema.validator(method_name + '.result', engine))
 
     def has_params_validation(self, method_name):
         schema_key = method_name + '.params'
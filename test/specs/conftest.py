@@ -0,0 +1,26 @@
+import pytest
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+
+@pytest.fixture
+def make_service(request):
+    """
+    Makes services of the test schemas, validating params. A test module may
+    set SERVICE_OPTIONS, the JSONRPCService options of its services, and
+    SERVICE_METHODS, the methods added to them, by name; the keyword
+    arguments of a call override the options.
+    """
+    options = {'schema_dir': SCHEMA_DIR, 'validate_params': True}
+    options.update(getattr(request.module, 'SERVICE_OPTIONS', {}))
+    methods = getattr(request.module, 'SERVICE_METHODS', {})
+
+    def make(**kwargs):
+        service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                                 **dict(options, **kwargs))
+        for name, method in methods.items():
+            service.add(method, name=name)
+        return service
+    return make
@@ -0,0 +1,184 @@
+import threading
+import tracemalloc
+
+import pytest
+
+from jsonrpc11base.allocations import AllocationTracker
+from jsonrpc11base.method import Method
+
+retained = []
+
+
+def add(params, options):
+    # Keeps about 100KB, and allocates about 1MB for a moment
+    retained.append(bytearray(100000))
+    scratch = bytearray(1000000)
+    del scratch
+    return params[0] + params[1]
+
+
+# The site of add's retained allocation
+RETAINED_SITE = f'test_allocations.py:{add.__code__.co_firstlineno + 2}'
+
+SERVICE_OPTIONS = {'validate_result': True}
+
+SERVICE_METHODS = {
+    'add': add,
+    'square': lambda params, options: 'x'
+}
+
+
+def call(service, method, params):
+    return service.call_py({'version': '1.1', 'method': method, 'params': params})
+
+
+def test_invalid_trackers():
+    with pytest.raises(ValueError):
+        AllocationTracker(sample_rate=1.5)
+    with pytest.raises(ValueError):
+        AllocationTracker(top_sites=0)
+    with pytest.raises(ValueError):
+        AllocationTracker(frames=0)
+
+
+def test_no_tracker(make_service):
+    service = make_service()
+    assert 'call' not in vars(service.find_method('add').method)
+    assert service.allocation_stats() == {}
+    assert 'allocations' not in call(service, 'system.stats', {})['result']['methods']['add']
+
+
+def test_allocations(make_service):
+    retained.clear()
+    service = make_service(allocation_tracker=AllocationTracker(sample_rate=1.0, top_sites=3))
+    # System methods are not tracked.
+    assert 'call' not in vars(service.find_method('system.stats').method)
+    for _ in range(2):
+        assert call(service, 'add', [1, 2])['result'] == 3
+    assert not tracemalloc.is_tracing()
+    stats = service.allocation_stats()
+    assert list(stats) == ['add']
+    allocations = stats['add']
+    assert allocations['calls'] == 2
+    assert 100000 <= allocations['mean_net_bytes'] < 120000
+    assert allocations['net_bytes'] >= 200000
+    assert allocations['max_net_bytes'] >= 100000
+    assert 1000000 <= allocations['max_peak_bytes'] < 1200000
+    assert allocations['mean_peak_bytes'] >= 1000000
+    assert len(allocations['top_sites']) <= 3
+    top_site = allocations['top_sites'][0]
+    assert top_site['site'].endswith(RETAINED_SITE)
+    assert top_site['net_bytes'] >= 200000
+    assert top_site['net_blocks'] >= 2
+    # The method's own statistics are still kept.
+    assert service.find_method('add').method.call_count == 2
+
+
+def test_sample_rate(make_service):
+    service = make_service(allocation_tracker=AllocationTracker(sample_rate=0.0))
+    call(service, 'add', [1, 2])
+    assert service.allocation_stats() == {}
+
+
+def test_already_tracing(make_service):
+    retained.clear()
+    service = make_service(allocation_tracker=AllocationTracker(sample_rate=1.0))
+    tracemalloc.start()
+    try:
+        call(service, 'add', [1, 2])
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    allocations = service.allocation_stats()['add']
+    assert allocations['calls'] == 1
+    assert allocations['net_bytes'] >= 100000
+    assert allocations['top_sites'][0]['site'].endswith(RETAINED_SITE)
+
+
+def test_reset_and_prefix(make_service):
+    tracker = AllocationTracker(sample_rate=1.0)
+    service = make_service(allocation_tracker=tracker)
+    call(service, 'add', [1, 2])
+    call(service, 'square', [2])
+    assert sorted(service.allocation_stats()) == ['add', 'square']
+    assert list(service.allocation_stats(prefix='sq', reset=True)) == ['square']
+    assert list(service.allocation_stats()) == ['add']
+
+
+def test_one_call_at_a_time():
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def wait(params, options):
+        # Only the first call waits.
+        if not started.is_set():
+            started.set()
+            proceed.wait(5)
+        return 'x'
+    tracker = AllocationTracker(sample_rate=1.0)
+    method = Method(wait)
+    tracker.install('wait', method)
+    thread = threading.Thread(target=method.call, args=([1], None))
+    thread.start()
+    started.wait(5)
+    assert method.call([1], None) == 'x'
+    proceed.set()
+    thread.join()
+    assert tracker.skipped == 1
+    assert tracker.stats()['wait']['calls'] == 1
+
+
+def test_errors_measured():
+    def broken(params, options):
+        raise ValueError('broken')
+    tracker = AllocationTracker(sample_rate=1.0)
+    method = Method(broken)
+    tracker.install('broken', method)
+    with pytest.raises(ValueError):
+        method.call([1], None)
+    assert tracker.stats()['broken']['calls'] == 1
+    assert method.error_count == 1
+
+
+def test_system_stats(make_service):
+    service = make_service(allocation_tracker=AllocationTracker(sample_rate=1.0),
+                           stats_authorizer=lambda options: True)
+    call(service, 'add', [1, 2])
+    methods = call(service, 'system.stats', {'reset': True})['result']['methods']
+    assert methods['add']['allocations']['calls'] == 1
+    assert 'allocations' not in methods['square']
+    assert service.allocation_stats() == {}
+
+
+def test_with_profile(make_service):
+    service = make_service(allocation_tracker=AllocationTracker(sample_rate=1.0))
+    tracked_call = vars(service.find_method('add').method)['call']
+    profile = service.start_profile('add', calls=1)
+    call(service, 'add', [1, 2])
+    assert profile.result()['calls'] == 1
+    assert service.allocation_stats()['add']['calls'] == 1
+    # The tracked call is restored once the profile ends.
+    assert vars(service.find_method('add').method)['call'] is tracked_call
+
+
+def test_without_reset_peak(make_service, monkeypatch):
+    # tracemalloc.reset_peak() is new in Python 3.9
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    retained.clear()
+    service = make_service(allocation_tracker=AllocationTracker(sample_rate=1.0))
+    # Started for the call, tracemalloc's peak is the call's.
+    assert call(service, 'add', [1, 2])['result'] == 3
+    allocations = service.allocation_stats(reset=True)['add']
+    assert 1000000 <= allocations['max_peak_bytes'] < 1200000
+    # Already tracing, the peak cannot be reset, so is not measured.
+    tracemalloc.start()
+    try:
+        assert call(service, 'add', [1, 2])['result'] == 3
+    finally:
+        tracemalloc.stop()
+    allocations = service.allocation_stats()['add']
+    assert allocations['calls'] == 1
+    assert allocations['net_bytes'] >= 100000
+    assert allocations['mean_peak_bytes'] is None
+    assert allocations['max_peak_bytes'] is None
+    assert 'result' in call(service, 'system.stats', {})
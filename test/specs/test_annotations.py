@@ -0,0 +1,180 @@
+import dataclasses
+import sys
+import typing
+import pytest
+from typing import Any, Dict, List, Optional, Tuple, Union
+from jsonrpc11base.validation import annotations
+from jsonrpc11base.validation.schema import SchemaError
+from jsonrpc11base.exceptions import MissingSchemaError
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+SERVICE_DESCRIPTION = ServiceDescription('Test Service', 'test')
+
+# typing.Literal and typing.TypedDict are new in Python 3.8
+try:
+    from typing import TypedDict
+except ImportError:
+    try:
+        from typing_extensions import TypedDict
+    except ImportError:
+        TypedDict = None
+
+needs_literal = pytest.mark.skipif(sys.version_info < (3, 8),
+                                   reason='typing.Literal is new in Python 3.8')
+needs_typed_dict = pytest.mark.skipif(TypedDict is None,
+                                      reason='TypedDict needs Python 3.8 or typing_extensions')
+
+if TypedDict is not None:
+    class Point(TypedDict):
+        x: int
+        y: int
+
+    class Labels(TypedDict, total=False):
+        name: str
+
+
+@dataclasses.dataclass
+class Query:
+    term: str
+    limit: Optional[int] = None
+    fields: List[str] = dataclasses.field(default_factory=list)
+
+
+@pytest.mark.parametrize('hint,schema', [
+    (int, {'type': 'integer'}),
+    (float, {'type': 'number'}),
+    (str, {'type': 'string'}),
+    (bool, {'type': 'boolean'}),
+    (None, {'type': 'null'}),
+    (Any, {}),
+    (list, {'type': 'array'}),
+    (List[int], {'type': 'array', 'items': {'type': 'integer'}}),
+    (Tuple[int, str], {'type': 'array', 'items': [{'type': 'integer'}, {'type': 'string'}],
+                       'minItems': 2, 'maxItems': 2}),
+    (Tuple[int, ...], {'type': 'array', 'items': {'type': 'integer'}}),
+    (Dict[str, bool], {'type': 'object', 'additionalProperties': {'type': 'boolean'}}),
+    (Optional[str], {'anyOf': [{'type': 'string'}, {'type': 'null'}]}),
+    (Union[int, str], {'anyOf': [{'type': 'integer'}, {'type': 'string'}]}),
+    (Query, {'type': 'object',
+             'properties': {'term': {'type': 'string'},
+                            'limit': {'anyOf': [{'type': 'integer'}, {'type': 'null'}]},
+                            'fields': {'type': 'array', 'items': {'type': 'string'}}},
+             'required': ['term']})
+])
+def test_schema_for(hint, schema):
+    assert annotations.schema_for(hint) == schema
+
+
+@needs_literal
+def test_schema_for_literal():
+    assert annotations.schema_for(typing.Literal['a']) == {'const': 'a'}
+    assert annotations.schema_for(typing.Literal['a', 'b']) == {'enum': ['a', 'b']}
+    with pytest.raises(annotations.UnsupportedAnnotation):
+        annotations.schema_for(typing.Literal[b'x'])
+
+
+@needs_typed_dict
+def test_schema_for_typed_dict():
+    assert annotations.schema_for(Point) == {
+        'type': 'object',
+        'properties': {'x': {'type': 'integer'}, 'y': {'type': 'integer'}},
+        'required': ['x', 'y']
+    }
+    assert annotations.schema_for(Labels) == {
+        'type': 'object', 'properties': {'name': {'type': 'string'}}
+    }
+
+
+@pytest.mark.parametrize('hint', [Dict[int, str], set, bytes])
+def test_schema_for_unsupported(hint):
+    with pytest.raises(annotations.UnsupportedAnnotation):
+        annotations.schema_for(hint)
+
+
+@needs_literal
+@needs_typed_dict
+def test_validators():
+    def handler(params: List[Point], options) -> typing.Literal['ok']:
+        return 'ok'
+
+    validate_params = annotations.params_validator('handler', handler)
+    validate_params([{'x': 1, 'y': 2}])
+    with pytest.raises(SchemaError) as se:
+        validate_params([{'x': 1}])
+    assert se.value.message == "'y' is a required property"
+    assert se.value.path == 'items.required'
+
+    validate_result = annotations.result_validator('handler', handler)
+    validate_result('ok')
+    with pytest.raises(SchemaError) as se:
+        validate_result('not ok')
+    assert se.value.path == 'const'
+
+
+def test_validators_without_hints():
+    def handler(params, options):
+        pass
+
+    def system_handler(options) -> dict:
+        pass
+
+    assert annotations.params_validator('handler', handler) is None
+    assert annotations.result_validator('handler', handler) is None
+    assert annotations.params_validator('system_handler', system_handler) is None
+    assert annotations.params_validator('unsupported', lambda p: p) is None
+
+
+def subtract(params: Tuple[int, int], options) -> int:
+    return params[0] - params[1]
+
+
+def search(params: Query, options) -> List[str]:
+    return [params['term']] * (params.get('limit') or 1)
+
+
+def call(service, method, params):
+    return service.call_py({'version': '1.1', 'method': method, 'params': params})
+
+
+def test_service_without_schema_dir():
+    service = JSONRPCService(SERVICE_DESCRIPTION)
+    service.add(subtract, from_annotations=True)
+    assert call(service, 'subtract', [3, 1])['result'] == 2
+    error = call(service, 'subtract', [3, 'x'])['error']
+    assert error['code'] == -32602
+    assert error['error'] == {
+        'message': "'x' is not of type 'integer'",
+        'path': 'items.1.type',
+        'value': 'integer',
+        'method': 'subtract'
+    }
+
+
+def test_service_result_from_hints():
+    service = JSONRPCService(SERVICE_DESCRIPTION, schema_dir=SCHEMA_DIR,
+                             validate_params=True, validate_result=True)
+    service.add(search, from_annotations=True)
+    assert call(service, 'search', {'term': 'a', 'limit': 2})['result'] == ['a', 'a']
+    assert call(service, 'search', {'limit': 2})['error']['error']['path'] == 'required'
+    # Without hints or schema files, there is nothing to validate against.
+    with pytest.raises(MissingSchemaError):
+        service.add(lambda params, options: [1], name='search_bad', from_annotations=True)
+
+
+def test_service_falls_back_to_schema_file():
+    service = JSONRPCService(SERVICE_DESCRIPTION, schema_dir=SCHEMA_DIR,
+                             validate_params=True, validate_result=True)
+
+    def add(params, options) -> str:
+        return params[0] + params[1]
+
+    service.add(add, from_annotations=True)
+    # Params are validated with add.params.json ...
+    assert call(service, 'add', [1, 'x'])['error']['code'] == -32602
+    # ... and results with the return hint.
+    error = call(service, 'add', [1, 2])['error']
+    assert error['code'] == -32002
+    assert error['error']['message'] == "3 is not of type 'string'"
@@ -0,0 +1,138 @@
+import time
+import pytest
+from jsonschema import Draft7Validator
+from jsonrpc11base.errors import InvalidParamsError
+import jsonrpc11base.validation.budget as budget
+from jsonrpc11base.validation.budget import ValidationBudget, timed
+from jsonrpc11base.validation.validation import Validation
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+
+def call(service, method, params):
+    return service.call_py({'version': '1.1', 'method': method, 'params': params})
+
+
+SERVICE_METHODS = {
+    'echo': lambda params, options: params
+}
+
+
+def check(budget, params):
+    budget.params_validator(lambda params: None)(params)
+
+
+def test_budget_arguments():
+    with pytest.raises(ValueError):
+        ValidationBudget(max_depth=0)
+    with pytest.raises(ValueError):
+        ValidationBudget(max_time=-1)
+
+
+def test_budget_nodes():
+    budget = ValidationBudget(max_nodes=1000)
+    check(budget, {'x': list(range(999))})
+    params = [list(range(10)) for _ in range(1000000)]
+    started = time.perf_counter()
+    with pytest.raises(InvalidParamsError) as ipe:
+        check(budget, params)
+    # Stopped at the first container over budget, without walking the rest
+    assert time.perf_counter() - started < 0.1
+    assert ipe.value.error == {
+        'message': 'Validation budget exceeded: Params have more than 1000 items and properties',
+        'value': 1000
+    }
+
+
+def test_budget_depth():
+    budget = ValidationBudget(max_depth=3)
+    check(budget, [[[1]], {'a': [2]}])
+    with pytest.raises(InvalidParamsError) as ipe:
+        check(budget, [{'a': [[1]]}])
+    assert ipe.value.error['message'] == (
+        'Validation budget exceeded: Params are nested more than 3 levels deep')
+
+
+def test_budget_time():
+    validator = timed(Draft7Validator)({'type': 'array', 'items': {'type': 'integer'}})
+
+    def validate(params):
+        for error in validator.iter_errors(params):
+            raise AssertionError(error)
+
+    budget = ValidationBudget(max_time=1e-9)
+    with pytest.raises(InvalidParamsError) as ipe:
+        budget.params_validator(validate)([1, 2, 3])
+    assert ipe.value.error['message'] == (
+        'Validation budget exceeded: Validation took more than 1e-09 seconds')
+    # The deadline only applies to the validation it was set for.
+    validate([1, 2, 3])
+
+
+def test_timed_same_errors():
+    schema = {'type': 'object', 'required': ['a'], 'properties': {'a': {'type': 'integer'}}}
+    for value in [{}, {'a': 'x'}, [], {'a': 1}]:
+        errors = [(error.message, list(error.absolute_schema_path))
+                  for error in Draft7Validator(schema).iter_errors(value)]
+        timed_errors = [(error.message, list(error.absolute_schema_path))
+                        for error in timed(Draft7Validator)(schema).iter_errors(value)]
+        assert timed_errors == errors
+    assert timed(Draft7Validator) is timed(Draft7Validator)
+
+
+def test_service_budget(make_service):
+    service = make_service(validation_budget=ValidationBudget(max_nodes=2))
+    assert call(service, 'echo', {'x': 1})['result'] == {'x': 1}
+    error = call(service, 'echo', {'x': 1, 'y': 2, 'z': 3})['error']
+    assert error['code'] == -32602
+    assert error['error']['message'] == (
+        'Validation budget exceeded: Params have more than 2 items and properties')
+
+
+def test_method_budget(make_service):
+    service = make_service(validation_budget=ValidationBudget(max_nodes=2))
+    service.add(lambda params, options: params, name='square',
+                validation_budget=ValidationBudget(max_depth=1))
+    error = call(service, 'square', [[1]])['error']
+    assert error['error']['message'] == (
+        'Validation budget exceeded: Params are nested more than 1 levels deep')
+    # The schema is still checked within the budget.
+    assert call(service, 'square', ['x'])['error']['error']['path'] == 'items.type'
+
+
+@pytest.mark.parametrize('engine', ['jsonschema', 'codegen'])
+def test_service_budget_time(make_service, engine):
+    service = make_service(validation_engine=engine,
+                           validation_budget=ValidationBudget(max_time=1e-9))
+    error = call(service, 'echo', {'x': 1.5})['error']
+    assert error['code'] == -32602
+    assert error['error']['message'].startswith('Validation budget exceeded')
+
+
+def test_timed_only_with_max_time(make_service):
+    schema = Validation(schema_dir=SCHEMA_DIR).schema
+    plain = schema.validator('echo.params')
+    assert plain is schema.get('echo.params')['validator']
+    timed_validator = schema.validator('echo.params', timed=True)
+    assert timed_validator is not plain
+    assert schema.validator('echo.params', timed=True) is timed_validator
+
+    # Validators of methods without a max_time ignore a deadline, even a
+    # stale one.
+    budget._local.deadline = (0, 1)
+    try:
+        assert call(make_service(), 'echo', {'x': 1})['result'] == {'x': 1}
+        service = make_service(validation_budget=ValidationBudget(max_nodes=10))
+        assert call(service, 'echo', {'x': 1})['result'] == {'x': 1}
+    finally:
+        budget._local.deadline = None
+
+
+def test_max_time_walks():
+    budget = ValidationBudget(max_time=1e-9)
+    with pytest.raises(InvalidParamsError) as ipe:
+        # The walk runs out of time, even with a validator which does not
+        # check it.
+        budget.params_validator(lambda params: None)([[1]])
+    assert ipe.value.error['message'] == (
+        'Validation budget exceeded: Validation took more than 1e-09 seconds')
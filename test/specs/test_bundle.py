@@ -0,0 +1,110 @@
+import json
+import pytest
+import jsonrpc11base.validation.bundle as bundle
+from jsonrpc11base.exceptions import InvalidFileType, InvalidSchemaError
+from jsonrpc11base.validation.schema import Schema, SchemaError
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+
+@pytest.fixture(params=['schemas.json', 'schemas.yaml', 'schemas.yml'])
+def bundle_path(request, tmp_path):
+    path = str(tmp_path / request.param)
+    assert bundle.main([SCHEMA_DIR, path]) == 0
+    return path
+
+
+def outcome(schema, schema_key, value):
+    try:
+        schema.validate(schema_key, value)
+    except SchemaError as ex:
+        return (ex.message, ex.path, ex.value)
+    return None
+
+
+@pytest.mark.parametrize('engine', ['jsonschema', 'codegen'])
+def test_bundle_same_as_dir(bundle_path, engine):
+    from_dir = Schema(SCHEMA_DIR, engine=engine)
+    from_bundle = Schema(bundle_path, engine=engine)
+    assert set(from_bundle.index) == set(from_dir.index)
+    for schema_key in from_dir.index:
+        assert from_bundle.kind(schema_key) == from_dir.kind(schema_key)
+    for schema_key, value in [('keyv.params', {'a': 1}), ('keyv.params', {'a': 1, 'c': 2}),
+                              ('posv.params', ['a', 1, 1.5, True, 'x']),
+                              ('add.params', [1, 'x'])]:
+        assert outcome(from_bundle, schema_key, value) == outcome(from_dir, schema_key, value)
+
+
+def test_bundle_format():
+    schemas = bundle.schemas_of({
+        'methods': {
+            'add': {'params': {'type': 'array'}, 'result': {'type': 'number'}},
+            'hello': {'params': None}
+        },
+        'schemas': {'base': {'definitions': {}}}
+    })
+    assert schemas == {
+        'add.params': {'type': 'array'},
+        'add.result': {'type': 'number'},
+        'hello.params': None,
+        'base': {'definitions': {}}
+    }
+    assert bundle.schemas_of(bundle.bundle_of(schemas)) == schemas
+
+
+@pytest.mark.parametrize('data', [
+    [],
+    {'methods': {}, 'other': {}},
+    {'methods': {'add': {'params': {}, 'example': {}}}},
+    {'methods': {'add': {'params': {}}}, 'schemas': {'add.params': {}}}
+])
+def test_bundle_invalid(tmp_path, data):
+    path = tmp_path / 'schemas.json'
+    path.write_text(json.dumps(data))
+    with pytest.raises(InvalidSchemaError) as ise:
+        Schema(str(path))
+    assert f'Schema bundle "{path}" is invalid' in str(ise.value)
+
+
+def test_bundle_file_type(tmp_path):
+    path = tmp_path / 'schemas.txt'
+    path.write_text('{}')
+    with pytest.raises(InvalidFileType):
+        Schema(str(path))
+    assert bundle.main([SCHEMA_DIR, str(path)]) == 1
+
+
+def test_bundle_cached(bundle_path, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    Schema(bundle_path, engine='codegen', cache_dir=cache_dir)
+
+    def no_parse(data, bundle_type):
+        raise AssertionError('The bundle was parsed rather than loaded from the cache')
+
+    monkeypatch.setattr(bundle, 'parse', no_parse)
+    schema = Schema(bundle_path, engine='codegen', cache_dir=cache_dir)
+    assert outcome(schema, 'keyv.params', {'a': 1}) == (
+        "'c' is a required property", 'required', ['a', 'c'])
+
+
+def test_bundle_lazy(bundle_path):
+    schema = Schema(bundle_path, lazy=True)
+    assert schema.kind('hello.params') == 'absent'
+    assert schema.kind('add.params') == 'schema'
+    assert schema.schemas == {}
+    schema.validate('add.params', [1])
+
+
+def test_bundle_service(bundle_path):
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             schema_dir=bundle_path,
+                             validate_params=True,
+                             validate_result=True)
+    service.add(lambda params, options: params[0] + params[1], name='add')
+    service.add(lambda options: 'hello', name='hello')
+    result = service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]})
+    assert result['result'] == 3
+    result = service.call_py({'version': '1.1', 'method': 'hello', 'params': []})
+    assert result['error']['code'] == -32602
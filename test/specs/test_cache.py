@@ -0,0 +1,144 @@
+import os
+import shutil
+import pytest
+import jsonrpc11base.validation.schema as schema_module
+from jsonrpc11base.validation.schema import Schema, SchemaError
+from jsonrpc11base.validation.cache import SchemaCache
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+
+@pytest.fixture
+def schema_dir(tmp_path):
+    path = tmp_path / 'schema'
+    shutil.copytree(SCHEMA_DIR, str(path))
+    return str(path)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / 'cache')
+
+
+class NoJSON(object):
+    @staticmethod
+    def loads(data):
+        raise AssertionError('Schema was parsed rather than loaded from the cache')
+
+
+def rewrite(path, text):
+    stat = os.stat(path)
+    with open(path, 'w') as fd:
+        fd.write(text)
+    # Ensure the mtime changes, regardless of filesystem timestamp resolution.
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+
+@pytest.mark.parametrize('engine', ['jsonschema', 'codegen'])
+def test_cache_written_and_used(schema_dir, cache_dir, monkeypatch, engine):
+    first = Schema(schema_dir, engine=engine, cache_dir=cache_dir)
+    assert os.path.exists(SchemaCache(cache_dir).path(schema_dir, engine))
+
+    monkeypatch.setattr(schema_module, 'json', NoJSON)
+    second = Schema(schema_dir, engine=engine, cache_dir=cache_dir)
+    assert set(second.schemas) == set(first.schemas)
+    assert second.validate_absent('hello.params')
+    second.validate('keyv.params', {'a': 1, 'c': 2})
+    with pytest.raises(SchemaError) as se:
+        second.validate('keyv.params', {'a': 1})
+    assert se.value.message == "'c' is a required property"
+
+
+def test_cache_invalidated_by_change(schema_dir, cache_dir):
+    Schema(schema_dir, engine='codegen', cache_dir=cache_dir)
+    rewrite(os.path.join(schema_dir, 'hello.result.json'), '{"type": "integer"}')
+    schema = Schema(schema_dir, engine='codegen', cache_dir=cache_dir)
+    schema.validate('hello.result', 1)
+    with pytest.raises(SchemaError):
+        schema.validate('hello.result', 'hello')
+
+
+def test_cache_invalidated_by_ref_change(schema_dir, cache_dir):
+    """
+    Generated code inlines $refs, so must be regenerated when a referenced
+    file changes, even if the referring file did not.
+    """
+    schema = Schema(schema_dir, engine='codegen', cache_dir=cache_dir)
+    schema.validate('keyv.params', {'a': 1, 'c': 2})
+    base_path = os.path.join(schema_dir, 'base.json')
+    with open(base_path) as fd:
+        base = fd.read()
+    rewrite(base_path, base.replace('"c"\n', '"c", "d"\n'))
+    schema = Schema(schema_dir, engine='codegen', cache_dir=cache_dir)
+    with pytest.raises(SchemaError) as se:
+        schema.validate('keyv.params', {'a': 1, 'c': 2})
+    assert se.value.message == "'d' is a required property"
+
+
+def test_cache_touched_file(schema_dir, cache_dir, monkeypatch):
+    """A file touched but not changed is not parsed again."""
+    Schema(schema_dir, cache_dir=cache_dir)
+    path = os.path.join(schema_dir, 'add.params.json')
+    with open(path) as fd:
+        rewrite(path, fd.read())
+    monkeypatch.setattr(schema_module, 'json', NoJSON)
+    Schema(schema_dir, cache_dir=cache_dir).validate('add.params', [1])
+
+
+def test_cache_removed_file(schema_dir, cache_dir):
+    Schema(schema_dir, cache_dir=cache_dir)
+    os.remove(os.path.join(schema_dir, 'add.params.json'))
+    assert Schema(schema_dir, cache_dir=cache_dir).get('add.params') is None
+
+
+def test_cache_corrupt(schema_dir, cache_dir):
+    Schema(schema_dir, cache_dir=cache_dir)
+    with open(SchemaCache(cache_dir).path(schema_dir, 'jsonschema'), 'wb') as fd:
+        fd.write(b'\x00garbage')
+    Schema(schema_dir, cache_dir=cache_dir).validate('add.params', [1])
+
+
+def test_service_schema_cache_dir(schema_dir, cache_dir):
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             schema_dir=schema_dir,
+                             validate_params=True,
+                             schema_cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 3
+    service.add(lambda params, options: params[0] + params[1], name='add')
+    result = service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]})
+    assert result['result'] == 3
+
+
+def test_cache_lazy(schema_dir, cache_dir, monkeypatch):
+    schema = Schema(schema_dir, engine='codegen', cache_dir=cache_dir, lazy=True)
+    schema.validate('keyv.params', {'a': 1, 'c': 2})
+    schema_module.flush_caches()
+    monkeypatch.setattr(schema_module, 'json', NoJSON)
+    schema = Schema(schema_dir, engine='codegen', cache_dir=cache_dir, lazy=True)
+    with pytest.raises(SchemaError):
+        schema.validate('keyv.params', {'a': 1})
+
+
+def test_cache_lazy_not_written_on_first_use(schema_dir, cache_dir, monkeypatch):
+    writes = []
+    write = SchemaCache.write
+
+    def counted_write(self, *args):
+        writes.append(args[0])
+        write(self, *args)
+    monkeypatch.setattr(SchemaCache, 'write', counted_write)
+    schema = Schema(schema_dir, cache_dir=cache_dir, lazy=True)
+    written = len(writes)
+    schema.validate('keyv.params', {'a': 1, 'c': 2})
+    schema.validate('add.params', [1, 2])
+    assert len(writes) == written
+    schema_module.flush_caches()
+    assert len(writes) == written + 1
+    # Nothing is left to write.
+    schema_module.flush_caches()
+    schema.warm(['keyv.params'])
+    assert len(writes) == written + 1
+    schema.warm(['echo.params'])
+    assert len(writes) == written + 2
@@ -0,0 +1,114 @@
+"""
+Conformance of the codegen validation engine with the jsonschema engine
+"""
+import pytest
+from jsonrpc11base.validation.schema import Schema, SchemaError
+from jsonrpc11base.validation import codegen
+
+SCHEMA_DIR = 'test/data/schema/test'
+JSONRPC_SCHEMA_DIR = 'jsonrpc11base/jsonrpc_schema'
+
+# A grab-bag of values of every JSON type and shape used by the test schemas.
+INSTANCES = [
+    None, True, False, 0, 1, -5, 3.5, 2.0, '', 'x', 'hello',
+    [], [1], [1, 2], [1, 'x'], [True], [1.5, 2], [[1]],
+    ['foo', 5, 6.0, True, False], ['x', 1, 3.0, True, 'x'], ['x', 1.5],
+    {}, {'a': 1}, {'a': 1, 'b': False, 'c': 6.0}, {'a': 1, 'b': 6.0}, {'a': True, 'c': 1},
+    {'a': 42, 'b': 23}, {'a': 'x', 'b': 1}, {'x': 's'}, {'x': 1}, {'x': 1.5}, {'x': None},
+    {'params': [1], 'options': {}}, {'params': [1], 'options': {}, 'extra': 1},
+    {'params': ['x'], 'options': {}}, {'options': []},
+    {'version': '1.1', 'method': 'm'}, {'version': '1.1', 'method': 'm', 'params': [], 'id': 1},
+    {'version': '1.0', 'method': 'm'}, {'version': '1.1', 'method': ''},
+    {'version': '1.1', 'method': 1}, {'version': '1.1', 'method': 'm', 'params': 'x'},
+    {'version': '1.1', 'method': 'm', 'foo': 1}, {'method': 'm'}
+]
+
+
+def outcome(schema, key, value):
+    try:
+        schema.validate(key, value)
+    except SchemaError as ex:
+        return (ex.message, ex.path, ex.value)
+    return None
+
+
+@pytest.mark.parametrize('schema_dir', [SCHEMA_DIR, JSONRPC_SCHEMA_DIR])
+def test_codegen_conformance(schema_dir):
+    reference = Schema(schema_dir)
+    generated = Schema(schema_dir, engine='codegen')
+    keys = [key for key, wrapper in reference.schemas.items() if 'schema' in wrapper]
+    assert keys
+    for key in keys:
+        for value in INSTANCES:
+            assert outcome(generated, key, value) == outcome(reference, key, value), \
+                f'{key}: {value!r}'
+
+
+@pytest.mark.parametrize('schema_dir', [SCHEMA_DIR, JSONRPC_SCHEMA_DIR])
+def test_codegen_generates_all(schema_dir):
+    """
+    None of the test schemas should need to fall back to jsonschema.
+    """
+    schema = Schema(schema_dir)
+    for key, wrapper in schema.schemas.items():
+        if 'schema' in wrapper:
+            source = codegen.generate_source(wrapper['schema'], schema.resolver)
+            assert 'def validate(value):' in source
+
+
+def check(schema, value):
+    return codegen.compile_source(codegen.generate_source(schema, None))(value)
+
+
+def test_codegen_keywords():
+    schema = {
+        'type': 'object',
+        'properties': {
+            'n': {'type': 'number', 'minimum': 0, 'exclusiveMaximum': 10, 'multipleOf': 0.5},
+            's': {'type': 'string', 'pattern': '^a', 'maxLength': 3},
+            'e': {'enum': [1, 'two']},
+            'l': {'type': 'array', 'uniqueItems': True, 'contains': {'const': 1}},
+            'o': {'anyOf': [{'type': 'null'}, {'not': {'type': 'string'}}]},
+            'p': {'oneOf': [{'type': 'integer'}, {'type': 'number'}]}
+        },
+        'patternProperties': {'^x-': {'type': 'boolean'}},
+        'additionalProperties': False,
+        'dependencies': {'n': ['s']},
+        'if': {'required': ['e']},
+        'then': {'required': ['l']}
+    }
+    assert check(schema, {})
+    assert check(schema, {'n': 9.5, 's': 'abc'})
+    assert not check(schema, {'n': 10, 's': 'abc'})
+    assert not check(schema, {'n': 0.25, 's': 'abc'})
+    assert not check(schema, {'n': 1})
+    assert not check(schema, {'s': 'bcd'})
+    assert not check(schema, {'s': 'abcd'})
+    assert check(schema, {'e': 'two', 'l': [2, 1]})
+    assert not check(schema, {'e': True, 'l': [1]})
+    assert not check(schema, {'e': 1})
+    assert not check(schema, {'e': 1, 'l': [1, 1]})
+    assert not check(schema, {'e': 1, 'l': [2]})
+    assert check(schema, {'o': None})
+    assert check(schema, {'o': 1})
+    assert not check(schema, {'o': 'x'})
+    assert check(schema, {'p': 1.5})
+    assert not check(schema, {'p': 1})
+    assert check(schema, {'x-a': True})
+    assert not check(schema, {'x-a': 1})
+    assert not check(schema, {'y': 1})
+
+
+def test_codegen_unsupported_draft():
+    schema = {'$schema': 'http://json-schema.org/draft-04/schema#', 'type': 'string'}
+    with pytest.raises(codegen.Unsupported):
+        codegen.generate_source(schema, None)
+
+
+def test_codegen_unsupported_falls_back():
+    def reference(value):
+        raise SchemaError('reference', '', value)
+
+    schema = {'$schema': 'http://json-schema.org/draft-04/schema#', 'type': 'string'}
+    validate = codegen.compile_validator('key', schema, None, reference)
+    assert validate is reference
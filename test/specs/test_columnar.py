@@ -0,0 +1,157 @@
+import json
+import random
+import pytest
+from jsonschema import Draft7Validator
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+from jsonrpc11base.validation import columnar
+from jsonrpc11base.validation.schema import SchemaError, columnar_validator, reference_validator
+
+TUPLE_ROWS = {
+    '$schema': 'http://json-schema.org/draft-07/schema',
+    'type': 'array',
+    'maxItems': 1000,
+    'items': {
+        'type': 'array',
+        'items': [{'type': 'integer'}, {'type': 'string'}, {'type': ['number', 'null']}],
+        'minItems': 2,
+        'additionalItems': False
+    }
+}
+
+OBJECT_ROWS = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'id': {'type': 'integer'},
+            'name': {'type': 'string', 'title': 'Name'},
+            'ok': {'type': 'boolean'}
+        },
+        'required': ['id'],
+        'additionalProperties': False
+    }
+}
+
+
+def outcome(validate, value):
+    try:
+        validate(value)
+    except SchemaError as ex:
+        return (ex.message, ex.path, ex.value)
+
+
+def validators(schema):
+    reference = reference_validator(Draft7Validator(schema))
+    schema_plan = columnar.plan(schema)
+    assert schema_plan is not None
+    return reference, columnar_validator(
+        columnar.compile_columnar(schema_plan, Draft7Validator, None))
+
+
+def tuple_row(rand):
+    row = [rand.randint(0, 9), 'x', rand.random()]
+    damage = rand.random()
+    if damage < 0.02:
+        row[0] = 'y'
+    elif damage < 0.04:
+        row[0] = 2.0
+    elif damage < 0.05:
+        row[2] = None
+    elif damage < 0.06:
+        row.append(1)
+    elif damage < 0.07:
+        row = row[:1]
+    elif damage < 0.08:
+        row = {'0': 1}
+    elif damage < 0.09:
+        row[1] = True
+    return row
+
+
+def object_row(rand):
+    row = {'id': rand.randint(0, 9), 'name': 'x', 'ok': True}
+    damage = rand.random()
+    if damage < 0.02:
+        row['name'] = 1
+    elif damage < 0.04:
+        row['ok'] = 1
+    elif damage < 0.05:
+        del row['id']
+    elif damage < 0.06:
+        row['extra'] = 1
+    elif damage < 0.07:
+        del row['name']
+    elif damage < 0.08:
+        row = [1]
+    elif damage < 0.09:
+        row['id'] = 1.5
+    return row
+
+
+@pytest.mark.parametrize('schema,make_row', [(TUPLE_ROWS, tuple_row), (OBJECT_ROWS, object_row)])
+def test_same_errors(schema, make_row):
+    reference, validate = validators(schema)
+    rand = random.Random(15)
+    for _ in range(500):
+        value = [make_row(rand) for _ in range(rand.randint(0, 30))]
+        assert outcome(validate, value) == outcome(reference, value), json.dumps(value)
+
+
+def test_array_errors():
+    reference, validate = validators(TUPLE_ROWS)
+    for value in [{}, 'x', None, [[1, 'x']] * 1001, [], [[1, 'x']]]:
+        assert outcome(validate, value) == outcome(reference, value)
+    assert outcome(validate, [[1, 'x', 1.5], [2, 'y'], ['z', 'w'], [3]]) == (
+        '[3] is too short', 'items.minItems', 2)
+    assert outcome(validate, [[1, 'x', 1.5], [2, 'y', 'z'], ['z', 'w']]) == (
+        "'z' is not of type 'number', 'null'", 'items.items.2.type', ['number', 'null'])
+
+
+def test_plan():
+    assert columnar.plan(TUPLE_ROWS)['row'] is TUPLE_ROWS['items']
+    assert 'items' not in columnar.plan(TUPLE_ROWS)['array']
+    for schema in [
+        {'type': 'array', 'items': {'type': 'integer'}},
+        {'type': 'array', 'uniqueItems': True, 'items': OBJECT_ROWS['items']},
+        {'items': OBJECT_ROWS['items']},
+        {'type': 'array', 'items': {'type': 'object',
+                                    'properties': {'a': {'type': 'string', 'minLength': 1}}}},
+        {'type': 'array', 'items': {'type': 'object', 'additionalProperties': {}}},
+        {'type': 'array', 'items': {'type': 'array', 'items': [{'$ref': '#/definitions/a'}]}},
+        {'type': 'array', 'items': {'type': 'array', 'items': [{'type': 'object'}]}},
+        dict(TUPLE_ROWS, **{'$schema': 'http://json-schema.org/draft-04/schema#'})
+    ]:
+        assert columnar.plan(schema) is None
+
+
+@pytest.mark.parametrize('engine', ['jsonschema', 'codegen'])
+def test_service_rows(tmp_path, engine):
+    with open(str(tmp_path / 'rows.params.json'), 'w') as fd:
+        json.dump(TUPLE_ROWS, fd)
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             schema_dir=str(tmp_path),
+                             validate_params=True,
+                             validation_engine=engine)
+    service.add(lambda params, options: len(params), name='rows')
+    rows = [[index, 'x', index / 2] for index in range(1000)]
+    response = service.call_py({'version': '1.1', 'method': 'rows', 'params': rows})
+    assert response['result'] == 1000
+    rows[500][1] = 5
+    error = service.call_py({'version': '1.1', 'method': 'rows', 'params': rows})['error']
+    assert error['code'] == -32602
+    assert error['error']['path'] == 'items.items.1.type'
+
+
+def test_service_rows_draft4(tmp_path):
+    # Draft 4 does not accept 1.0 as an integer, as later drafts do.
+    with open(str(tmp_path / 'rows.params.json'), 'w') as fd:
+        json.dump(dict(TUPLE_ROWS, **{'$schema': 'http://json-schema.org/draft-04/schema#'}), fd)
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             schema_dir=str(tmp_path),
+                             validate_params=True)
+    service.add(lambda params, options: len(params), name='rows')
+    request = {'version': '1.1', 'method': 'rows', 'params': [[1.0, 'x']]}
+    assert service.call_py(request)['error']['code'] == -32602
+    request['params'] = [[1, 'x']]
+    assert service.call_py(request)['result'] == 1
@@ -0,0 +1,88 @@
+import pytest
+from jsonrpc11base.validation import engines
+
+
+class CountingEngine(engines.ValidationEngine):
+    def __init__(self):
+        self.compiled = []
+
+    def compile(self, schema_key, schema, loader, cache_entry):
+        self.compiled.append(schema_key)
+        return engines.get('jsonschema').compile(schema_key, schema, loader, cache_entry)
+
+
+@pytest.fixture
+def counting():
+    engine = CountingEngine()
+    engines.register('counting', engine)
+    yield engine
+    engines._engines.pop('counting')
+
+
+def call(service, method, params=None):
+    request = {'version': '1.1', 'method': method}
+    if params is not None:
+        request['params'] = params
+    return service.call_py(request)
+
+
+def test_registry(make_service):
+    assert {'jsonschema', 'codegen', 'none'} <= set(engines.names())
+    with pytest.raises(ValueError):
+        engines.get('nope')
+    with pytest.raises(ValueError):
+        engines.register('nope', object())
+    with pytest.raises(ValueError):
+        make_service(validation_engine='nope')
+
+
+def test_method_engine(make_service, counting):
+    service = make_service()
+    assert counting.compiled == []
+    service.add(lambda params, options: params, name='echo', validation_engine='counting')
+    service.add(lambda params, options: params, name='keyv')
+    assert counting.compiled == ['echo.params']
+    assert call(service, 'echo', {'x': 1})['result'] == {'x': 1}
+    error = call(service, 'echo', {'x': 1.5})['error']
+    assert error['error']['path'] == 'properties.x.type'
+    # Compiled once per schema
+    service.service_validation.params_validator('echo', 'counting')
+    assert counting.compiled == ['echo.params']
+    with pytest.raises(ValueError):
+        service.add(lambda params, options: params, name='posv', validation_engine='nope')
+
+
+def test_method_engine_lazy(make_service, counting):
+    service = make_service(lazy_schemas=True)
+    service.add(lambda params, options: params, name='echo', validation_engine='counting')
+    assert counting.compiled == []
+    assert call(service, 'echo', {'x': 1.5})['error']['code'] == -32602
+    assert call(service, 'echo', {'x': 1})['result'] == {'x': 1}
+    assert counting.compiled == ['echo.params']
+
+
+def test_method_engine_reload(make_service, counting):
+    service = make_service()
+    service.add(lambda params, options: params, name='echo', validation_engine='counting')
+    # Unchanged schemas, and the validators compiled for them, are reused.
+    assert service.reload_schemas().ok
+    assert counting.compiled == ['echo.params']
+    assert call(service, 'echo', {'x': 1.5})['error']['code'] == -32602
+
+
+@pytest.mark.parametrize('per_method', [False, True])
+def test_none_engine(make_service, per_method):
+    if per_method:
+        service = make_service()
+        options = {'validation_engine': 'none'}
+    else:
+        service = make_service(validation_engine='none')
+        options = {}
+    service.add(lambda params, options: params, name='echo', **options)
+    service.add(lambda options: 'hi', name='hello', **options)
+    assert call(service, 'echo', {'x': 1.5})['result'] == {'x': 1.5}
+    assert call(service, 'hello')['result'] == 'hi'
+    # Whether params must be absent is still enforced.
+    assert call(service, 'hello', ['hi'])['error']['code'] == -32602
+    # As is the envelope
+    assert call(service, 'echo', 'x')['error']['code'] == -32600
@@ -0,0 +1,99 @@
+"""
+Differential tests of native envelope validation against the request.json schema
+"""
+import itertools
+import random
+import pytest
+from jsonrpc11base.validation import builtin
+from jsonrpc11base.validation.envelope import validate_request
+from jsonrpc11base.validation.schema import SchemaError
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+KEYS = ['version', 'method', 'id', 'params', 'foo', 'bar']
+
+VALUES = [None, True, False, 0, 1, -1.5, '', '1.1', '1.0', 'method', [], [1], {}, {'a': 1},
+          (1,), {1, 2}, object()]
+
+
+def outcome(validate, request):
+    try:
+        validate(request)
+    except SchemaError as ex:
+        return (ex.message, ex.path, ex.value)
+    return None
+
+
+def reference(request):
+    builtin.jsonrpc_schemas().validate('request', request)
+
+
+def assert_agree(request):
+    assert outcome(validate_request, request) == outcome(reference, request), repr(request)
+
+
+@pytest.mark.parametrize('request_data', VALUES + [[{'version': '1.1', 'method': 'm'}]])
+def test_envelope_not_object(request_data):
+    assert_agree(request_data)
+
+
+def test_envelope_valid():
+    assert outcome(validate_request, {'version': '1.1', 'method': 'm'}) is None
+    assert outcome(validate_request, {'version': '1.1', 'method': 'm', 'id': 1,
+                                      'params': []}) is None
+
+
+def test_envelope_single_fields():
+    """Every value in every field of an otherwise valid request."""
+    for key, value in itertools.product(KEYS, VALUES):
+        request = {'version': '1.1', 'method': 'm'}
+        request[key] = value
+        assert_agree(request)
+
+
+def test_envelope_pairs_missing():
+    """Every pair of values, with every combination of required fields omitted."""
+    for version, method in itertools.product(VALUES + ['1.1'], VALUES + ['m']):
+        for keep in [('version', 'method'), ('version',), ('method',), ()]:
+            request = {'version': version, 'method': method}
+            request = {key: value for key, value in request.items() if key in keep}
+            assert_agree(request)
+
+
+def test_envelope_random():
+    rng = random.Random(1234)
+    for _ in range(5000):
+        keys = rng.sample(KEYS, rng.randint(0, len(KEYS)))
+        request = {}
+        for key in keys:
+            if key == 'version' and rng.random() < 0.5:
+                request[key] = '1.1'
+            elif key == 'method' and rng.random() < 0.5:
+                request[key] = 'method'
+            else:
+                request[key] = rng.choice(VALUES)
+        assert_agree(request)
+
+
+@pytest.mark.parametrize('envelope_validation', ['native', 'schema'])
+def test_service_envelope_validation(envelope_validation):
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             schema_dir=SCHEMA_DIR,
+                             validate_params=True,
+                             envelope_validation=envelope_validation)
+    result = service.call_py({'version': '1.1', 'method': 'hello', 'id': 3, 'foo': 1})
+    assert result['id'] == 3
+    assert result['error']['code'] == -32600
+    assert result['error']['error'] == {
+        'message': "Additional properties are not allowed ('foo' was unexpected)",
+        'path': 'additionalProperties',
+        'value': False
+    }
+
+
+def test_service_envelope_validation_unknown():
+    with pytest.raises(ValueError) as ve:
+        JSONRPCService(ServiceDescription('Test Service', 'test'), envelope_validation='x')
+    assert 'Unknown envelope validation "x"' in str(ve.value)
@@ -5,7 +5,7 @@ import json
 from jsonrpc11base import JSONRPCService
 from jsonrpc11base.errors import APIError
 from jsonrpc11base.service_description import ServiceDescription
-from jsonrpc11base.exceptions import DuplicateMethodName
+from jsonrpc11base.exceptions import DuplicateMethodName, MissingSchemaError
 import pytest
 import os
 
@@ -15,8 +15,8 @@ class InvalidServerCode(APIError):
     message = 'Invalid code!'
 
 
-@pytest.fixture(scope='module')
-def service():
+@pytest.fixture(scope='module', params=['jsonschema', 'codegen'])
+def service(request):
     schema_dir = os.path.join(os.path.dirname(__file__), '../data/schema/test')
 
     service_description = ServiceDescription(
@@ -31,7 +31,8 @@ def service():
         description=service_description,
         schema_dir=schema_dir,
         validate_params=True,
-        validate_result=True
+        validate_result=True,
+        validation_engine=request.param
     )
 
     # Add testing methods go the service.
@@ -72,10 +73,6 @@ def service():
     def broken_func(options):
         raise TypeError('whoops')
 
-    def no_validation(options):
-        """This method should have no validation defined"""
-        return "no validation"
-
     def echo(params):
         return params
 
@@ -84,7 +81,6 @@ def service():
     service.add(square)
     service.add(hello)
     service.add(Hello().msg, name='hello_inst')
-    service.add(hello, name="hello_no_result_validation")
     service.add(hello, name="hello_absent_result_validation")
     service.add(hello_invalid_result)
     service.add(notification)
@@ -93,7 +89,6 @@ def service():
     service.add(broken_func)
     service.add(return_options_and_params)
     service.add(return_options_no_params)
-    service.add(no_validation)
     service.add(echo)
 
     return service
@@ -192,31 +187,32 @@ def test_args_but_none_provided(service):
 
 def test_no_params_validation(service):
     """
-    When a method expects args, but none are provided,
-    should return error.
+    When validation is enabled, a method without a params schema
+    may not be added.
     """
-    res = service.call_py({
-        "version": "1.1",
-        "method": "no_validation"
-    })
-    assert res['error']['message'] == 'Invalid params'
-    assert res['error']['code'] == -32602
-    assert res['error']['error']['message'] == ('Validation is enabled, '
-                                                'but no parameter validator was provided')
+    def no_validation(options):
+        """This method should have no validation defined"""
+        return "no validation"
+
+    with pytest.raises(MissingSchemaError) as mse:
+        service.add(no_validation)
+    assert str(mse.value) == ('Validation is enabled, but no parameter validator '
+                              'was provided for method "no_validation"')
+    assert 'no_validation' not in service.method_registry
 
 
 def test_no_result_validation(service):
     """
-    Test valid jsonrpc no argument calls.
+    When result validation is enabled, a method without a result schema
+    may not be added.
     """
-    res = service.call_py({
-        "version": "1.1",
-        "method": "hello_no_result_validation"
-    })
-    assert res['error']['message'] == 'Invalid params'
-    assert res['error']['code'] == -32602
-    assert res['error']['error']['message'] == ('Validation is enabled, '
-                                                'but no result validator was provided')
+    def hello(options):
+        return "Hello world!"
+
+    with pytest.raises(MissingSchemaError) as mse:
+        service.add(hello, name="hello_no_result_validation")
+    assert str(mse.value) == ('Validation is enabled, but no result validator '
+                              'was provided for method "hello_no_result_validation"')
 
 
 def test_invalid_result(service):
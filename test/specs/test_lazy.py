@@ -0,0 +1,83 @@
+import threading
+import time
+import pytest
+from jsonrpc11base.validation.schema import Schema, SchemaError
+from jsonrpc11base.validation.validation import Validation
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+
+def test_lazy_index_only():
+    schema = Schema(SCHEMA_DIR, lazy=True)
+    assert schema.schemas == {}
+    assert 'add.params' in schema.index
+    assert 'hello.params' in schema.index
+
+
+def test_lazy_load_on_use():
+    schema = Schema(SCHEMA_DIR, lazy=True)
+    schema.validate('add.params', [1, 2])
+    assert list(schema.schemas) == ['add.params']
+    with pytest.raises(SchemaError) as se:
+        schema.validate('add.params', ['x'])
+    assert se.value.path == 'items.type'
+
+
+def test_lazy_absent_and_missing():
+    schema = Schema(SCHEMA_DIR, lazy=True)
+    assert schema.validate_absent('hello.params') is True
+    assert schema.validate_absent('foo') is False
+    assert schema.get('foo') is None
+    assert 'foo' not in schema.schemas
+
+
+@pytest.mark.parametrize('engine', ['jsonschema', 'codegen'])
+def test_lazy_ref(engine):
+    schema = Schema(SCHEMA_DIR, engine=engine, lazy=True)
+    with pytest.raises(SchemaError) as se:
+        schema.validate('keyv.params', {'a': 1})
+    assert se.value.message == "'c' is a required property"
+
+
+def test_lazy_concurrent_first_use(monkeypatch):
+    schema = Schema(SCHEMA_DIR, lazy=True)
+    compiled = []
+    compile = schema.compile
+
+    def slow_compile(schema_key, *args):
+        compiled.append(schema_key)
+        time.sleep(0.05)
+        return compile(schema_key, *args)
+
+    monkeypatch.setattr(schema, 'compile', slow_compile)
+    threads = [threading.Thread(target=schema.validate, args=('add.params', [1]))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert compiled == ['add.params']
+
+
+def test_lazy_warm():
+    validation = Validation(SCHEMA_DIR, lazy=True)
+    validation.warm(['add', 'hello', 'no_such_method'])
+    assert set(validation.schema.schemas) == {'add.params', 'add.result',
+                                              'hello.params', 'hello.result'}
+
+
+def test_lazy_service():
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             schema_dir=SCHEMA_DIR,
+                             validate_params=True,
+                             validate_result=True,
+                             lazy_schemas=True)
+    service.add(lambda params, options: params[0] - params[1], name='subtract')
+    assert service.service_validation.schema.schemas == {}
+    service.warm(['subtract'])
+    assert set(service.service_validation.schema.schemas) == {'subtract.params',
+                                                              'subtract.result'}
+    result = service.call_py({'version': '1.1', 'method': 'subtract', 'params': [42, 23]})
+    assert result['result'] == 19
@@ -1,6 +1,8 @@
 import pytest
 from jsonrpc11base.main import JSONRPCService
 from jsonrpc11base.service_description import ServiceDescription
+from jsonrpc11base.dispatch import (PARAMS_ABSENT, PARAMS_SCHEMA, PARAMS_UNVALIDATED,
+                                    RESULT_SCHEMA, RESULT_UNVALIDATED)
 
 SERVICE_DESCRIPTION = ServiceDescription(
     'Test Service',
@@ -32,3 +34,58 @@ def test_service_simple_nonsensical_args_2():
     with pytest.raises(TypeError) as te:
         JSONRPCService(SERVICE_DESCRIPTION, validate_result=True)
     assert 'May not validate result with no schema_dir provided' in str(te.value)
+
+
+def test_service_builtin_schemas_shared():
+    service1 = JSONRPCService(SERVICE_DESCRIPTION)
+    service2 = JSONRPCService(SERVICE_DESCRIPTION)
+    assert service1.jsonrpc_schemas is service2.jsonrpc_schemas
+    assert service1.system_validation is service2.system_validation
+
+
+def test_service_builtin_schemas_per_engine():
+    service1 = JSONRPCService(SERVICE_DESCRIPTION)
+    service2 = JSONRPCService(SERVICE_DESCRIPTION, validation_engine='codegen')
+    assert service1.jsonrpc_schemas is not service2.jsonrpc_schemas
+    assert service2.jsonrpc_schemas.engine == 'codegen'
+
+
+def test_service_builtin_schemas_read_only():
+    service = JSONRPCService(SERVICE_DESCRIPTION)
+    with pytest.raises(TypeError):
+        service.jsonrpc_schemas.schemas['request'] = {}
+
+
+def test_service_dispatch_record():
+    service = JSONRPCService(SERVICE_DESCRIPTION, schema_dir='test/data/schema/test',
+                             validate_result=True)
+    service.add(lambda params, options: params, name='echo')
+    record = service.dispatch_table['echo']
+    assert record.is_system is False
+    assert record.params_policy == PARAMS_SCHEMA
+    assert record.result_policy == RESULT_SCHEMA
+    record = service.dispatch_table['system.describe']
+    assert record.is_system is True
+    assert record.params_policy == PARAMS_ABSENT
+    assert record.result_policy == RESULT_SCHEMA
+
+
+def test_service_dispatch_record_unvalidated():
+    service = JSONRPCService(SERVICE_DESCRIPTION)
+    service.add(lambda params, options: params, name='echo')
+    record = service.dispatch_table['echo']
+    assert record.params_policy == PARAMS_UNVALIDATED
+    assert record.result_policy == RESULT_UNVALIDATED
+
+
+def test_service_system_name_not_callable():
+    """
+    A service method named like a system method is registered, but may not
+    be called, as the name refers to the system methods.
+    """
+    service = JSONRPCService(SERVICE_DESCRIPTION)
+    service.add(lambda options: 'hi', name='system.hello')
+    assert 'system.hello' in service.method_registry
+    result = service.call_py({'version': '1.1', 'method': 'system.hello'})
+    assert result['error']['code'] == -32601
+    assert result['error']['error']['available_methods'] == ['system.describe', 'system.stats']
@@ -0,0 +1,93 @@
+import os
+import shutil
+import pytest
+from jsonrpc11base.validation.memo import ValidationMemo
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+
+SERVICE_METHODS = {
+    'echo': lambda params, options: params,
+    'add': lambda params, options: params[0] + params[1]
+}
+
+
+def call(service, method, params):
+    return service.call_py({'version': '1.1', 'method': method, 'params': params})
+
+
+def test_memo_arguments():
+    with pytest.raises(ValueError):
+        ValidationMemo(max_entries=0)
+
+
+def test_key_of():
+    memo = ValidationMemo(max_bytes=20, max_nodes=4)
+    assert memo.key_of({'b': [1], 'a': 'x'}) == '{"a":"x","b":[1]}'
+    assert memo.key_of([1]) != memo.key_of([1.0]) != memo.key_of([True])
+    # Too many values, too long, or not plain JSON
+    assert memo.key_of([1, 2, 3, 4]) is None
+    assert memo.key_of(['x' * 20]) is None
+    assert memo.key_of((1, 2)) is None
+    assert memo.key_of({1: 2}) is None
+
+
+def test_memo_hits(make_service):
+    service = make_service(validation_memo=ValidationMemo())
+    for _ in range(3):
+        assert call(service, 'echo', {'x': 1})['result'] == {'x': 1}
+    for _ in range(2):
+        assert call(service, 'echo', {'x': 1.5})['error']['code'] == -32602
+    call(service, 'add', [1, 2])
+    stats = service.validation_memo_stats()
+    assert stats['echo'] == {'hits': 2, 'misses': 3, 'skipped': 0}
+    assert stats['add'] == {'hits': 0, 'misses': 1, 'skipped': 0}
+    # Entries are per method.
+    assert len(service.validation_memo) == 2
+
+
+def test_memo_skips_validation(make_service):
+    service = make_service(validation_memo=ValidationMemo())
+    validated = []
+    record = service.dispatch_table['echo']
+    validate = record.params_memo.validate
+    record.params_memo.validate = lambda params: validated.append(params) or validate(params)
+    call(service, 'echo', {'x': 1})
+    call(service, 'echo', {'x': 1})
+    assert validated == [{'x': 1}]
+
+
+def test_memo_lru(make_service):
+    service = make_service(validation_memo=ValidationMemo(max_entries=2))
+    for x in [1, 2, 1, 3, 1]:
+        call(service, 'echo', {'x': x})
+    # 2 was evicted rather than 1, which was used more recently.
+    call(service, 'echo', {'x': 2})
+    assert service.validation_memo_stats()['echo'] == {'hits': 2, 'misses': 4, 'skipped': 0}
+
+
+def test_method_memo(make_service):
+    service = make_service()
+    memo = ValidationMemo(max_nodes=2)
+    service.add(lambda params, options: params, name='posv', validation_memo=memo)
+    call(service, 'posv', ['x', 1])
+    call(service, 'posv', ['x'])
+    call(service, 'posv', ['x'])
+    assert service.validation_memo_stats() == {
+        'posv': {'hits': 1, 'misses': 1, 'skipped': 1}
+    }
+
+
+def test_memo_flushed_on_reload(make_service, tmp_path):
+    schema_dir = str(tmp_path / 'schema')
+    shutil.copytree(SCHEMA_DIR, schema_dir)
+    service = make_service(schema_dir=schema_dir, validation_memo=ValidationMemo())
+    assert call(service, 'add', [1, 2])['result'] == 3
+    path = os.path.join(schema_dir, 'add.params.json')
+    with open(path, 'w') as fd:
+        fd.write('{"type": "array", "items": {"type": "string"}}')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert service.reload_schemas().ok
+    assert len(service.validation_memo) == 0
+    assert call(service, 'add', [1, 2])['error']['code'] == -32602
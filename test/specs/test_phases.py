@@ -0,0 +1,96 @@
+import json
+from jsonrpc11base.errors import APIError
+from jsonrpc11base.phases import PhaseTimer
+
+
+class Options(object):
+    pass
+
+
+def broken_func(options):
+    raise APIError(code=123, message='broken')
+
+
+SERVICE_OPTIONS = {'validate_result': True}
+
+SERVICE_METHODS = {
+    'add': lambda params, options: params[0] + params[1],
+    'square': lambda params, options: 'x',
+    'broken_func': broken_func
+}
+
+
+REQUESTS = [
+    '{"version": "1.1", "method": "add", "params": [1, 2], "id": 1}',
+    '{"version": "1.1", "method": "add", "params": ["x", 2]}',
+    '{"version": "1.1", "method": "square", "params": [2]}',
+    '{"version": "1.1", "method": "broken_func"}',
+    '{"version": "1.1", "method": "nope"}',
+    '{"version": "1.1", "id": 3}',
+    '{"version": '
+]
+
+
+def without_traceback(response):
+    response.get('error', {}).get('error', {}).pop('traceback', None)
+    return response
+
+
+def test_same_responses(make_service):
+    service = make_service()
+    timed_service = make_service(phase_timer=PhaseTimer())
+    assert service.phase_timer is None
+    for request in REQUESTS:
+        assert without_traceback(json.loads(timed_service.call(request))) == without_traceback(
+            json.loads(service.call(request))), request
+        if not request.endswith(': '):
+            assert without_traceback(timed_service.call_py(json.loads(request))) == (
+                without_traceback(service.call_py(json.loads(request))))
+
+
+def test_breakdown(make_service):
+    requests = []
+    service = make_service(phase_timer=PhaseTimer(
+        attach_to_options=True, on_request=lambda name, breakdown: requests.append(
+            (name, breakdown))))
+    options = {}
+    service.call(REQUESTS[0], options)
+    breakdown = options['phases']
+    assert set(breakdown) == {'decode', 'envelope', 'params', 'handler', 'result', 'encode',
+                              'total'}
+    assert sum(breakdown.values()) - breakdown['total'] <= breakdown['total']
+    assert requests == [('add', breakdown)]
+
+    # Phases after a failure are not timed.
+    options = Options()
+    service.call_py(json.loads(REQUESTS[1]), options)
+    assert set(options.phases) == {'envelope', 'params', 'total'}
+    # Options which take no attributes are not given a breakdown.
+    assert service.call_py(json.loads(REQUESTS[0]), 'token')['result'] == 3
+    assert service.call(REQUESTS[0], ('a', 'tuple')) is not None
+    assert requests[-1][0] == 'add'
+    service.call(REQUESTS[-1])
+    assert requests[-1] == (None, {'decode': requests[-1][1]['decode'], 'encode': requests[-1][
+        1]['encode'], 'total': requests[-1][1]['total']})
+
+
+def test_phase_stats(make_service):
+    service = make_service(phase_timer=PhaseTimer())
+    for request in REQUESTS:
+        service.call(request)
+    stats = service.phase_stats()
+    assert stats['overall']['total']['count'] == len(REQUESTS)
+    assert stats['overall']['decode']['count'] == len(REQUESTS)
+    # Requests for unknown methods are only counted overall.
+    assert set(stats['methods']) == {'add', 'square', 'broken_func'}
+    assert stats['methods']['add']['params']['count'] == 2
+    assert stats['methods']['add']['handler']['count'] == 1
+    assert stats['methods']['square']['result']['count'] == 1
+    assert stats['methods']['broken_func']['handler']['count'] == 1
+    assert 'result' not in stats['methods']['broken_func']
+    summary = stats['methods']['add']['total']
+    assert summary['p50'] <= summary['p99'] <= summary['max']
+
+    assert service.phase_stats(reset=True) == stats
+    assert service.phase_stats() == {'overall': {}, 'methods': {}}
+    assert make_service().phase_stats() == {}
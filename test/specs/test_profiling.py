@@ -0,0 +1,245 @@
+import json
+import threading
+import time
+
+import pytest
+
+from jsonrpc11base.errors import MethodNotFoundError
+from jsonrpc11base.method import Method
+from jsonrpc11base.profiling import MethodProfile, collapse_pstats
+
+
+def fib(n):
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+def add(params, options):
+    return params[0] + params[1] + fib(10) * 0
+
+
+SERVICE_OPTIONS = {'validate_result': True}
+
+SERVICE_METHODS = {
+    'add': add,
+    'square': lambda params, options: 'x'
+}
+
+
+def call(service, method, params, options=None):
+    return service.call_py({'version': '1.1', 'method': method, 'params': params}, options)
+
+
+def test_invalid_profiles(make_service):
+    with pytest.raises(ValueError):
+        MethodProfile('add')
+    with pytest.raises(ValueError):
+        MethodProfile('add', calls=0)
+    with pytest.raises(ValueError):
+        MethodProfile('add', seconds=-1)
+    with pytest.raises(ValueError):
+        MethodProfile('add', calls=1, mode='statistical')
+    with pytest.raises(ValueError):
+        MethodProfile('add', calls=1, interval=0)
+    service = make_service()
+    with pytest.raises(MethodNotFoundError):
+        service.start_profile('nope', calls=1)
+    assert service.profile('add') is None
+    assert service.stop_profile('add') is None
+
+
+def test_deterministic_calls(make_service):
+    service = make_service()
+    profile = service.start_profile('add', calls=2)
+    add_method = service.find_method('add').method
+    square_method = service.find_method('square').method
+    assert 'call' in vars(add_method)
+    # Other methods are untouched.
+    assert 'call' not in vars(square_method)
+    with pytest.raises(ValueError):
+        service.start_profile('add', calls=1)
+    for _ in range(3):
+        assert call(service, 'add', [1, 2])['result'] == 3
+    assert 'call' not in vars(add_method)
+    result = profile.result()
+    assert result['method'] == 'add'
+    assert result['mode'] == 'deterministic'
+    assert result['active'] is False
+    assert result['calls'] == 2
+    assert result['skipped'] == 0
+    assert result['samples'] is None
+    assert 'fib' in result['pstats']
+    stacks = [line.rsplit(' ', 1) for line in result['collapsed'].splitlines()]
+    assert stacks
+    for stack, weight in stacks:
+        assert stack.split(';')[0].startswith('call (method.py:')
+        assert int(weight) > 0
+    assert any(';add (test_profiling.py:' in stack and 'fib (' in stack for stack, _ in stacks)
+    # Every call is still counted.
+    assert add_method.call_count == 3
+    # A new profile may be started once the last has ended.
+    assert service.start_profile('add', calls=1) is not profile
+
+
+def test_seconds(make_service):
+    service = make_service()
+    profile = service.start_profile('add', seconds=0.05)
+    call(service, 'add', [1, 2])
+    assert profile.active
+    time.sleep(0.06)
+    call(service, 'add', [1, 2])
+    assert not profile.active
+    assert profile.result()['calls'] == 1
+
+
+def test_stop(make_service):
+    service = make_service()
+    profile = service.start_profile('add', calls=10)
+    call(service, 'add', [1, 2])
+    assert service.stop_profile('add') is profile
+    call(service, 'add', [1, 2])
+    assert profile.result()['calls'] == 1
+    assert 'call' not in vars(service.find_method('add').method)
+
+
+def test_skipped_while_busy():
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def wait(params, options):
+        # Only the first call waits.
+        if not started.is_set():
+            started.set()
+            proceed.wait(5)
+        return 'x'
+    method = Method(wait)
+    profile = MethodProfile('wait', calls=5)
+    profile.install(method)
+    thread = threading.Thread(target=method.call, args=([1], None))
+    thread.start()
+    started.wait(5)
+    assert method.call([1], None) == 'x'
+    proceed.set()
+    thread.join()
+    result = profile.result()
+    assert result['calls'] == 1
+    assert result['skipped'] == 1
+
+
+def test_result_while_busy():
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def wait(params, options):
+        started.set()
+        proceed.wait(5)
+        return 'x'
+    method = Method(wait)
+    profile = MethodProfile('wait', calls=5)
+    profile.install(method)
+    thread = threading.Thread(target=method.call, args=([1], None))
+    thread.start()
+    started.wait(5)
+    try:
+        # The call being profiled is not waited for.
+        result = profile.result()
+        assert result['calls'] == 1
+        assert result['pstats'] is None
+        assert result['collapsed'] == ''
+    finally:
+        proceed.set()
+        thread.join()
+    assert 'wait' in profile.result()['pstats']
+
+
+def test_sampling():
+    def slow(params, options):
+        time.sleep(0.05)
+        return params[0]
+    method = Method(slow)
+    profile = MethodProfile('slow', calls=2, mode='sampling', interval=0.001)
+    profile.install(method)
+    assert method.call([1], None) == 1
+    assert method.call([2], None) == 2
+    profile.sampler.join(5)
+    result = profile.result()
+    assert result['active'] is False
+    assert result['pstats'] is None
+    assert result['samples'] > 0
+    lines = result['collapsed'].splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert stack.startswith('call (method.py:')
+        assert int(count) > 0
+    assert any('slow (test_profiling.py:' in line for line in lines)
+
+
+def test_collapse_pstats():
+    a = ('a.py', 1, 'a')
+    b = ('b.py', 2, 'b')
+    c = ('c.py', 3, 'c')
+    # a calls b and c; b calls c
+    stats = {
+        a: (1, 1, 0.001, 0.010, {}),
+        b: (1, 1, 0.002, 0.006, {a: (1, 1, 0.002, 0.006)}),
+        c: (2, 2, 0.008, 0.008, {a: (1, 1, 0.002, 0.002), b: (1, 1, 0.004, 0.004)})
+    }
+    assert collapse_pstats(stats) == (
+        'a (a.py:1) 1000\n'
+        'a (a.py:1);b (b.py:2) 2000\n'
+        'a (a.py:1);b (b.py:2);c (c.py:3) 4000\n'
+        'a (a.py:1);c (c.py:3) 2000\n')
+
+
+def authorizer(options):
+    return options is not None and options.get('admin') is True
+
+
+def test_system_profile_unavailable(make_service):
+    service = make_service()
+    response = call(service, 'system.profile', {'method': 'add', 'action': 'status'})
+    assert response['error']['code'] == -32601
+
+
+def test_system_profile(make_service):
+    service = make_service(profile_authorizer=authorizer)
+    admin = {'admin': True}
+    response = call(service, 'system.profile', {'method': 'add', 'action': 'start'}, {})
+    assert response['error']['code'] == -32004
+    assert service.profile('add') is None
+
+    response = call(service, 'system.profile', {'method': 'add', 'action': 'status'}, admin)
+    assert response['error']['code'] == -32602
+
+    response = call(service, 'system.profile', {'method': 'add', 'action': 'start'}, admin)
+    assert response['error']['code'] == -32602
+    assert 'calls or seconds' in response['error']['error']['message']
+
+    response = call(service, 'system.profile',
+                    {'method': 'add', 'action': 'start', 'calls': 5}, admin)
+    assert response['result']['active'] is True
+    call(service, 'add', [1, 2])
+    response = call(service, 'system.profile', {'method': 'add', 'action': 'status'}, admin)
+    assert response['result']['calls'] == 1
+    assert response['result']['active'] is True
+    response = call(service, 'system.profile', {'method': 'add', 'action': 'stop'}, admin)
+    result = response['result']
+    assert result['active'] is False
+    assert 'fib' in result['collapsed']
+    json.dumps(result)
+
+    response = call(service, 'system.profile', {'method': 'nope', 'action': 'start',
+                                                'calls': 1}, admin)
+    assert response['error']['code'] == -32601
+
+
+def test_profile_system_profile(make_service):
+    service = make_service(profile_authorizer=authorizer)
+    admin = {'admin': True}
+    call(service, 'system.profile',
+         {'method': 'system.profile', 'action': 'start', 'calls': 5}, admin)
+    # The status call is itself being profiled.
+    response = call(service, 'system.profile',
+                    {'method': 'system.profile', 'action': 'status'}, admin)
+    assert response['result']['calls'] == 1
+    assert response['result']['pstats'] is None
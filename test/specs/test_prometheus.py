@@ -0,0 +1,111 @@
+from jsonrpc11base.errors import APIError
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.prometheus import escape
+from jsonrpc11base.service_description import ServiceDescription
+from jsonrpc11base.stats import LatencyHistogram
+
+
+class Teapot(APIError):
+    code = 418
+    message = 'Teapot'
+
+
+def broken_func(options):
+    raise Teapot()
+
+
+SERVICE_METHODS = {
+    'add': lambda params, options: params[0] + params[1],
+    'broken_func': broken_func
+}
+
+
+def call(service, method, params=None):
+    request = {'version': '1.1', 'method': method}
+    if params is not None:
+        request['params'] = params
+    return service.call_py(request)
+
+
+def samples(text):
+    values = {}
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    return values
+
+
+def test_render(make_service):
+    service = make_service()
+    call(service, 'add', [1, 2])
+    call(service, 'add', ['x', 2])
+    call(service, 'broken_func')
+    call(service, 'nope')
+    text = service.prometheus_metrics()
+    assert '# TYPE jsonrpc_calls_total counter\n' in text
+    assert '# TYPE jsonrpc_call_duration_seconds histogram\n' in text
+    values = samples(text)
+    # Invalid params never reach the method, but are counted as errors, of
+    # the requests for it.
+    assert values['jsonrpc_calls_total{method="add"}'] == 1
+    assert values['jsonrpc_requests_total{method="add"}'] == 2
+    assert values['jsonrpc_errors_total{method="add",code="-32602"}'] == 1
+    assert values['jsonrpc_errors_total{method="broken_func",code="418"}'] == 1
+    assert values['jsonrpc_calls_in_flight{method="add"}'] == 0
+    assert values['jsonrpc_call_duration_seconds_count{method="add"}'] == 1
+    assert values['jsonrpc_call_duration_seconds_bucket{method="add",le="+Inf"}'] == 1
+    assert values['jsonrpc_call_duration_seconds_bucket{method="add",le="10.0"}'] == 1
+    assert values['jsonrpc_call_duration_seconds_sum{method="add"}'] > 0
+    assert not any('nope' in name for name in values)
+
+
+def test_cardinality_cap():
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'))
+    for index in range(5):
+        service.add(lambda params, options: params, name=f'm{index}')
+        for _ in range(index):
+            call(service, f'm{index}', [1])
+    values = samples(service.prometheus_metrics(max_methods=2))
+    calls = {name: value for name, value in values.items()
+             if name.startswith('jsonrpc_calls_total')}
+    assert calls == {
+        'jsonrpc_calls_total{method="m4"}': 4,
+        'jsonrpc_calls_total{method="m3"}': 3,
+        'jsonrpc_calls_total{method="__other__"}': 3
+    }
+    assert values['jsonrpc_call_duration_seconds_count{method="__other__"}'] == 3
+
+    # Labels are kept, however often other methods are called.
+    for _ in range(10):
+        call(service, 'm1', [1])
+    call(service, 'm0', 'x')
+    values = samples(service.prometheus_metrics(max_methods=2))
+    calls = {name: value for name, value in values.items()
+             if name.startswith('jsonrpc_calls_total')}
+    assert calls == {
+        'jsonrpc_calls_total{method="m4"}': 4,
+        'jsonrpc_calls_total{method="m3"}': 3,
+        'jsonrpc_calls_total{method="__other__"}': 14
+    }
+    # Until all are labelled, methods first seen get labels.
+    calls = {name for name in samples(service.prometheus_metrics(max_methods=4))
+             if name.startswith('jsonrpc_calls_total')}
+    assert calls == {'jsonrpc_calls_total{method="%s"}' % name
+                     for name in ('m4', 'm3', 'm1', 'm2', '__other__')}
+
+
+def test_cumulative_counts():
+    histogram = LatencyHistogram()
+    for value in (512, 2000000, 3000000000):
+        histogram.record(value)
+    assert histogram.cumulative_counts([0.000001, 0.001, 0.0025, 1.0, 10.0]) == [1, 1, 2, 2, 3]
+    other = LatencyHistogram()
+    other.record(5000)
+    histogram.merge(other)
+    assert histogram.count == 4
+    assert histogram.cumulative_counts([0.00001]) == [2]
+
+
+def test_escape():
+    assert escape('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
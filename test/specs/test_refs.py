@@ -0,0 +1,138 @@
+import json
+import os
+import shutil
+import pytest
+from jsonschema import Draft7Validator, RefResolver
+from jsonrpc11base.exceptions import InvalidSchemaError, UnresolvableRefError
+from jsonrpc11base.validation.refs import RefBundler, read_document
+from jsonrpc11base.validation.schema import Schema, SchemaError, reference_validator
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+TREE = {
+    '$schema': 'http://json-schema.org/draft-07/schema',
+    'definitions': {
+        'node': {
+            'type': 'object',
+            'required': ['name'],
+            'properties': {
+                'name': {'$ref': 'base.json#definitions/test_object/properties/a'},
+                'children': {'type': 'array', 'items': {'$ref': '#/definitions/node'}}
+            }
+        }
+    },
+    '$ref': '#/definitions/node'
+}
+
+
+@pytest.fixture
+def schema_dir(tmp_path):
+    path = tmp_path / 'schema'
+    shutil.copytree(SCHEMA_DIR, str(path))
+    return str(path)
+
+
+def write(schema_dir, name, schema):
+    with open(os.path.join(schema_dir, name), 'w') as fd:
+        json.dump(schema, fd)
+
+
+def outcome(validate, value):
+    try:
+        validate(value)
+    except SchemaError as ex:
+        return (ex.message, ex.path, ex.value)
+    return None
+
+
+def no_remote(uri):
+    raise AssertionError(f'{uri} was read while validating')
+
+
+@pytest.mark.parametrize('engine', ['jsonschema', 'codegen'])
+def test_refs_resolved_at_load(schema_dir, engine, monkeypatch):
+    write(schema_dir, 'tree.params.json', TREE)
+    schema = Schema(schema_dir, engine=engine)
+    monkeypatch.setattr(schema.resolver, 'resolve_remote', no_remote)
+    schema.validate('keyv.params', {'a': 1, 'c': 2})
+    assert outcome(lambda value: schema.validate('keyv.params', value), {'a': 1}) == (
+        "'c' is a required property", 'required', ['a', 'c'])
+    schema.validate('tree.params', {'name': 1, 'children': [{'name': 2, 'children': []}]})
+
+
+@pytest.mark.parametrize('value', [
+    {'name': 1},
+    {'name': 'x'},
+    {'children': []},
+    {'name': 1, 'children': [{'name': 2}, {'name': 'y'}]},
+    {'name': 1, 'children': [{'name': 2, 'children': [{}]}]},
+    {'name': 1, 'children': {}},
+    []
+])
+def test_refs_same_errors(schema_dir, value):
+    """Bundled schemas report the same errors as jsonschema resolving $refs itself."""
+    write(schema_dir, 'tree.params.json', TREE)
+    schema = Schema(schema_dir)
+    resolver = RefResolver(f'file://{os.path.abspath(schema_dir)}/tree.params.json', TREE)
+    reference = reference_validator(Draft7Validator(TREE, resolver=resolver))
+    assert (outcome(lambda v: schema.validate('tree.params', v), value)
+            == outcome(reference, value))
+
+
+def test_refs_missing_file(schema_dir):
+    write(schema_dir, 'bad.params.json', {'$ref': 'nope.json#/definitions/x'})
+    with pytest.raises(UnresolvableRefError) as ure:
+        Schema(schema_dir)
+    assert 'Schema "bad.params" has an unresolvable $ref' in str(ure.value)
+    assert isinstance(ure.value, InvalidSchemaError)
+
+
+def test_refs_missing_fragment(schema_dir):
+    write(schema_dir, 'bad.params.json', {'$ref': 'base.json#/definitions/nope'})
+    with pytest.raises(UnresolvableRefError) as ure:
+        Schema(schema_dir)
+    assert 'base.json#/definitions/nope' in str(ure.value)
+
+
+def test_refs_lazy_reported_on_load(schema_dir):
+    write(schema_dir, 'bad.params.json', {'$ref': 'nope.json'})
+    schema = Schema(schema_dir, lazy=True)
+    with pytest.raises(UnresolvableRefError):
+        schema.warm(['bad.params'])
+
+
+def test_refs_cycle(schema_dir):
+    write(schema_dir, 'a.json', {'$ref': 'b.json'})
+    write(schema_dir, 'b.json', {'definitions': {'c': {'$ref': 'a.json'}},
+                                 '$ref': '#/definitions/c'})
+    with pytest.raises(UnresolvableRefError) as ure:
+        Schema(schema_dir)
+    assert '$ref cycle' in str(ure.value)
+
+
+def test_refs_outside_dir(tmp_path, schema_dir):
+    shared = tmp_path / 'shared.json'
+    shared.write_text(json.dumps({'definitions': {'id': {'type': 'integer'}}}))
+    write(schema_dir, 'shared.params.json', {'$ref': '../shared.json#/definitions/id'})
+    schema = Schema(schema_dir)
+    shared.unlink()
+    schema.validate('shared.params', 1)
+    with pytest.raises(SchemaError):
+        schema.validate('shared.params', 'x')
+
+
+def test_bundler():
+    store = {'file:///s/base.json': {'definitions': {'n': {'type': 'number'}}}}
+    resolver = RefResolver('file:///s/', None, store=store)
+    bundler = RefBundler(resolver, read_document)
+    schema = {'$schema': 'http://json-schema.org/draft-07/schema',
+              'properties': {'$ref': {'$ref': 'base.json#/definitions/n'}},
+              'enum': [{'$ref': 'not a schema'}]}
+    bundled, documents = bundler.bundle('x', schema, 'file:///s/x.json')
+    assert bundled == {'$schema': 'http://json-schema.org/draft-07/schema',
+                       'properties': {'$ref': {'type': 'number'}},
+                       'enum': [{'$ref': 'not a schema'}]}
+    assert documents == {'file:///s/base.json'}
+    # Schemas which set their own base URL are left alone.
+    with_id = {'$id': 'http://example.com/x', 'items': {'$ref': 'y'}}
+    assert bundler.bundle('y', with_id, 'file:///s/y.json') == (with_id, None)
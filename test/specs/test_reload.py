@@ -0,0 +1,149 @@
+import os
+import shutil
+import threading
+import pytest
+import jsonrpc11base.validation.bundle as bundle
+from jsonrpc11base.errors import InvalidParamsError
+from jsonrpc11base.exceptions import MissingSchemaError
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.reload import SchemaWatcher
+from jsonrpc11base.service_description import ServiceDescription
+from jsonrpc11base.validation import sampling
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+
+@pytest.fixture
+def schema_dir(tmp_path):
+    path = tmp_path / 'schema'
+    shutil.copytree(SCHEMA_DIR, str(path))
+    return str(path)
+
+
+def rewrite(path, text):
+    stat = os.stat(path)
+    with open(path, 'w') as fd:
+        fd.write(text)
+    # Ensure the mtime changes, regardless of filesystem timestamp resolution.
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+
+SERVICE_OPTIONS = {'validate_result': True}
+
+SERVICE_METHODS = {
+    'add': lambda params, options: params[0] + params[1],
+    'keyv': lambda params, options: None
+}
+
+
+def call(service, method, params):
+    return service.call_py({'version': '1.1', 'method': method, 'params': params})
+
+
+@pytest.mark.parametrize('engine', ['jsonschema', 'codegen'])
+def test_reload_changed_only(make_service, schema_dir, engine):
+    service = make_service(schema_dir=schema_dir, validation_engine=engine)
+    old_schemas = dict(service.service_validation.schema.schemas)
+    old_record = service.dispatch_table['add']
+    assert call(service, 'add', [1.5, 2])['error']['code'] == -32602
+
+    rewrite(os.path.join(schema_dir, 'add.params.json'),
+            '{"type": "array", "items": {"type": "number"}}')
+    outcome = service.reload_schemas()
+    assert outcome.ok
+    assert outcome.changed == ['add.params']
+    assert outcome.recompiled == ['add.params']
+
+    schemas = service.service_validation.schema.schemas
+    assert schemas['keyv.params'] is old_schemas['keyv.params']
+    assert schemas['add.params'] is not old_schemas['add.params']
+    assert call(service, 'add', [1.5, 2])['result'] == 3.5
+    # A call which started before the reload goes on with the old schemas.
+    with pytest.raises(InvalidParamsError):
+        old_record.params_validator([1.5, 2])
+
+
+def test_reload_ref_changed(make_service, schema_dir):
+    service = make_service(schema_dir=schema_dir)
+    base_path = os.path.join(schema_dir, 'base.json')
+    with open(base_path) as fd:
+        base = fd.read()
+    rewrite(base_path, base.replace('"c"\n', '"c", "d"\n'))
+    outcome = service.reload_schemas()
+    assert outcome.changed == ['base']
+    assert set(outcome.recompiled) == {'base', 'keyv.params', 'posv.params'}
+    error = call(service, 'keyv', {'a': 1, 'c': 2})['error']
+    assert error['error']['message'] == "'d' is a required property"
+
+
+def test_reload_failure_keeps_schemas(make_service, schema_dir):
+    service = make_service(schema_dir=schema_dir)
+    table = service.dispatch_table
+    rewrite(os.path.join(schema_dir, 'add.params.json'), '{"type": ')
+    outcome = service.reload_schemas()
+    assert not outcome.ok
+    assert isinstance(outcome.error, ValueError)
+    assert service.dispatch_table is table
+
+    os.remove(os.path.join(schema_dir, 'add.params.json'))
+    outcome = service.reload_schemas()
+    assert isinstance(outcome.error, MissingSchemaError)
+    assert call(service, 'add', [1, 2])['result'] == 3
+
+
+def test_reload_resets_sampling(make_service, schema_dir):
+    service = make_service(schema_dir=schema_dir, result_validation=sampling.FirstN(1))
+    call(service, 'add', [1, 2])
+    assert not service.dispatch_table['add'].result_sampler.should_validate()
+    rewrite(os.path.join(schema_dir, 'add.result.json'), '{"type": "string"}')
+    assert service.reload_schemas().ok
+    assert service.dispatch_table['add'].result_sampler.should_validate()
+
+
+def test_reload_bundle(make_service, tmp_path):
+    path = str(tmp_path / 'schemas.yaml')
+    bundle.main([SCHEMA_DIR, path])
+    service = make_service(schema_dir=path)
+    with open(path) as fd:
+        text = fd.read()
+    rewrite(path, text.replace('title: Test service schema\n      type: number',
+                               'title: Test service schema\n      type: string', 1))
+    outcome = service.reload_schemas()
+    assert outcome.changed == ['add.result']
+    assert call(service, 'add', [1, 2])['error']['code'] == -32002
+
+
+def test_watcher_check(make_service, schema_dir):
+    service = make_service(schema_dir=schema_dir)
+    outcomes = []
+    watcher = SchemaWatcher(service, on_reload=outcomes.append)
+    assert watcher.check() is None
+    rewrite(os.path.join(schema_dir, 'add.result.json'), '{"type": "string"}')
+    outcome = watcher.check()
+    assert outcomes == [outcome]
+    assert outcome.ok and outcome.changed == ['add.result']
+    assert watcher.check() is None
+    # New files are noticed too
+    rewrite(os.path.join(schema_dir, 'hello.params.json'), '{}')
+    with open(os.path.join(schema_dir, 'new.params.json'), 'w') as fd:
+        fd.write('{}')
+    assert watcher.check().changed == ['hello.params', 'new.params']
+
+
+def test_watch_schemas(make_service, schema_dir):
+    service = make_service(schema_dir=schema_dir)
+    reloaded = threading.Event()
+    watcher = service.watch_schemas(interval=0.01, on_reload=lambda outcome: reloaded.set())
+    try:
+        rewrite(os.path.join(schema_dir, 'add.result.json'), '{"type": "string"}')
+        assert reloaded.wait(5)
+    finally:
+        watcher.stop()
+    assert call(service, 'add', [1, 2])['error']['code'] == -32002
+
+
+def test_watch_schemas_no_schema_dir():
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'))
+    with pytest.raises(TypeError):
+        service.watch_schemas()
+    assert service.reload_schemas().ok
@@ -0,0 +1,122 @@
+import logging
+import pytest
+from jsonrpc11base.validation import sampling
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+
+SERVICE_DESCRIPTION = ServiceDescription('Test Service', 'test')
+
+SERVICE_OPTIONS = {'validate_params': False}
+
+
+def bad_add(params, options):
+    return 'not a number'
+
+
+def call_add(service):
+    return service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]})
+
+
+def test_make_policy():
+    assert isinstance(sampling.make_policy('always'), sampling.Always)
+    assert isinstance(sampling.make_policy('never'), sampling.Never)
+    policy = sampling.Sample(0.5)
+    assert sampling.make_policy(policy) is policy
+    with pytest.raises(ValueError):
+        sampling.make_policy('sometimes')
+
+
+def test_policy_arguments():
+    with pytest.raises(ValueError):
+        sampling.Sample(1.5)
+    with pytest.raises(ValueError):
+        sampling.Adaptive(min_rate=0.5, max_rate=0.1)
+    with pytest.raises(ValueError):
+        sampling.Adaptive(decay=0)
+
+
+def test_first_n():
+    policy = sampling.FirstN(3)
+    assert [policy.should_validate() for _ in range(5)] == [True, True, True, False, False]
+    # A fresh copy, as when schemas are reloaded, starts counting again
+    assert policy.for_method().should_validate() is True
+
+
+def test_sample_rate():
+    assert not any(sampling.Sample(0).should_validate() for _ in range(100))
+    assert all(sampling.Sample(1).should_validate() for _ in range(100))
+
+
+def test_adaptive():
+    policy = sampling.Adaptive(min_rate=0.1, max_rate=1.0, decay=0.5)
+    assert policy.rate == 1.0
+    for _ in range(10):
+        policy.record(False)
+    assert policy.rate == 0.1
+    policy.record(True)
+    assert policy.rate == 1.0
+    assert policy.stats() == {'checked': 11, 'violations': 1, 'rate': 1.0}
+
+
+def test_service_always_default(make_service):
+    service = make_service(validate_result=True)
+    assert isinstance(service.result_validation, sampling.Always)
+    service.add(bad_add, name='add')
+    assert service.dispatch_table['add'].result_sampler is None
+    assert call_add(service)['error']['code'] == -32002
+    assert service.result_validation_stats() == {}
+
+
+def test_service_never(make_service):
+    service = make_service(result_validation='never')
+    assert service.validate_result is False
+    service.add(bad_add, name='add')
+    assert call_add(service)['result'] == 'not a number'
+
+
+def test_service_sampled_violation_logged(make_service, caplog):
+    service = make_service(result_validation=sampling.FirstN(2))
+    assert service.validate_result is True
+    service.add(bad_add, name='add')
+    with caplog.at_level(logging.WARNING):
+        results = [call_add(service) for _ in range(3)]
+    # The response is still returned
+    assert [result['result'] for result in results] == ['not a number'] * 3
+    assert service.result_validation_stats()['add'] == {'checked': 2, 'violations': 2}
+    assert len(caplog.records) == 2
+    assert 'Result of method "add" violates its schema' in caplog.records[0].getMessage()
+
+
+def test_service_sampled_enforced(make_service):
+    service = make_service(result_validation=sampling.Sample(1, enforce=True))
+    service.add(bad_add, name='add')
+    assert call_add(service)['error']['code'] == -32002
+    assert service.result_validation_stats()['add'] == {'checked': 1, 'violations': 1}
+
+
+def test_method_policy(make_service):
+    service = make_service(validate_result=True)
+    service.add(bad_add, name='add', result_validation=sampling.Sample(1))
+    service.add(lambda params, options: 'hello', name='hello', result_validation='never')
+    assert call_add(service)['result'] == 'not a number'
+    assert service.result_validation_stats()['add'] == {'checked': 1, 'violations': 1}
+    assert service.dispatch_table['hello'].result_policy == 'unvalidated'
+
+
+def test_method_policies_are_separate(make_service):
+    service = make_service(result_validation=sampling.FirstN(1))
+    service.add(bad_add, name='add')
+    service.add(lambda params, options: params[0] * params[0], name='square')
+    call_add(service)
+    service.call_py({'version': '1.1', 'method': 'square', 'params': [3]})
+    stats = service.result_validation_stats()
+    assert stats['add'] == {'checked': 1, 'violations': 1}
+    assert stats['square'] == {'checked': 1, 'violations': 0}
+
+
+def test_no_schema_dir():
+    with pytest.raises(TypeError):
+        JSONRPCService(SERVICE_DESCRIPTION, result_validation=sampling.Sample(0.1))
+    service = JSONRPCService(SERVICE_DESCRIPTION, result_validation='never')
+    with pytest.raises(TypeError):
+        service.add(bad_add, name='add', result_validation='always')
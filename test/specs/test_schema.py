@@ -1,5 +1,6 @@
 import pytest
 from jsonrpc11base.validation.schema import Schema, SchemaError
+from jsonrpc11base.exceptions import InvalidSchemaError
 
 
 def test_schema_no_dir():
@@ -31,3 +32,34 @@ def test_schema_validate_but_absent():
     with pytest.raises(SchemaError) as se:
         schema.validate('absent', 'bar')
     assert 'Schema "absent" specifies the the value must be absent' in str(se)
+
+
+def test_schema_validator_built_at_load():
+    schema = Schema('test/data/schema/test')
+    validator = schema.get('add.params')['validator']
+    schema.validate('add.params', [1, 2])
+    schema.validate('add.params', [3])
+    assert schema.get('add.params')['validator'] is validator
+
+
+def test_schema_validate_error():
+    schema = Schema('test/data/schema/test')
+    with pytest.raises(SchemaError) as se:
+        schema.validate('add.params', [1, 'x'])
+    assert se.value.message == "'x' is not of type 'integer'"
+    assert se.value.path == 'items.type'
+    assert se.value.value == 'integer'
+
+
+def test_schema_validate_ref_error():
+    schema = Schema('test/data/schema/test')
+    with pytest.raises(SchemaError) as se:
+        schema.validate('keyv.params', {'a': 1})
+    assert se.value.message == "'c' is a required property"
+    assert se.value.path == 'required'
+
+
+def test_schema_invalid_schema():
+    with pytest.raises(InvalidSchemaError) as ise:
+        Schema('test/data/schema/invalid')
+    assert 'Schema "bad.params" is invalid' in str(ise.value)
@@ -0,0 +1,115 @@
+import threading
+import pytest
+from jsonrpc11base.validation import sampling
+from jsonrpc11base.validation.shadow import Shadow, ShadowPool
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.service_description import ServiceDescription
+
+SCHEMA_DIR = 'test/data/schema/test'
+
+SERVICE_DESCRIPTION = ServiceDescription('Test Service', 'test')
+
+
+def call(service, method, params):
+    return service.call_py({'version': '1.1', 'method': method, 'params': params})
+
+
+@pytest.fixture
+def pool():
+    pool = ShadowPool(workers=2)
+    yield pool
+    pool.close()
+
+
+def test_shadow_violation_sent_to_sink(pool):
+    violations = []
+    service = JSONRPCService(SERVICE_DESCRIPTION, schema_dir=SCHEMA_DIR,
+                             result_validation=Shadow(pool, sink=lambda name, error:
+                                                      violations.append((name, error.error))))
+    service.add(lambda params, options: 'not a number', name='add')
+    service.add(lambda params, options: params[0] * params[0], name='square')
+    assert call(service, 'add', [1, 2])['result'] == 'not a number'
+    assert call(service, 'square', [3])['result'] == 9
+    pool.join()
+    assert violations == [('add', {'message': "'not a number' is not of type 'number'",
+                                   'path': 'type',
+                                   'value': 'number'})]
+    stats = service.result_validation_stats()
+    assert stats['add'] == {'checked': 1, 'violations': 1, 'dropped': 0}
+    assert stats['square'] == {'checked': 1, 'violations': 0, 'dropped': 0}
+
+
+def test_shadow_snapshot(pool):
+    """The result is validated as it was returned, even if changed afterwards."""
+    violations = []
+    result = {'x': 1}
+    service = JSONRPCService(SERVICE_DESCRIPTION, schema_dir=SCHEMA_DIR,
+                             result_validation=Shadow(pool, sink=lambda name, error:
+                                                      violations.append(name)))
+    service.add(lambda params, options: result, name='echo')
+    # Hold the workers, so the result is changed before it is validated.
+    gate = threading.Event()
+    pool.submit(gate.wait)
+    pool.submit(gate.wait)
+    call(service, 'echo', {'x': 1})
+    result['x'] = 1.5
+    gate.set()
+    pool.join()
+    assert violations == []
+
+
+def test_shadow_queue_full_drops():
+    pool = ShadowPool(workers=1, queue_size=1)
+    gate = threading.Event()
+    service = JSONRPCService(SERVICE_DESCRIPTION, schema_dir=SCHEMA_DIR,
+                             result_validation=Shadow(pool))
+    service.add(lambda params, options: params[0] + params[1], name='add')
+    pool.submit(gate.wait)
+    # The worker may or may not have taken the gate task from the queue yet;
+    # either way, calls go on being answered once the queue is full.
+    results = [call(service, 'add', [1, 2])['result'] for _ in range(3)]
+    assert results == [3, 3, 3]
+    stats = service.result_validation_stats()['add']
+    assert stats['dropped'] >= 2
+    gate.set()
+    pool.close()
+    assert service.result_validation_stats()['add']['checked'] == 3 - stats['dropped']
+
+
+def test_shadow_sampled(pool):
+    service = JSONRPCService(SERVICE_DESCRIPTION, schema_dir=SCHEMA_DIR,
+                             result_validation=Shadow(pool, sample=sampling.FirstN(1)))
+    service.add(lambda params, options: params[0] + params[1], name='add')
+    for _ in range(3):
+        call(service, 'add', [1, 2])
+    pool.join()
+    assert service.result_validation_stats()['add']['checked'] == 1
+
+
+def test_shadow_adaptive_sample(pool):
+    service = JSONRPCService(SERVICE_DESCRIPTION, schema_dir=SCHEMA_DIR,
+                             result_validation=Shadow(pool, sample=sampling.Adaptive(
+                                 min_rate=0.0, decay=0.5)))
+    service.add(lambda params, options: params[0] + params[1], name='add')
+    for _ in range(200):
+        call(service, 'add', [1, 2])
+        pool.join()
+    stats = service.result_validation_stats()['add']
+    assert stats['violations'] == 0
+    assert stats['checked'] < 200
+    # The rate halves with each valid result checked.
+    sample = service.find_method('add').result_sampler.sample
+    assert sample.rate == 0.5 ** stats['checked']
+
+
+def test_shadow_pool_task_failure(pool):
+    ran = []
+    pool.submit(lambda: 1 / 0)
+    pool.submit(lambda: ran.append(True))
+    pool.join()
+    assert ran == [True]
+
+
+def test_shadow_pool_workers():
+    with pytest.raises(ValueError):
+        ShadowPool(workers=0)
@@ -0,0 +1,156 @@
+import json
+import logging
+
+import pytest
+
+from jsonrpc11base.phases import PhaseTimer
+from jsonrpc11base.slowlog import REDACTED, SlowCallLog, redact
+
+TIMINGS = {'envelope': 1000, 'params': 2000, 'handler': 2000000000, 'result': 3000,
+           'total': 2000006000}
+
+
+SERVICE_OPTIONS = {'validate_result': True}
+
+SERVICE_METHODS = {
+    'add': lambda params, options: params[0] + params[1]
+}
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        SlowCallLog(max_records=0)
+    with pytest.raises(ValueError):
+        SlowCallLog(interval=0)
+
+
+def test_thresholds():
+    records = []
+    slow_log = SlowCallLog(threshold=3.0, thresholds={'fast': 1.0, 'ignored': None},
+                           sink=records.append)
+    request = {'method': 'x', 'params': [1]}
+    slow_log.check('slow', request, TIMINGS)
+    slow_log.check('ignored', request, TIMINGS)
+    assert records == []
+    slow_log.check('fast', request, TIMINGS)
+    assert [record['method'] for record in records] == ['fast']
+    assert records[0]['threshold'] == 1.0
+
+
+def test_record():
+    records = []
+    slow_log = SlowCallLog(threshold=1.0, sink=records.append)
+    slow_log.check('get', {'version': '1.1', 'method': 'get', 'params': [1, 2], 'id': 7},
+                   TIMINGS)
+    assert records == [{
+        'method': 'get',
+        'id': 7,
+        'total': 2.000006,
+        'threshold': 1.0,
+        'phases': {'envelope': 1e-06, 'params': 2e-06, 'handler': 2.0, 'result': 3e-06},
+        'params_size': 6,
+        'params_sample': '[1, 2]',
+        'suppressed': 0
+    }]
+
+
+def test_no_params():
+    records = []
+    slow_log = SlowCallLog(threshold=1.0, sink=records.append)
+    slow_log.check('get', {'method': 'get'}, TIMINGS)
+    assert records[0]['id'] is None
+    assert records[0]['params_size'] == 0
+    assert records[0]['params_sample'] is None
+
+
+def test_redaction():
+    params = [{'user': 'me', 'Password': 'hunter2', 'nested': [{'token': 'abc'}]}]
+    assert redact(params, {'password', 'token'}) == [
+        {'user': 'me', 'Password': REDACTED, 'nested': [{'token': REDACTED}]}]
+    records = []
+    slow_log = SlowCallLog(threshold=1.0, sink=records.append)
+    slow_log.check('login', {'method': 'login', 'params': params}, TIMINGS)
+    sample = records[0]['params_sample']
+    assert 'hunter2' not in sample
+    assert 'abc' not in sample
+    assert json.loads(sample)[0]['user'] == 'me'
+    # The size is that of the params as called
+    assert records[0]['params_size'] == len(json.dumps(params))
+
+
+def test_truncation():
+    records = []
+    slow_log = SlowCallLog(threshold=1.0, max_sample_bytes=10, sink=records.append)
+    slow_log.check('get', {'method': 'get', 'params': ['é' * 20]}, TIMINGS)
+    sample = records[0]['params_sample']
+    assert sample.endswith('...')
+    assert len(sample[:-3].encode('utf-8')) <= 10
+    assert records[0]['params_size'] == len(json.dumps(['é' * 20]).encode('utf-8'))
+
+
+def test_no_capture():
+    records = []
+    slow_log = SlowCallLog(threshold=1.0, capture_params=False, sink=records.append)
+    slow_log.check('get', {'method': 'get', 'params': [1, 2]}, TIMINGS)
+    assert records[0]['params_size'] == 6
+    assert records[0]['params_sample'] is None
+
+
+def test_rate_limit():
+    records = []
+    slow_log = SlowCallLog(threshold=1.0, max_records=2, interval=3600, sink=records.append)
+    for _ in range(5):
+        slow_log.check('get', {'method': 'get'}, TIMINGS)
+    assert len(records) == 2
+    assert slow_log.suppressed == 3
+    # A new interval; the record counts the calls suppressed in the last
+    slow_log.interval_started -= 3600
+    slow_log.check('get', {'method': 'get'}, TIMINGS)
+    assert len(records) == 3
+    assert records[-1]['suppressed'] == 3
+    assert slow_log.suppressed == 0
+
+
+def test_failing_sink(caplog):
+    def sink(record):
+        raise RuntimeError('oops')
+    slow_log = SlowCallLog(threshold=1.0, sink=sink)
+    with caplog.at_level(logging.ERROR, logger='jsonrpc11base.slowlog'):
+        slow_log.check('get', {'method': 'get'}, TIMINGS)
+    assert 'Slow call sink failed' in caplog.text
+
+
+def test_logged(caplog):
+    slow_log = SlowCallLog(threshold=1.0)
+    with caplog.at_level(logging.WARNING, logger='jsonrpc11base.slowlog'):
+        slow_log.check('get', {'method': 'get', 'params': {'secret': 's3'}}, TIMINGS)
+    [log_record] = caplog.records
+    assert log_record.levelno == logging.WARNING
+    assert log_record.slow_call['method'] == 'get'
+    assert 's3' not in caplog.text
+
+
+def test_service(make_service):
+    records = []
+    service = make_service(slow_call_log=SlowCallLog(threshold=None, thresholds={'add': 0.0},
+                                                     sink=records.append))
+    assert isinstance(service.phase_timer, PhaseTimer)
+    service.call('{"version": "1.1", "method": "add", "params": [1, 2], "id": 5}')
+    service.call('{"version": "1.1", "method": "nope", "params": [1, 2]}')
+    service.call_py({'version': '1.1', 'method': 'add', 'params': ['x', 2]})
+    assert [(record['method'], record['id']) for record in records] == [
+        ('add', 5), ('add', None)]
+    assert set(records[0]['phases']) == {'decode', 'envelope', 'params', 'handler', 'result',
+                                         'encode'}
+    assert records[0]['params_sample'] == '[1, 2]'
+
+
+def test_service_with_timer(make_service):
+    records = []
+    phase_timer = PhaseTimer()
+    service = make_service(phase_timer=phase_timer,
+                           slow_call_log=SlowCallLog(threshold=0.0, sink=records.append))
+    assert service.phase_timer is phase_timer
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]})
+    assert len(records) == 1
+    assert phase_timer.stats()['methods']['add']['total']['count'] == 1
@@ -0,0 +1,174 @@
+import threading
+import time
+import pytest
+from jsonrpc11base.errors import InvalidParamsError
+from jsonrpc11base.main import JSONRPCService
+from jsonrpc11base.method import Method
+from jsonrpc11base.phases import PhaseTimer
+from jsonrpc11base.service_description import ServiceDescription
+from jsonrpc11base.stats import BUCKET_COUNT, LatencyHistogram, bucket_bounds, bucket_of
+
+
+def test_buckets():
+    for value in list(range(10000)) + [10 ** 9, 10 ** 12, 2 ** 64 - 1]:
+        low, high = bucket_bounds(bucket_of(value))
+        assert low <= value <= high
+        # Within 12.5% of the value
+        assert high - low <= max(value, 8) / 8
+    assert bucket_of(2 ** 64 - 1) == BUCKET_COUNT - 1
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.summary()['p99'] == 0
+    for value in range(1, 1001):
+        histogram.record(value * 1000)
+    assert histogram.count == 1000
+    assert histogram.max == 1000000
+    for fraction, expected in ((0.5, 500000), (0.9, 900000), (0.99, 990000)):
+        assert expected <= histogram.percentile(fraction) <= expected * 1.125
+    assert histogram.percentile(1.0) == 1000000
+    summary = histogram.summary()
+    assert summary['max'] == 0.001
+    assert summary['mean'] == pytest.approx(0.0005005)
+
+
+def test_method_stats():
+    def handler(params, options):
+        if params == 'params':
+            raise InvalidParamsError()
+        if params == 'value':
+            raise ValueError()
+        time.sleep(0.01)
+        return params
+
+    method = Method(handler)
+    for params in [1, 2, 'params', 'value', 'params']:
+        try:
+            method.call(params, {})
+        except Exception:
+            pass
+    snapshot = method.snapshot()
+    assert snapshot['call_count'] == 5
+    assert snapshot['error_count'] == 3
+    assert snapshot['errors_by_class'] == {'InvalidParamsError': 2, 'ValueError': 1}
+    # Accumulated, not overwritten
+    assert snapshot['cumulative_call_time'] >= 0.02
+    assert method.cumulative_call_time == snapshot['cumulative_call_time']
+    assert 0.01 <= snapshot['max'] <= snapshot['cumulative_call_time']
+    assert snapshot['p50'] <= snapshot['p90'] <= snapshot['p99'] <= snapshot['max']
+
+    assert method.snapshot(reset=True) == snapshot
+    assert method.snapshot()['call_count'] == 0
+    method.call(1, {})
+    method.reset()
+    assert method.snapshot() == {
+        'call_count': 0, 'error_count': 0, 'errors_by_class': {}, 'errors_by_code': {},
+        'rejected_count': 0, 'in_flight': 0, 'cumulative_call_time': 0.0,
+        'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0
+    }
+
+
+def test_in_flight():
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def wait(params, options):
+        started.set()
+        proceed.wait(5)
+        return params
+    method = Method(wait)
+    thread = threading.Thread(target=method.call, args=([1], None))
+    thread.start()
+    started.wait(5)
+    # Reading the count does not change it.
+    assert method.in_flight == 1
+    assert method.snapshot()['in_flight'] == 1
+    assert method.snapshot(reset=True)['in_flight'] == 1
+    assert method.in_flight == 1
+    proceed.set()
+    thread.join()
+    assert method.in_flight == 0
+    assert method.snapshot()['call_count'] == 1
+
+
+def test_service_method_stats():
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'))
+    service.add(lambda params, options: params, name='echo')
+    service.call_py({'version': '1.1', 'method': 'echo', 'params': [1]})
+    service.call_py({'version': '1.1', 'method': 'system.describe'})
+    stats = service.method_stats(reset=True)
+    assert stats['echo']['call_count'] == 1
+    assert stats['system.describe']['call_count'] == 1
+    assert service.method_stats()['echo']['call_count'] == 0
+
+
+def call_stats(service, params):
+    return service.call_py({'version': '1.1', 'method': 'system.stats', 'params': params})
+
+
+@pytest.mark.parametrize('timed', [False, True])
+def test_system_stats(timed):
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             phase_timer=PhaseTimer() if timed else None,
+                             stats_authorizer=lambda options: True)
+    service.add(lambda params, options: params, name='echo')
+    service.add(lambda params, options: params, name='echo2')
+    service.call_py({'version': '1.1', 'method': 'echo', 'params': [1]})
+
+    result = call_stats(service, {'prefix': 'echo'})['result']
+    assert set(result['methods']) == {'echo', 'echo2'}
+    echo = result['methods']['echo']
+    assert echo['call_count'] == 1
+    assert echo['in_flight'] == 0
+    assert echo['p50'] <= echo['max']
+    if timed:
+        assert echo['phases']['handler']['count'] == 1
+        assert echo['validation_time'] == echo['phases']['params']['total'] + (
+            echo['phases']['result']['total'])
+    else:
+        assert echo['validation_time'] is None
+    process = result['process']
+    assert process['uptime'] > 0
+    assert process['pid'] > 0
+    assert process['rss'] is None or process['rss'] > 0
+
+    result = call_stats(service, {'reset': True})['result']
+    assert result['methods']['echo']['call_count'] == 1
+    # The call being made is in flight.
+    assert result['methods']['system.stats']['in_flight'] == 1
+    result = call_stats(service, {'prefix': 'echo'})['result']
+    assert result['methods']['echo']['call_count'] == 0
+
+
+def test_system_stats_params():
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'))
+    assert call_stats(service, {'prefix': 1})['error']['code'] == -32602
+    assert call_stats(service, {'other': 1})['error']['code'] == -32602
+    assert 'result' in call_stats(service, {})
+    # Params may be omitted.
+    result = service.call_py({'version': '1.1', 'method': 'system.stats'})['result']
+    assert 'system.stats' in result['methods']
+
+
+def test_system_stats_reset_authorization():
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'))
+    service.add(lambda params, options: params, name='echo')
+    service.call_py({'version': '1.1', 'method': 'echo', 'params': [1]})
+    assert call_stats(service, {'reset': True})['error']['code'] == -32004
+    authorized = []
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             stats_authorizer=lambda options: options in authorized)
+    service.add(lambda params, options: params, name='echo')
+    service.call_py({'version': '1.1', 'method': 'echo', 'params': [1]})
+    request = {'version': '1.1', 'method': 'system.stats', 'params': {'reset': True}}
+    assert service.call_py(request, 'caller')['error']['code'] == -32004
+    assert service.method_stats()['echo']['call_count'] == 1
+    authorized.append('caller')
+    assert 'result' in service.call_py(request, 'caller')
+    assert service.method_stats()['echo']['call_count'] == 0
+    # Resets are authorized separately from profiling, which is not exposed.
+    assert 'system.profile' not in service.dispatch_table
+    service = JSONRPCService(ServiceDescription('Test Service', 'test'),
+                             profile_authorizer=lambda options: True)
+    assert call_stats(service, {'reset': True})['error']['code'] == -32004
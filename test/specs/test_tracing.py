@@ -0,0 +1,248 @@
+import json
+import logging
+
+import pytest
+
+from jsonrpc11base.phases import PhaseTimer
+from jsonrpc11base.tracing import (JSONLExporter, RingBufferExporter, SpanExporter, Tracer,
+                                   current_span, format_traceparent, parse_traceparent)
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+TRACEPARENT = f'00-{TRACE_ID}-{PARENT_ID}-01'
+
+
+class Options(object):
+    pass
+
+
+# The current span of each call of add
+seen_spans = []
+
+
+def add(params, options):
+    seen_spans.append(current_span())
+    return params[0] + params[1]
+
+
+SERVICE_OPTIONS = {'validate_result': True}
+
+SERVICE_METHODS = {
+    'add': add,
+    'square': lambda params, options: current_span().traceparent
+}
+
+
+@pytest.fixture
+def traced_service(make_service):
+    exporter = RingBufferExporter()
+    return make_service(tracer=Tracer([exporter])), exporter
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(TRACEPARENT) == (TRACE_ID, PARENT_ID, 1)
+    assert parse_traceparent(TRACEPARENT.upper()) == (TRACE_ID, PARENT_ID, 1)
+    assert parse_traceparent(f'00-{TRACE_ID}-{PARENT_ID}-00') == (TRACE_ID, PARENT_ID, 0)
+    # Future versions may add fields.
+    assert parse_traceparent(f'01-{TRACE_ID}-{PARENT_ID}-01-more') == (TRACE_ID, PARENT_ID, 1)
+    for invalid in (None, 1, '', 'nope', f'{TRACEPARENT}-more', f'ff-{TRACE_ID}-{PARENT_ID}-01',
+                    f'00-{"0" * 32}-{PARENT_ID}-01', f'00-{TRACE_ID}-{"0" * 16}-01',
+                    f'00-{TRACE_ID[1:]}-{PARENT_ID}-01', f'00-{TRACE_ID}-{PARENT_ID}-0g'):
+        assert parse_traceparent(invalid) is None, invalid
+    assert format_traceparent(TRACE_ID, PARENT_ID, 1) == TRACEPARENT
+
+
+def test_invalid_tracers():
+    with pytest.raises(ValueError):
+        Tracer([])
+    with pytest.raises(ValueError):
+        Tracer([object()])
+    with pytest.raises(ValueError):
+        RingBufferExporter(capacity=0)
+
+
+def test_no_tracer(make_service):
+    service = make_service()
+    assert service.phase_timer is None
+    # Without a tracer, a traceparent is not part of the envelope.
+    response = service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2],
+                                'traceparent': TRACEPARENT})
+    assert response['error']['code'] == -32600
+
+
+def test_root_span(traced_service):
+    service, exporter = traced_service
+    assert isinstance(service.phase_timer, PhaseTimer)
+    response = json.loads(service.call(
+        '{"version": "1.1", "method": "add", "params": [1, 2], "id": 4}'))
+    assert response['result'] == 3
+    [span] = exporter.spans()
+    assert span['name'] == 'add'
+    assert len(span['trace_id']) == 32
+    assert len(span['span_id']) == 16
+    assert span['parent_span_id'] is None
+    assert span['trace_flags'] == 1
+    assert span['status'] == 'ok'
+    assert span['attributes'] == {'rpc.system': 'jsonrpc', 'rpc.jsonrpc.version': '1.1',
+                                  'rpc.method': 'add', 'rpc.jsonrpc.request_id': 4}
+    assert set(span['phases']) == {'decode', 'envelope', 'params', 'handler', 'result',
+                                   'encode'}
+    assert span['duration'] >= sum(span['phases'].values())
+    assert span['end_time'] == span['start_time'] + span['duration']
+    assert current_span() is None
+
+
+def test_parent_from_options(traced_service):
+    service, exporter = traced_service
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]},
+                    {'traceparent': TRACEPARENT})
+    options = Options()
+    options.traceparent = TRACEPARENT
+    service.call('{"version": "1.1", "method": "add", "params": [1, 2]}', options)
+    for span in exporter.spans():
+        assert span['trace_id'] == TRACE_ID
+        assert span['parent_span_id'] == PARENT_ID
+        assert span['span_id'] != PARENT_ID
+
+
+def test_parent_from_envelope(traced_service):
+    service, exporter = traced_service
+    request = {'version': '1.1', 'method': 'add', 'params': [1, 2], 'traceparent': TRACEPARENT}
+    assert service.call_py(request)['result'] == 3
+    # The caller's request is left as it is.
+    assert request['traceparent'] == TRACEPARENT
+    response = json.loads(service.call(json.dumps(request)))
+    assert response['result'] == 3
+    for span in exporter.spans():
+        assert span['trace_id'] == TRACE_ID
+        assert span['parent_span_id'] == PARENT_ID
+
+
+def test_options_before_envelope(traced_service):
+    service, exporter = traced_service
+    other_parent = f'00-{"1" * 32}-{"2" * 16}-01'
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2],
+                     'traceparent': other_parent}, {'traceparent': TRACEPARENT})
+    [span] = exporter.spans()
+    assert span['parent_span_id'] == PARENT_ID
+
+
+def test_invalid_parent(traced_service):
+    service, exporter = traced_service
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2],
+                     'traceparent': 'nope'}, {'traceparent': 'nope'})
+    [span] = exporter.spans()
+    assert span['parent_span_id'] is None
+
+
+def test_not_sampled(traced_service):
+    service, exporter = traced_service
+    unsampled = f'00-{TRACE_ID}-{PARENT_ID}-00'
+    seen_spans.clear()
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]},
+                    {'traceparent': unsampled})
+    # The trace is propagated, but the span not exported.
+    [span] = seen_spans
+    assert span.traceparent == f'00-{TRACE_ID}-{span.span_id}-00'
+    assert exporter.spans() == []
+
+
+def test_current_span(traced_service, make_service):
+    service, exporter = traced_service
+    seen_spans.clear()
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]})
+    assert seen_spans[0].span_id == exporter.spans()[0]['span_id']
+    assert current_span() is None
+    # Untraced calls have none.
+    make_service().call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]})
+    assert seen_spans[1] is None
+
+
+def test_error_status(traced_service):
+    service, exporter = traced_service
+    result = service.call_py({'version': '1.1', 'method': 'square', 'params': [2]},
+                             {'traceparent': TRACEPARENT})['error']
+    # square's result, the traceparent of its span, is not valid.
+    assert result['code'] == -32002
+    [span] = exporter.spans()
+    assert span['status'] == 'error'
+    assert span['attributes']['rpc.jsonrpc.error_code'] == -32002
+    assert current_span() is None
+
+
+def test_errors(traced_service):
+    service, exporter = traced_service
+    service.call('{"version": ')
+    service.call_py({'version': '1.1', 'method': 'nope', 'id': 'x'})
+    service.call_py({'version': '1.1', 'id': 2})
+    parse_error, not_found, invalid = exporter.spans()
+    assert parse_error['name'] == 'jsonrpc'
+    assert parse_error['attributes']['rpc.jsonrpc.error_code'] == -32700
+    assert set(parse_error['phases']) == {'decode', 'encode'}
+    assert not_found['attributes']['rpc.jsonrpc.error_code'] == -32601
+    assert not_found['attributes']['rpc.jsonrpc.request_id'] == 'x'
+    assert invalid['attributes']['rpc.jsonrpc.error_code'] == -32600
+    assert all(span['status'] == 'error' for span in exporter.spans())
+
+
+def test_raising_request(make_service):
+    # Without envelope validation, a request which is not an object raises.
+    exporter = RingBufferExporter()
+    service = make_service(tracer=Tracer([exporter]))
+    service.validate_params = False
+    with pytest.raises(AttributeError):
+        service.call_py(['not', 'a', 'request'])
+    with pytest.raises(AttributeError):
+        service.call('"not a request"')
+    assert current_span() is None
+    assert [span['status'] for span in exporter.spans()] == ['error', 'error']
+
+
+def test_ring_buffer(make_service):
+    service = make_service(tracer=Tracer([RingBufferExporter(capacity=2)]))
+    exporter = service.phase_timer.tracer.exporters[0]
+    for request_id in range(3):
+        service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2],
+                         'id': request_id})
+    assert [span['attributes']['rpc.jsonrpc.request_id']
+            for span in exporter.spans(clear=True)] == [1, 2]
+    assert exporter.spans() == []
+
+
+def test_jsonl(make_service, tmp_path):
+    path = str(tmp_path / 'spans.jsonl')
+    tracer = Tracer([JSONLExporter(path), RingBufferExporter()])
+    service = make_service(tracer=tracer)
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]})
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [3, 4]})
+    tracer.close()
+    with open(path) as spans_file:
+        spans = [json.loads(line) for line in spans_file]
+    assert spans == tracer.exporters[1].spans()
+
+
+def test_failing_exporter(make_service, caplog):
+    class Failing(SpanExporter):
+        def export(self, span):
+            raise RuntimeError('oops')
+    exporter = RingBufferExporter()
+    service = make_service(tracer=Tracer([Failing(), exporter]))
+    with caplog.at_level(logging.ERROR, logger='jsonrpc11base.tracing'):
+        response = service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]})
+    assert response['result'] == 3
+    assert 'Span exporter failed' in caplog.text
+    assert len(exporter.spans()) == 1
+
+
+def test_with_phase_timer_and_slow_log(make_service):
+    from jsonrpc11base.slowlog import SlowCallLog
+    records = []
+    phase_timer = PhaseTimer()
+    exporter = RingBufferExporter()
+    service = make_service(phase_timer=phase_timer, tracer=Tracer([exporter]),
+                           slow_call_log=SlowCallLog(threshold=0.0, sink=records.append))
+    assert service.phase_timer is phase_timer
+    service.call_py({'version': '1.1', 'method': 'add', 'params': [1, 2]},
+                    {'traceparent': TRACEPARENT})
+    assert len(exporter.spans()) == 1
+    assert len(records) == 1